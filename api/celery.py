@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown, worker_shutdown
 from celery.schedules import crontab
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
@@ -11,12 +12,42 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_kafka_producers(**kwargs):
+    # Prefork children exit via os._exit, which skips atexit handlers
+    from apps.core.kafka_config import shutdown_kafka_producers
+    shutdown_kafka_producers()
+
+
 # Periodic tasks
 app.conf.beat_schedule = {
     'aggregate-metrics-every-5min': {
         'task': 'apps.analytics.tasks.aggregate_traffic_metrics',
         'schedule': crontab(minute='*/5'),
     },
+    'refresh-hourly-traffic-rollups': {
+        'task': 'apps.analytics.tasks.refresh_hourly_traffic_rollups',
+        'schedule': crontab(minute=7),  # After the :00 5-minute rollup closes the hour
+    },
+    'refresh-daily-traffic-rollups': {
+        'task': 'apps.analytics.tasks.refresh_daily_traffic_rollups',
+        'schedule': crontab(hour=0, minute=20),
+    },
+    'detect-traffic-patterns-daily': {
+        'task': 'apps.analytics.tasks.detect_traffic_patterns',
+        'schedule': crontab(hour=0, minute=40),  # After the daily rollup
+    },
+    'generate-recommendations-hourly': {
+        'task': 'apps.analytics.tasks.generate_recommendations',
+        'schedule': crontab(minute=15),
+    },
+    'refresh-dashboard-snapshot': {
+        'task': 'apps.analytics.tasks.refresh_dashboard_snapshot',
+        'schedule': 300.0,
+    },
     'generate-hourly-heatmaps': {
         'task': 'apps.analytics.tasks.generate_heat_map',
         'schedule': crontab(minute=0),
@@ -33,6 +64,14 @@ app.conf.beat_schedule = {
         'task': 'apps.stream_ingestion.tasks.monitor_stream_health',
         'schedule': 120.0,  # Every 2 minutes
     },
+    'flush-session-counters': {
+        'task': 'apps.stream_ingestion.tasks.flush_session_counters',
+        'schedule': 60.0,  # Every minute
+    },
+    'maintain-time-partitions-hourly': {
+        'task': 'apps.core.tasks.partitions.maintain_time_partitions',
+        'schedule': crontab(minute=15),
+    },
     'cap-overlong-patrols-every-30min': {
         'task': 'apps.patrols.tasks.cap_overlong_patrols',
         'schedule': crontab(minute='*/30'),  # Every 30 minutes
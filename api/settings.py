@@ -119,6 +119,12 @@ CACHES = {
     }
 }
 
+# Reference data cache (drones, active patrols, patrol configs): a
+# process-local LRU in front of Redis, invalidated over Redis pub/sub
+REFERENCE_CACHE_LOCAL_TTL = config('REFERENCE_CACHE_LOCAL_TTL', default=30, cast=int)
+REFERENCE_CACHE_REDIS_TTL = config('REFERENCE_CACHE_REDIS_TTL', default=300, cast=int)
+REFERENCE_CACHE_MAX_ENTRIES = config('REFERENCE_CACHE_MAX_ENTRIES', default=4096, cast=int)
+
 # Channels
 CHANNEL_LAYERS = {
     'default': {
@@ -193,6 +199,8 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Storages (Django 5.0+)
+# STORAGE_BACKEND=local keeps uploads (e.g. evidence packs) under MEDIA_ROOT for testing
+STORAGE_BACKEND = config('STORAGE_BACKEND', default='s3')
 STORAGES = {
     "default": {
         "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
@@ -201,6 +209,11 @@ STORAGES = {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
 }
+if STORAGE_BACKEND == 'local':
+    STORAGES["default"] = {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": MEDIA_ROOT, "base_url": f"/{MEDIA_URL}"},
+    }
 
 # Object Storage (AWS S3) configuration
 AWS_ACCESS_KEY_ID = config('AWS_ACCESS_KEY_ID')
@@ -220,11 +233,108 @@ KAFKA_BOOTSTRAP_SERVERS = config('KAFKA_BOOTSTRAP_SERVERS', default='kafka:9092'
 KAFKA_TOPICS = {
     'RAW_FRAMES': 'raw_video_frames',
     'DETECTIONS': 'detection_events',
+    'DETECTIONS_DLQ': 'detection_events_dlq',
     'VIOLATIONS': 'violation_events',
     'CITATIONS': 'citation_events',
     'ANALYTICS': 'analytics_events',
 }
 
+# Unconfirmed messages a process may have outstanding before send() blocks
+# on a flush
+KAFKA_PRODUCER_MAX_IN_FLIGHT = config('KAFKA_PRODUCER_MAX_IN_FLIGHT', default=10000, cast=int)
+
+# Producer profiles, keyed like KAFKA_TOPICS. Each topic uses its own profile
+# overlaid on 'default'. 'key' names the message field used as partition key.
+KAFKA_PRODUCER_PROFILES = {
+    'default': {
+        'compression_type': 'lz4',
+        'linger_ms': 5,
+        'batch_size': 64 * 1024,
+        'acks': 1,
+        'max_request_size': 1024 * 1024,
+        'retries': 3,
+        'key': None,
+    },
+    # JPEG frames are already compressed and large: skip compression, batch
+    # a handful of frames per request and keep each stream on one partition
+    'RAW_FRAMES': {
+        'compression_type': config('KAFKA_FRAMES_COMPRESSION', default='none'),
+        'linger_ms': 10,
+        'batch_size': 1024 * 1024,
+        'acks': 1,
+        'max_request_size': 10 * 1024 * 1024,
+        'key': 'stream_id',
+    },
+    # Detection events are small JSON and compress very well
+    'DETECTIONS': {
+        'compression_type': config('KAFKA_EVENTS_COMPRESSION', default='zstd'),
+        'linger_ms': 20,
+        'batch_size': 128 * 1024,
+        'acks': 'all',
+        'key': 'drone_id',
+    },
+    # Failed detection events with their error metadata, replayed with
+    # replay_detections; nothing here may be lost
+    'DETECTIONS_DLQ': {
+        'compression_type': 'zstd',
+        'acks': 'all',
+        'retries': 10,
+        'key': 'drone_id',
+    },
+    'VIOLATIONS': {
+        'compression_type': 'zstd',
+        'acks': 'all',
+        'key': 'drone_id',
+    },
+    'CITATIONS': {
+        'compression_type': 'zstd',
+        'acks': 'all',
+    },
+    'ANALYTICS': {
+        'compression_type': 'zstd',
+        'linger_ms': 50,
+        'batch_size': 256 * 1024,
+        'key': 'drone_id',
+    },
+}
+
+# Time-partitioned tables (see apps/core/partitions.py). Partitions are
+# created `premake` intervals ahead by maintain_partitions; partitions older
+# than `retention_days` are detached and, with retention_action 'drop', dropped.
+TIME_PARTITIONED_TABLES = {
+    'detections': {
+        'column': 'timestamp',
+        'interval': config('DETECTIONS_PARTITION_INTERVAL', default='day'),
+        'premake': 7,
+        'retention_days': config('DETECTIONS_RETENTION_DAYS', default=180, cast=int),
+        'retention_action': config('DETECTIONS_RETENTION_ACTION', default='drop'),
+        # Detections backing a violation are evidence and are never dropped
+        'referenced_by': [('violations_violation', 'detection_id')],
+    },
+    'gps_locations': {
+        'column': 'timestamp',
+        'interval': config('GPS_PARTITION_INTERVAL', default='day'),
+        'premake': 7,
+        'retention_days': config('GPS_RETENTION_DAYS', default=30, cast=int),
+        'retention_action': config('GPS_RETENTION_ACTION', default='drop'),
+    },
+}
+
+# Raw frame archive (segment files written by run_frame_archiver)
+FRAME_ARCHIVE_ROOT = config('FRAME_ARCHIVE_ROOT', default=str(BASE_DIR / 'media' / 'archive'))
+FRAME_ARCHIVE_SEGMENT_SECONDS = config('FRAME_ARCHIVE_SEGMENT_SECONDS', default=60, cast=int)
+
+# Heat map tile pyramid (Web Mercator z/x/y tiles, see apps/analytics/tiles.py)
+HEATMAP_TILE_MIN_ZOOM = config('HEATMAP_TILE_MIN_ZOOM', default=8, cast=int)
+HEATMAP_TILE_MAX_ZOOM = config('HEATMAP_TILE_MAX_ZOOM', default=15, cast=int)
+
+# Streaming anomaly detection (see apps/analytics/anomalies.py)
+ANOMALY_BUCKET_SECONDS = config('ANOMALY_BUCKET_SECONDS', default=60, cast=int)
+ANOMALY_Z_THRESHOLD = config('ANOMALY_Z_THRESHOLD', default=3.0, cast=float)
+ANOMALY_COOLDOWN_MINUTES = config('ANOMALY_COOLDOWN_MINUTES', default=30, cast=int)
+# Cell size for per-area baselines, in metres
+ANOMALY_CELL_SIZE = config('ANOMALY_CELL_SIZE', default=500, cast=int)
+
 # Computer Vision
 CV_MODELS = {
     'VEHICLE_DETECTION': BASE_DIR / 'models' / 'yolov8n.pt',
@@ -233,6 +343,13 @@ CV_MODELS = {
 CV_CONFIDENCE_THRESHOLD = config('CV_CONFIDENCE_THRESHOLD', default=0.5, cast=float)
 CV_SPEED_LIMIT_DEFAULT = config('CV_SPEED_LIMIT_DEFAULT', default=60.0, cast=float)
 
+# Violation evidence (rolling buffer of encoded frames per ingestion stream)
+EVIDENCE_PRE_SECONDS = config('EVIDENCE_PRE_SECONDS', default=5.0, cast=float)
+EVIDENCE_POST_SECONDS = config('EVIDENCE_POST_SECONDS', default=5.0, cast=float)
+EVIDENCE_BUFFER_SECONDS = config('EVIDENCE_BUFFER_SECONDS', default=20.0, cast=float)
+EVIDENCE_MAX_BUFFERED_FRAMES = config('EVIDENCE_MAX_BUFFERED_FRAMES', default=600, cast=int)
+EVIDENCE_UPLOAD_WORKERS = config('EVIDENCE_UPLOAD_WORKERS', default=2, cast=int)
+
 # Logging
 LOGGING = {
     'version': 1,
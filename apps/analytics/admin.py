@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.gis import admin as gis_admin
-from .models import Recommendation, TrafficMetrics, HeatMap, TrafficPattern, AnalyticsReport
+from .models import Recommendation, TrafficMetrics, HourlyTrafficMetrics, DailyTrafficMetrics, RollupWatermark, HeatMap, TrafficPattern, AnalyticsReport
 
 @admin.register(Recommendation)
 class RecommendationAdmin(admin.ModelAdmin):
@@ -14,6 +14,16 @@ class TrafficMetricsAdmin(gis_admin.GISModelAdmin):
     list_filter = ('drone_id', 'timestamp')
     search_fields = ('drone_id',)
 
+@admin.register(HourlyTrafficMetrics, DailyTrafficMetrics)
+class TrafficMetricsRollupAdmin(gis_admin.GISModelAdmin):
+    list_display = ('bucket', 'drone_id', 'vehicle_count', 'average_speed', 'violation_count', 'window_count')
+    list_filter = ('drone_id',)
+    search_fields = ('drone_id',)
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'watermark', 'updated_at')
+
 @admin.register(HeatMap)
 class HeatMapAdmin(admin.ModelAdmin):
     list_display = ('date', 'hour', 'metric_type', 'created_at')
@@ -0,0 +1,309 @@
+"""
+Streaming anomaly detection over analytics events.
+
+Ingestion publishes one 'traffic' event per drone and cell for every
+detection batch (see apps.analytics.events). AnomalyDetector sums them
+into fixed buckets per drone and per cell, counting each track once per
+bucket however many batches it appears in, and, as each bucket closes,
+scores its volume, mean speed and violation rate against exponentially
+weighted baselines (mean and variance) of the same subject. Baselines
+live in memory: they warm up again after a restart, and since events are
+keyed by drone, a cell seen by drones on different partitions is judged
+by each worker on its own share of the traffic.
+
+Time is event time throughout. Each source (the consumer passes the
+partition) has a watermark, the latest event timestamp read from it, and
+a bucket only closes once the watermark of the source that last fed it
+has moved past the bucket's end, so a lagging or restarted consumer
+judges buckets exactly as a live one would.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.core import spatial
+from .dashboard import refresh_recommendations
+from .models import Recommendation
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest bucket in the baselines
+ALPHA = 0.05
+# Buckets a baseline needs before it is trusted
+WARMUP_BUCKETS = 10
+# Floors for the standard deviation, so a flat baseline does not turn
+# every small wobble into an anomaly
+MIN_SD = {'volume': 2.0, 'speed': 3.0, 'violation_rate': 0.02}
+# How long after a bucket ends its late events are still waited for
+GRACE_SECONDS = 15
+# Subjects not seen for this long are forgotten
+IDLE_TTL = timedelta(hours=24)
+# Anomaly recommendations are retired after this long
+RECOMMENDATION_TTL = timedelta(hours=6)
+
+Anomaly = namedtuple('Anomaly', ['scope', 'subject', 'metric', 'direction', 'value', 'baseline', 'z', 'bucket_start'])
+
+# (scope, metric, direction) -> (category, title); pairs not listed are not reported
+ANOMALY_KINDS = {
+    ('drone', 'volume', 'high'): ('ALLOCATION', 'Traffic surge seen by drone {subject}'),
+    ('drone', 'volume', 'low'): ('MAINTENANCE', 'Detections dropped for drone {subject}'),
+    ('drone', 'speed', 'high'): ('SAFETY', 'Speeding surge seen by drone {subject}'),
+    ('drone', 'speed', 'low'): ('ALLOCATION', 'Slowdown seen by drone {subject}'),
+    ('drone', 'violation_rate', 'high'): ('SAFETY', 'Violation spike seen by drone {subject}'),
+    ('cell', 'volume', 'high'): ('ALLOCATION', 'Traffic surge near {where}'),
+    ('cell', 'speed', 'high'): ('SAFETY', 'Speeding surge near {where}'),
+    ('cell', 'speed', 'low'): ('ALLOCATION', 'Slowdown near {where}'),
+    ('cell', 'violation_rate', 'high'): ('SAFETY', 'Violation spike near {where}'),
+}
+
+
+class EWMA:
+    """Exponentially weighted mean and variance of one metric"""
+
+    __slots__ = ('mean', 'var', 'count')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def zscore(self, value, min_sd):
+        if self.count < WARMUP_BUCKETS:
+            return None
+        return (value - self.mean) / max(math.sqrt(self.var), min_sd)
+
+    def update(self, value):
+        if not self.count:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            self.mean += ALPHA * diff
+            self.var = (1 - ALPHA) * (self.var + ALPHA * diff * diff)
+        self.count += 1
+
+
+class Subject:
+    """The open bucket and the baselines of one drone or cell"""
+
+    __slots__ = (
+        'bucket', 'previous', 'contiguous', 'tracks', 'untracked', 'speed_sum', 'speed_count', 'violations',
+        'baselines', 'last_seen', 'source',
+    )
+
+    def __init__(self):
+        self.bucket = None
+        # Last closed bucket, and whether the open one directly follows it
+        self.previous = None
+        self.contiguous = False
+        self.baselines = {metric: EWMA() for metric in MIN_SD}
+        self.last_seen = 0.0
+        self.source = None
+        self.reset()
+
+    def open(self, bucket):
+        self.contiguous = self.previous is not None and bucket == self.previous + 1
+        self.bucket = bucket
+
+    @property
+    def vehicles(self):
+        return len(self.tracks) + self.untracked
+
+    def reset(self):
+        # (drone_id, track_id) pairs, as track ids are only unique per drone
+        self.tracks = set()
+        self.untracked = 0
+        self.speed_sum = 0.0
+        self.speed_count = 0
+        self.violations = 0
+
+    def metrics(self):
+        vehicles = self.vehicles
+        metrics = {'volume': float(vehicles)}
+        if self.speed_count:
+            metrics['speed'] = self.speed_sum / self.speed_count
+        if vehicles:
+            metrics['violation_rate'] = self.violations / vehicles
+        return metrics
+
+
+class AnomalyDetector:
+    def __init__(self, bucket_seconds=None, threshold=None):
+        self.bucket_seconds = bucket_seconds or settings.ANOMALY_BUCKET_SECONDS
+        self.threshold = threshold or settings.ANOMALY_Z_THRESHOLD
+        self.subjects = {}
+        # Latest event timestamp (epoch seconds) read from each source
+        self.watermarks = {}
+
+    def add(self, event, source=None):
+        """Account a traffic event read from `source`; returns anomalies of buckets it closed"""
+        timestamp = parse_datetime(event['timestamp'])
+        if timestamp is None:
+            raise ValueError(f"Invalid timestamp: {event['timestamp']!r}")
+        seconds = timestamp.timestamp()
+        bucket = int(seconds) // self.bucket_seconds
+        self.watermarks[source] = max(self.watermarks.get(source, seconds), seconds)
+
+        drone_id = event['drone_id']
+        tracks = [(drone_id, int(track)) for track in event.get('tracks', ())]
+        keys = [('drone', drone_id)]
+        if event.get('cell_id') is not None:
+            keys.append(('cell', (int(event['level']), int(event['cell_id']))))
+
+        anomalies = []
+        for key in keys:
+            subject = self.subjects.get(key)
+            if subject is None:
+                subject = self.subjects[key] = Subject()
+            if subject.previous is not None and bucket <= subject.previous:
+                # Its bucket was already judged
+                continue
+            if subject.bucket is None:
+                subject.open(bucket)
+            elif bucket > subject.bucket:
+                anomalies += self.close(key, subject, complete=subject.contiguous and bucket == subject.bucket + 1)
+                subject.open(bucket)
+            # Late events count towards the open bucket
+            subject.tracks.update(tracks)
+            subject.untracked += int(event.get('untracked', 0))
+            subject.speed_sum += float(event.get('speed_sum', 0.0))
+            subject.speed_count += int(event.get('speed_count', 0))
+            subject.violations += int(event.get('violations', 0))
+            subject.last_seen = max(subject.last_seen, seconds)
+            subject.source = source
+        return anomalies
+
+    def close_due(self):
+        """
+        Close the buckets that ended more than GRACE_SECONDS before the
+        watermark of their source, so a subject that went quiet is judged
+        without waiting for its next event. Forgets subjects idle for
+        IDLE_TTL of event time, along with any bucket still open on a
+        source that stopped advancing.
+        """
+        if not self.watermarks:
+            return []
+        latest = max(self.watermarks.values())
+        anomalies = []
+        for key, subject in list(self.subjects.items()):
+            watermark = self.watermarks.get(subject.source, latest)
+            if subject.bucket is not None and (subject.bucket + 1) * self.bucket_seconds + GRACE_SECONDS <= watermark:
+                anomalies += self.close(key, subject, complete=False)
+            elif latest - subject.last_seen > IDLE_TTL.total_seconds():
+                del self.subjects[key]
+        return anomalies
+
+    def close(self, key, subject, complete):
+        """
+        Score the open bucket and fold it into the baselines. A bucket is
+        complete when its neighbours on both sides had traffic too; the
+        first and last bucket of a flight only cover part of it, so their
+        volume is only checked for surges and kept out of the baseline.
+        """
+        scope, name = key
+        bucket_start = datetime.fromtimestamp(subject.bucket * self.bucket_seconds, tz=dt_timezone.utc)
+        anomalies = []
+        for metric, value in subject.metrics().items():
+            partial = metric == 'volume' and not complete
+            baseline = subject.baselines[metric]
+            z = baseline.zscore(value, MIN_SD[metric])
+            if z is not None and (z >= self.threshold or (z <= -self.threshold and not partial)):
+                anomalies.append(Anomaly(
+                    scope, name, metric, 'high' if z > 0 else 'low', value, baseline.mean, z, bucket_start
+                ))
+            if not partial:
+                baseline.update(value)
+        subject.previous, subject.bucket = subject.bucket, None
+        subject.reset()
+        return anomalies
+
+
+def anomaly_key(anomaly):
+    subject = anomaly.subject
+    if anomaly.scope == 'cell':
+        subject = f"{subject[0]}/{subject[1]}"
+    return f"{anomaly.scope}:{subject}:{anomaly.metric}:{anomaly.direction}"
+
+
+def build_recommendation(anomaly):
+    """Unsaved Recommendation for an anomaly, or None for kinds not reported"""
+    kind = ANOMALY_KINDS.get((anomaly.scope, anomaly.metric, anomaly.direction))
+    if kind is None:
+        return None
+    category, title = kind
+
+    metadata = {
+        'source': 'anomaly',
+        'anomaly_key': anomaly_key(anomaly),
+        'scope': anomaly.scope,
+        'metric': anomaly.metric,
+        'value': round(anomaly.value, 3),
+        'baseline': round(anomaly.baseline, 3),
+        'z': round(anomaly.z, 2),
+        'bucket_start': anomaly.bucket_start.isoformat(),
+    }
+    where = None
+    if anomaly.scope == 'cell':
+        level, cell = anomaly.subject
+        lats, lons = spatial.cell_centers([cell], level)
+        metadata.update({'cell_id': cell, 'level': level, 'lat': round(float(lats[0]), 6), 'lon': round(float(lons[0]), 6)})
+        where = f"{metadata['lat']}, {metadata['lon']}"
+    else:
+        metadata['drone_id'] = anomaly.subject
+
+    unit = {'volume': ' vehicles', 'speed': ' km/h', 'violation_rate': ''}[anomaly.metric]
+    label = anomaly.metric.replace('_', ' ')
+    return Recommendation(
+        title=title.format(subject=anomaly.subject, where=where),
+        description=(
+            f"{label.capitalize()} was {anomaly.value:.2f}{unit} in the {settings.ANOMALY_BUCKET_SECONDS}s "
+            f"from {anomaly.bucket_start:%H:%M} UTC against a baseline of {anomaly.baseline:.2f}{unit} "
+            f"({anomaly.z:+.1f} standard deviations)."
+        ),
+        category=category,
+        # Two-sided normal probability of a deviation this small
+        confidence_score=round(math.erf(abs(anomaly.z) / math.sqrt(2)), 3),
+        metadata=metadata,
+    )
+
+
+def save_anomalies(anomalies):
+    """
+    Store Recommendations for the anomalies. A subject and metric flagged
+    within the cooldown is not reported again; otherwise the new
+    recommendation replaces the active one. Returns the created rows.
+    """
+    recommendations = {}
+    for anomaly in anomalies:
+        recommendation = build_recommendation(anomaly)
+        if recommendation is not None:
+            recommendations[recommendation.metadata['anomaly_key']] = recommendation
+    if not recommendations:
+        return []
+
+    active = Recommendation.objects.filter(is_active=True, metadata__anomaly_key__in=list(recommendations))
+    cooldown_start = timezone.now() - timedelta(minutes=settings.ANOMALY_COOLDOWN_MINUTES)
+    for key in active.filter(created_at__gte=cooldown_start).values_list('metadata__anomaly_key', flat=True):
+        recommendations.pop(key, None)
+    if not recommendations:
+        return []
+
+    with transaction.atomic():
+        active.filter(metadata__anomaly_key__in=list(recommendations)).update(is_active=False)
+        created = Recommendation.objects.bulk_create(recommendations.values())
+    logger.info(f"Flagged {len(created)} anomalies: {', '.join(recommendations)}")
+    refresh_recommendations()
+    return created
+
+
+def retire_anomalies():
+    """Deactivate anomaly recommendations older than RECOMMENDATION_TTL"""
+    retired = Recommendation.objects.filter(
+        is_active=True, metadata__source='anomaly', created_at__lt=timezone.now() - RECOMMENDATION_TTL
+    ).update(is_active=False)
+    if retired:
+        refresh_recommendations()
+    return retired
@@ -0,0 +1,54 @@
+from apps.core.consumers import BatchConsumer
+from .anomalies import AnomalyDetector, save_anomalies, retire_anomalies
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AnomalyConsumer(BatchConsumer):
+    """
+    Flags traffic anomalies from the analytics events as they arrive and
+    records them as Recommendations (see apps.analytics.anomalies)
+    """
+
+    topic_key = 'ANALYTICS'
+    group_id = 'skymarshal_analytics_group'
+    batch_size = 1000
+    # Seconds between retiring old anomaly recommendations
+    retire_interval = 60.0
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.detector = AnomalyDetector()
+        self.last_retired = 0.0
+
+    def handle_batch(self, records):
+        anomalies = []
+        for record in records:
+            event = record.value
+            if not isinstance(event, dict) or event.get('type') != 'traffic':
+                continue
+            try:
+                anomalies += self.detector.add(event, source=record.message.partition)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"{self.name}: skipping malformed analytics event at offset {record.message.offset}: {e}")
+        # Judge buckets of subjects that went quiet, by the event time read so far
+        anomalies += self.detector.close_due()
+        # The baselines already moved on; replaying the batch would count it twice
+        try:
+            save_anomalies(anomalies)
+        except Exception as e:
+            logger.error(f"{self.name}: could not record {len(anomalies)} anomalies: {e}", exc_info=True)
+
+    def on_tick(self):
+        # Tidy up between batches
+        if time.monotonic() - self.last_retired < self.retire_interval:
+            return
+        self.last_retired = time.monotonic()
+        try:
+            retired = retire_anomalies()
+            if retired:
+                logger.info(f"{self.name}: retired {retired} anomaly recommendations")
+        except Exception as e:
+            logger.error(f"{self.name}: could not retire anomaly recommendations: {e}", exc_info=True)
@@ -0,0 +1,137 @@
+"""
+Admin dashboard snapshot.
+
+The dashboard is served from one Redis hash instead of being computed per
+request. refresh_dashboard_snapshot rebuilds it periodically from the
+database, which also corrects any drift, and events keep it current in
+between:
+
+- created violations increment the counter of their (UTC) day,
+- patrol saves and deletes recount the active patrols,
+- recommendation runs and streamed anomalies replace the recommendations.
+
+Every change bumps a version counter, which the dashboard serves as its
+ETag. Should Redis lose the counter (a flush or eviction) it restarts from
+the current time in milliseconds rather than from 1, so it stays ahead of
+any version a client may still hold as long as there are fewer than a
+thousand updates a second.
+"""
+from datetime import timezone as dt_timezone
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django_redis import get_redis_connection
+from .models import Recommendation
+from .services import InferenceEngine
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'dashboard:snapshot'
+VERSION_KEY = 'dashboard:version'
+# Active recommendations shown, by confidence
+RECOMMENDATION_LIMIT = 50
+RECOMMENDATION_FIELDS = (
+    'id', 'title', 'description', 'category', 'confidence_score', 'metadata', 'is_active',
+    'created_at', 'updated_at',
+)
+
+
+def violations_field(day):
+    return f"violations:{day.isoformat()}"
+
+
+def _write(mapping=None, increments=None, replace=False):
+    pipe = get_redis_connection('default').pipeline(transaction=True)
+    if replace:
+        pipe.delete(SNAPSHOT_KEY)
+    if mapping:
+        pipe.hset(SNAPSHOT_KEY, mapping=mapping)
+    for field, amount in (increments or {}).items():
+        pipe.hincrby(SNAPSHOT_KEY, field, amount)
+    pipe.set(VERSION_KEY, time.time_ns() // 1_000_000, nx=True)
+    pipe.incr(VERSION_KEY)
+    return pipe.execute()[-1]
+
+
+def active_recommendations():
+    recommendations = Recommendation.objects.filter(is_active=True).order_by('-confidence_score')
+    return json.dumps(
+        list(recommendations.values(*RECOMMENDATION_FIELDS)[:RECOMMENDATION_LIMIT]), cls=DjangoJSONEncoder
+    )
+
+
+def active_patrol_count():
+    from apps.patrols.models import Patrol
+    return Patrol.objects.filter(status='ACTIVE').count()
+
+
+def build_snapshot():
+    """Rebuild the whole snapshot from the database. Returns its version."""
+    metrics = InferenceEngine.get_dashboard_metrics()
+    mapping = {
+        violations_field(timezone.now().date()): metrics['violations_today'],
+        'active_patrols': metrics['active_patrols'],
+        'avg_compliance_score': metrics['avg_compliance_score'],
+        'system_status': metrics['system_status'],
+        'recommendations': active_recommendations(),
+        'built_at': timezone.now().isoformat(),
+    }
+    return _write(mapping, replace=True)
+
+
+def get_snapshot():
+    """
+    (version, metrics, recommendations) from Redis, building the snapshot
+    first if there is none. Never regenerates recommendations.
+    """
+    pipe = get_redis_connection('default').pipeline(transaction=True)
+    pipe.hgetall(SNAPSHOT_KEY)
+    pipe.get(VERSION_KEY)
+    entries, version = pipe.execute()
+    snapshot = {
+        key.decode() if isinstance(key, bytes) else key: value.decode() if isinstance(value, bytes) else value
+        for key, value in entries.items()
+    }
+    if 'built_at' not in snapshot or version is None:
+        # Never built, or Redis was flushed or evicted part of it; event
+        # updates alone are not a snapshot
+        build_snapshot()
+        return get_snapshot()
+
+    metrics = {
+        'violations_today': int(snapshot.get(violations_field(timezone.now().date()), 0)),
+        'active_patrols': int(snapshot['active_patrols']),
+        'avg_compliance_score': float(snapshot['avg_compliance_score']),
+        'system_status': snapshot['system_status'],
+    }
+    return int(version), metrics, json.loads(snapshot['recommendations'])
+
+
+def _update(name, mapping=None, increments=None):
+    # The write that triggered the update must not fail because of the
+    # snapshot; the next rebuild puts back anything missed here
+    try:
+        return _write(mapping, increments)
+    except Exception as e:
+        logger.warning(f"Could not update dashboard snapshot ({name}): {e}")
+
+
+def record_violations(violations):
+    """Count newly created violations towards their day"""
+    days = {}
+    for violation in violations:
+        created = violation.created_at or timezone.now()
+        field = violations_field(created.astimezone(dt_timezone.utc).date())
+        days[field] = days.get(field, 0) + 1
+    if days:
+        _update('violations', increments=days)
+
+
+def refresh_active_patrols():
+    _update('patrols', mapping={'active_patrols': active_patrol_count()})
+
+
+def refresh_recommendations():
+    _update('recommendations', mapping={'recommendations': active_recommendations()})
@@ -0,0 +1,74 @@
+from collections import Counter
+from django.conf import settings
+from apps.core import spatial
+from apps.core.kafka_config import get_kafka_producer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def traffic_events(detections, violations=()):
+    """
+    One 'traffic' analytics event per drone and ANOMALY_CELL_SIZE cell of
+    an ingested batch: the track ids seen, untracked detections, speed sum
+    and count, and violations. Track ids rather than a vehicle count, since
+    a track spans many batches and must be counted once per bucket.
+    Detections without a location only count for their drone (cell_id None).
+    """
+    level = spatial.level_for_size(settings.ANOMALY_CELL_SIZE)
+    shift = spatial.parent_shift(level)
+    violated = Counter(v.detection_id for v in violations)
+
+    groups = {}
+    for detection in detections:
+        cell = detection.cell_id >> shift if detection.cell_id is not None else None
+        key = (detection.drone.drone_id, cell)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                'tracks': set(), 'untracked': 0, 'speed_sum': 0.0, 'speed_count': 0,
+                'violations': 0, 'timestamp': detection.timestamp,
+            }
+        if detection.track_id is None:
+            group['untracked'] += 1
+        else:
+            group['tracks'].add(detection.track_id)
+        if detection.speed is not None:
+            group['speed_sum'] += detection.speed
+            group['speed_count'] += 1
+        group['violations'] += violated[detection.id]
+        group['timestamp'] = max(group['timestamp'], detection.timestamp)
+
+    return [
+        {
+            'type': 'traffic',
+            'drone_id': drone_id,
+            'cell_id': cell,
+            'level': level,
+            'timestamp': group['timestamp'].isoformat(),
+            'tracks': sorted(group['tracks']),
+            'untracked': group['untracked'],
+            'speed_sum': group['speed_sum'],
+            'speed_count': group['speed_count'],
+            'violations': group['violations'],
+        }
+        for (drone_id, cell), group in groups.items()
+    ]
+
+
+def publish_traffic_events(detections, violations=()):
+    """
+    Send traffic_events() to the analytics topic. Analytics are best effort:
+    failures are logged and never fail ingestion.
+    """
+    if not detections:
+        return 0
+    try:
+        events = traffic_events(detections, violations)
+        producer = get_kafka_producer()
+        for event in events:
+            producer.send(settings.KAFKA_TOPICS['ANALYTICS'], event)
+    except Exception as e:
+        logger.error(f"Could not publish analytics events for {len(detections)} detections: {e}", exc_info=True)
+        return 0
+    return len(events)
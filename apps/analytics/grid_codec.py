@@ -0,0 +1,119 @@
+"""
+Binary encoding for heat map grids.
+
+    header   magic 'SMHG', version, flags, rows, cols (uint32),
+             origin_lat, origin_lon, resolution (float64), little-endian
+    payload  zlib-compressed; dense: rows*cols float32 values, row-major
+             from the south-west corner; sparse (FLAG_SPARSE): uint32 count,
+             then count uint32 cell indices and count float32 values
+
+Row r, column c covers latitudes [origin_lat + r*resolution, +resolution)
+and the matching longitude range.
+"""
+from collections import namedtuple
+import numpy as np
+import struct
+import zlib
+
+MAGIC = b'SMHG'
+VERSION = 1
+FLAG_SPARSE = 0x01
+HEADER = struct.Struct('<4sBBIIddd')
+MEDIA_TYPE = 'application/x-heatmap-grid'
+
+GridHeader = namedtuple('GridHeader', ['rows', 'cols', 'origin_lat', 'origin_lon', 'resolution'])
+
+
+def encode_grid(grid, origin_lat, origin_lon, resolution):
+    """Encode a 2-D array, picking the sparse layout when it is smaller"""
+    grid = np.asarray(grid, dtype='<f4')
+    rows, cols = grid.shape
+    flat = grid.reshape(-1)
+    indices = np.flatnonzero(flat)
+    return encode_cells(rows, cols, indices, flat[indices], origin_lat, origin_lon, resolution)
+
+
+def encode_cells(rows, cols, indices, values, origin_lat, origin_lon, resolution):
+    """
+    Encode a rows x cols grid given only its cells: unique row-major
+    `indices` and their `values`. The grid is only materialised when the
+    dense layout is the smaller one.
+    """
+    if rows * cols > 0xFFFFFFFF:
+        raise ValueError(f"Grid of {rows}x{cols} cells is too large to encode")
+    values = np.asarray(values, dtype='<f4')
+    filled = values != 0
+    indices = np.asarray(indices)[filled].astype('<u4')
+    values = values[filled]
+
+    # Sparse costs 8 bytes per filled cell, dense 4 per cell
+    if len(indices) * 8 + 4 < rows * cols * 4:
+        flags = FLAG_SPARSE
+        order = np.argsort(indices)
+        payload = struct.pack('<I', len(indices)) + indices[order].tobytes() + values[order].tobytes()
+    else:
+        flags = 0
+        flat = np.zeros(rows * cols, dtype='<f4')
+        flat[indices] = values
+        payload = flat.tobytes()
+
+    header = HEADER.pack(MAGIC, VERSION, flags, rows, cols, origin_lat, origin_lon, resolution)
+    return header + zlib.compress(payload, 6)
+
+
+def decode_cells(data):
+    """(GridHeader, row-major indices, float32 values) of the non-empty cells of encode_grid output"""
+    data = bytes(data)
+    magic, version, flags, rows, cols, origin_lat, origin_lon, resolution = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a heat map grid')
+
+    payload = zlib.decompress(data[HEADER.size:])
+    if flags & FLAG_SPARSE:
+        (count,) = struct.unpack_from('<I', payload)
+        indices = np.frombuffer(payload, dtype='<u4', count=count, offset=4)
+        values = np.frombuffer(payload, dtype='<f4', count=count, offset=4 + 4 * count)
+    else:
+        flat = np.frombuffer(payload, dtype='<f4')
+        indices = np.flatnonzero(flat)
+        values = flat[indices]
+
+    return GridHeader(rows, cols, origin_lat, origin_lon, resolution), indices, values
+
+
+def decode_grid(data):
+    """(GridHeader, float32 array of shape (rows, cols)) from encode_grid output"""
+    header, indices, values = decode_cells(data)
+    grid = np.zeros(header.rows * header.cols, dtype='<f4')
+    grid[indices] = values
+    return header, grid.reshape(header.rows, header.cols)
+
+
+def grid_cells(header, indices, values, color_bands):
+    """
+    The legacy JSON cell list ({lat, lon, value, color}) for the non-empty
+    cells, as returned by decode_cells. `color_bands` are the upper bounds
+    of the green and yellow bands.
+    """
+    rows, cols = np.divmod(np.asarray(indices, dtype='i8'), header.cols)
+    lats = np.round(header.origin_lat + rows * header.resolution, 6)
+    lons = np.round(header.origin_lon + cols * header.resolution, 6)
+    green, yellow = color_bands
+    colors = np.where(values < green, '#00FF00', np.where(values < yellow, '#FFFF00', '#FF0000'))
+    return [
+        {'lat': lat, 'lon': lon, 'value': value, 'color': color}
+        for lat, lon, value, color in zip(
+            lats.tolist(), lons.tolist(), np.round(values, 2).tolist(), colors.tolist()
+        )
+    ]
+
+
+def cells_to_grid(cells, resolution):
+    """Encode a legacy JSON cell list (cells anchored on the grid)"""
+    lat_idx = np.array([round(c['lat'] / resolution) for c in cells], dtype='i8')
+    lon_idx = np.array([round(c['lon'] / resolution) for c in cells], dtype='i8')
+    values = np.array([c['value'] for c in cells], dtype='f4')
+
+    grid = np.zeros((lat_idx.max() - lat_idx.min() + 1, lon_idx.max() - lon_idx.min() + 1), dtype='f4')
+    grid[lat_idx - lat_idx.min(), lon_idx - lon_idx.min()] = values
+    return encode_grid(grid, lat_idx.min() * resolution, lon_idx.min() * resolution, resolution)
@@ -0,0 +1,65 @@
+# Generated by Django 5.0 on 2026-10-19 14:05
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+def rollup_fields():
+    return [
+        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+        ('bucket', models.DateTimeField()),
+        ('location', django.contrib.gis.db.models.fields.PointField(srid=4326)),
+        ('drone_id', models.CharField(max_length=100)),
+        ('vehicle_count', models.IntegerField(default=0)),
+        ('car_count', models.IntegerField(default=0)),
+        ('truck_count', models.IntegerField(default=0)),
+        ('motorcycle_count', models.IntegerField(default=0)),
+        ('bus_count', models.IntegerField(default=0)),
+        ('average_speed', models.FloatField(default=0.0)),
+        ('max_speed', models.FloatField(default=0.0)),
+        ('min_speed', models.FloatField(default=0.0)),
+        ('speed_variance', models.FloatField(default=0.0)),
+        ('violation_count', models.IntegerField(default=0)),
+        ('citation_count', models.IntegerField(default=0)),
+        ('sample_size', models.IntegerField(default=0)),
+        ('window_count', models.IntegerField(default=0)),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyTrafficMetrics',
+            fields=rollup_fields(),
+            options={
+                'db_table': 'traffic_metrics_hourly',
+                'indexes': [models.Index(fields=['bucket'], name='tm_hourly_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('drone_id', 'bucket'), name='traffic_metrics_hourly_drone_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTrafficMetrics',
+            fields=rollup_fields(),
+            options={
+                'db_table': 'traffic_metrics_daily',
+                'indexes': [models.Index(fields=['bucket'], name='tm_daily_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('drone_id', 'bucket'), name='traffic_metrics_daily_drone_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('watermark', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'rollup_watermarks',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_traffic_metrics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatMapTile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.IntegerField()),
+                ('metric_type', models.CharField(max_length=50)),
+                ('z', models.IntegerField()),
+                ('x', models.IntegerField()),
+                ('y', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('cell_count', models.IntegerField(default=0)),
+                ('max_value', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'heat_map_tiles',
+                'constraints': [models.UniqueConstraint(fields=('date', 'hour', 'metric_type', 'z', 'x', 'y'), name='heat_map_tiles_uniq')],
+            },
+        ),
+    ]
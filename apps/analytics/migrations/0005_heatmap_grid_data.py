@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+def encode_legacy_grids(apps, schema_editor):
+    from apps.analytics.grid_codec import cells_to_grid
+
+    HeatMap = apps.get_model('analytics', 'HeatMap')
+    for heat_map in HeatMap.objects.filter(grid_data__isnull=True).iterator(chunk_size=100):
+        cells = (heat_map.location_grid or {}).get('cells') or []
+        if not cells:
+            continue
+        resolution = heat_map.location_grid.get('resolution', 0.001)
+        heat_map.grid_data = cells_to_grid(cells, resolution)
+        heat_map.location_grid = {}
+        heat_map.save(update_fields=['grid_data', 'location_grid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_heatmaptile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='heatmap',
+            name='grid_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='heatmap',
+            name='location_grid',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(encode_legacy_grids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_heatmap_grid_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trafficpattern',
+            name='pattern_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
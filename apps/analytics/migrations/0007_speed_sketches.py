@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_trafficpattern_pattern_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trafficmetrics',
+            name='speed_sketch',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ZoneSpeedSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('level', models.SmallIntegerField()),
+                ('cell_id', models.BigIntegerField()),
+                ('sample_size', models.IntegerField(default=0)),
+                ('sketch', models.BinaryField()),
+            ],
+            options={
+                'db_table': 'zone_speed_sketches',
+                'indexes': [models.Index(fields=['timestamp'], name='zone_speed_sketches_ts_idx')],
+                'constraints': [models.UniqueConstraint(fields=('level', 'cell_id', 'timestamp'), name='zone_speed_sketches_cell_ts_uniq')],
+            },
+        ),
+    ]
@@ -50,6 +50,9 @@ class TrafficMetrics(models.Model):
     
     # Metadata
     sample_size = models.IntegerField(default=0)
+
+    # DDSketch of the window's speeds (see apps.analytics.sketch)
+    speed_sketch = models.BinaryField(null=True, blank=True)
     
     class Meta:
         db_table = 'traffic_metrics'
@@ -59,6 +62,95 @@ class TrafficMetrics(models.Model):
             Index(fields=['drone_id', 'timestamp'])
         ]
 
+class ZoneSpeedSketch(models.Model):
+    """
+    DDSketch of the speeds detected in one spatial cell (apps.core.spatial)
+    over a 5-minute window, stamped like TrafficMetrics with the window end
+    """
+    timestamp = models.DateTimeField()
+    level = models.SmallIntegerField()
+    cell_id = models.BigIntegerField()
+    sample_size = models.IntegerField(default=0)
+    sketch = models.BinaryField()
+
+    class Meta:
+        db_table = 'zone_speed_sketches'
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'cell_id', 'timestamp'], name='zone_speed_sketches_cell_ts_uniq'),
+        ]
+        indexes = [
+            Index(fields=['timestamp'], name='zone_speed_sketches_ts_idx'),
+        ]
+
+class TrafficMetricsRollup(models.Model):
+    """
+    TrafficMetrics combined over a coarser bucket. Counts are sums over the
+    5-minute windows, speeds are sample-weighted, and location is the
+    drone's last position in the bucket.
+    """
+    bucket = models.DateTimeField()  # Start of the bucket (UTC)
+    location = models.PointField()
+    drone_id = models.CharField(max_length=100)
+
+    # Volume metrics
+    vehicle_count = models.IntegerField(default=0)
+    car_count = models.IntegerField(default=0)
+    truck_count = models.IntegerField(default=0)
+    motorcycle_count = models.IntegerField(default=0)
+    bus_count = models.IntegerField(default=0)
+
+    # Speed metrics
+    average_speed = models.FloatField(default=0.0)
+    max_speed = models.FloatField(default=0.0)
+    min_speed = models.FloatField(default=0.0)
+    speed_variance = models.FloatField(default=0.0)
+
+    # Violation metrics
+    violation_count = models.IntegerField(default=0)
+    citation_count = models.IntegerField(default=0)
+
+    # Metadata
+    sample_size = models.IntegerField(default=0)
+    window_count = models.IntegerField(default=0)  # 5-minute windows covered
+
+    class Meta:
+        abstract = True
+
+class HourlyTrafficMetrics(TrafficMetricsRollup):
+    class Meta:
+        db_table = 'traffic_metrics_hourly'
+        constraints = [
+            models.UniqueConstraint(fields=['drone_id', 'bucket'], name='traffic_metrics_hourly_drone_bucket_uniq'),
+        ]
+        indexes = [
+            Index(fields=['bucket'], name='tm_hourly_bucket_idx'),
+        ]
+
+class DailyTrafficMetrics(TrafficMetricsRollup):
+    class Meta:
+        db_table = 'traffic_metrics_daily'
+        constraints = [
+            models.UniqueConstraint(fields=['drone_id', 'bucket'], name='traffic_metrics_daily_drone_bucket_uniq'),
+        ]
+        indexes = [
+            Index(fields=['bucket'], name='tm_daily_bucket_idx'),
+        ]
+
+class RollupWatermark(models.Model):
+    """
+    How far a rollup tier has been built: every bucket before `watermark`
+    is complete.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    watermark = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'rollup_watermarks'
+
+    def __str__(self):
+        return f"{self.name} through {self.watermark}"
+
 class HeatMap(TimestampedModel):
     """
     Grid-based heat map data for visualizing traffic patterns
@@ -67,8 +159,10 @@ class HeatMap(TimestampedModel):
     hour = models.IntegerField() # 0-23
     metric_type = models.CharField(max_length=50) # 'speed', 'volume', 'violations'
     
-    # Grid data - JSON structure
-    location_grid = models.JSONField()
+    # Grid data - binary grid (see apps.analytics.grid_codec); older rows
+    # carry a JSON cell list in location_grid instead
+    location_grid = models.JSONField(default=dict, blank=True)
+    grid_data = models.BinaryField(null=True, blank=True)
     
     # Bounds
     min_lat = models.FloatField()
@@ -84,6 +178,31 @@ class HeatMap(TimestampedModel):
             Index(fields=['metric_type', 'date'])
         ]
 
+class HeatMapTile(models.Model):
+    """
+    One Web Mercator tile (z/x/y) of an hourly heat map layer: a square
+    grid of cell values, stored compressed (see apps.analytics.tiles).
+    """
+    date = models.DateField()
+    hour = models.IntegerField() # 0-23
+    metric_type = models.CharField(max_length=50) # 'speed', 'volume', 'violations'
+    z = models.IntegerField()
+    x = models.IntegerField()
+    y = models.IntegerField()
+
+    data = models.BinaryField()
+    cell_count = models.IntegerField(default=0) # Non-empty cells
+    max_value = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'heat_map_tiles'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'hour', 'metric_type', 'z', 'x', 'y'], name='heat_map_tiles_uniq'
+            ),
+        ]
+
 class TrafficPattern(TimestampedModel):
     """
     Identified traffic patterns for predictive analysis
@@ -95,13 +214,15 @@ class TrafficPattern(TimestampedModel):
     )
     
     pattern_type = models.CharField(max_length=50, choices=PATTERN_TYPES)
+    # Stable identity of a mined pattern, so re-runs update it in place
+    pattern_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
     location = models.PointField()
     location_name = models.CharField(max_length=255, blank=True)
     
     # Time pattern
     days_of_week = models.JSONField() # [0, 1, 2...]
     start_hour = models.IntegerField()
-    end_hour = models.IntegerField(null=True, blank=True)
+    end_hour = models.IntegerField(null=True, blank=True) # exclusive, 0-23 (0 is midnight)
     
     # Pattern characteristics
     avg_vehicle_count = models.FloatField(default=0.0)
@@ -0,0 +1,334 @@
+"""
+Traffic pattern mining.
+
+Thirty days of detections are grouped by spatial cell (apps.core.spatial)
+and local hour of the week into matrices of shape (cells, 168), and the
+hourly rollups of TrafficMetrics into a (weeks, 168) matrix of city-wide
+vehicle counts. From those:
+
+- peak hours are the hours of the week whose mean volume stands out
+  (z-score) from the rest of the week; consecutive peak hours form one
+  window, and days sharing a window form one pattern,
+- congestion zones are clusters of adjacent cells with unusually high
+  volume (robust z-score of log vehicles per hour) and below-median speed.
+
+Patterns are upserted on a stable `pattern_key`; mined patterns that no
+longer show up are removed.
+"""
+from datetime import timedelta
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
+from django.utils import timezone
+from scipy import ndimage, stats
+from apps.core import spatial
+from apps.detections.models import Detection
+from apps.violations.models import Violation
+from .models import HourlyTrafficMetrics, TrafficPattern
+from .services import vehicle_count_sql
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WINDOW = timedelta(days=30)
+HOURS_OF_WEEK = 7 * 24
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# Cell size for congestion zones, in metres
+CELL_SIZE = 500
+# A cell needs this many observed hours before it can be a hotspot
+MIN_CELL_HOURS = 3
+PEAK_Z = 1.5
+HOTSPOT_Z = 2.0
+# Observations after which confidence is no longer discounted
+CONFIDENT_WEEKS = 4
+CONFIDENT_CELL_HOURS = 24
+
+# Vehicles, speed and violations per cell and local hour of the week
+CELL_HOURS_SQL = f"""
+    WITH window_detections AS (
+        SELECT
+            d.id, d.track_id, d.speed,
+            d.cell_id >> %(shift)s AS cell,
+            date_trunc('hour', d.timestamp AT TIME ZONE %(tz)s) AS local_hour
+        FROM "{Detection._meta.db_table}" d
+        WHERE d.timestamp >= %(start)s AND d.timestamp < %(end)s AND d.cell_id IS NOT NULL
+    ),
+    detection_violations AS (
+        SELECT v.detection_id, COUNT(*) AS violations
+        FROM "{Violation._meta.db_table}" v
+        JOIN window_detections wd ON wd.id = v.detection_id
+        GROUP BY v.detection_id
+    ),
+    hourly AS (
+        SELECT
+            d.cell,
+            d.local_hour,
+            {vehicle_count_sql()} AS vehicles,
+            COALESCE(SUM(d.speed), 0) AS speed_sum,
+            COUNT(d.speed) AS speed_count,
+            COALESCE(SUM(dv.violations), 0) AS violations
+        FROM window_detections d
+        LEFT JOIN detection_violations dv ON dv.detection_id = d.id
+        GROUP BY 1, 2
+    )
+    SELECT
+        cell,
+        (EXTRACT(ISODOW FROM local_hour)::int - 1) * 24 + EXTRACT(HOUR FROM local_hour)::int,
+        SUM(vehicles), SUM(speed_sum), SUM(speed_count), SUM(violations),
+        COUNT(*) AS hours
+    FROM hourly
+    GROUP BY 1, 2
+"""
+
+# City-wide vehicles per local hour, from the hourly rollups
+CITY_HOURS_SQL = f"""
+    SELECT
+        EXTRACT(EPOCH FROM date_trunc('hour', bucket AT TIME ZONE %(tz)s))::bigint / 3600,
+        SUM(vehicle_count)
+    FROM "{HourlyTrafficMetrics._meta.db_table}"
+    WHERE bucket >= %(start)s AND bucket < %(end)s
+    GROUP BY 1
+"""
+
+
+def load_cell_matrices(start, end, level, tz):
+    """
+    (cells, matrices) where cells are the cell ids and matrices maps
+    vehicles, speed_sum, speed_count, violations and hours to
+    (len(cells), HOURS_OF_WEEK) arrays. None without detections.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(CELL_HOURS_SQL, {
+            'start': start, 'end': end, 'shift': spatial.parent_shift(level), 'tz': tz,
+        })
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+
+    columns = np.array(rows, dtype='f8').T
+    cells, cell_index = np.unique(np.array([row[0] for row in rows], dtype='i8'), return_inverse=True)
+    hour_index = columns[1].astype('i8')
+
+    matrices = {}
+    for name, values in zip(('vehicles', 'speed_sum', 'speed_count', 'violations', 'hours'), columns[2:]):
+        matrix = np.zeros((len(cells), HOURS_OF_WEEK))
+        matrix[cell_index, hour_index] = values
+        matrices[name] = matrix
+    return cells, matrices
+
+
+def load_city_weeks(start, end, tz):
+    """(weeks, HOURS_OF_WEEK) vehicle counts, NaN where an hour was not observed"""
+    with connection.cursor() as cursor:
+        cursor.execute(CITY_HOURS_SQL, {'start': start, 'end': end, 'tz': tz})
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+
+    hours, vehicles = np.array(rows, dtype='f8').T
+    hours = hours.astype('i8')
+    # 1970-01-01 was a Thursday; shift so weeks start on Monday
+    monday_hours = hours + 3 * 24
+    week = monday_hours // HOURS_OF_WEEK
+    weeks = np.full((week.max() - week.min() + 1, HOURS_OF_WEEK), np.nan)
+    weeks[week - week.min(), monday_hours % HOURS_OF_WEEK] = vehicles
+    return weeks
+
+
+def ratio(numerator, denominator):
+    return float(numerator / denominator) if denominator else 0.0
+
+
+def day_runs(mask):
+    """
+    {(start_hour, end_hour): [days]} for the runs of consecutive True hours
+    in a (7, 24) mask. end_hour is exclusive.
+    """
+    runs = {}
+    padded = np.pad(mask.astype('i1'), ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+    for day, start in zip(*np.nonzero(edges == 1)):
+        end = np.flatnonzero(edges[day, start:] == -1)[0] + start
+        runs.setdefault((int(start), int(end)), []).append(int(day))
+    return runs
+
+
+def find_peak_hours(weeks, cells, matrices, level):
+    """TrafficPattern rows (unsaved) for the city-wide peak windows"""
+    observed = ~np.isnan(weeks)
+    observed_weeks = observed.sum(axis=0)
+    seen = observed_weeks > 0
+    if seen.sum() < 2:
+        return []
+
+    mean = np.zeros(HOURS_OF_WEEK)
+    mean[seen] = np.nanmean(weeks[:, seen], axis=0)
+    spread = mean[seen].std()
+    if not spread:
+        return []
+    z = np.where(seen, (mean - mean[seen].mean()) / spread, 0.0)
+
+    # How reliably each hour beats its own week's median
+    week_medians = np.nanmedian(weeks, axis=1, keepdims=True)
+    above = np.where(observed, weeks > week_medians, False).sum(axis=0)
+    consistency = np.divide(above, observed_weeks, out=np.zeros(HOURS_OF_WEEK), where=seen)
+
+    patterns = []
+    for (start_hour, end_hour), days in day_runs((z >= PEAK_Z).reshape(7, 24)).items():
+        hours = np.array([day * 24 + hour for day in days for hour in range(start_hour, end_hour)])
+        vehicles = matrices['vehicles'][:, hours].sum(axis=1) if cells is not None else None
+        # Without located detections there is nothing better than the origin
+        location, location_name = Point(0, 0), ''
+        if vehicles is not None and vehicles.any():
+            lats, lons = spatial.cell_centers([cells[vehicles.argmax()]], level)
+            location, location_name = Point(float(lons[0]), float(lats[0])), 'Busiest cell during the peak'
+        totals = {
+            name: matrices[name][:, hours].sum() if cells is not None else 0.0
+            for name in ('vehicles', 'speed_sum', 'speed_count', 'violations')
+        }
+
+        day_names = ', '.join(DAY_NAMES[day] for day in days)
+        # Stored like every pattern's end hour: exclusive, 0 for midnight
+        end_hour %= 24
+        weeks_seen = observed_weeks[hours].min()
+        patterns.append(TrafficPattern(
+            pattern_key=f"peak_hour:{''.join(map(str, days))}:{start_hour}-{end_hour}",
+            pattern_type='peak_hour',
+            location=location,
+            location_name=location_name,
+            days_of_week=days,
+            start_hour=start_hour,
+            end_hour=end_hour,
+            avg_vehicle_count=round(float(mean[hours].mean()), 2),
+            avg_speed=round(ratio(totals['speed_sum'], totals['speed_count']), 2),
+            violation_rate=round(ratio(totals['violations'], totals['vehicles']), 4),
+            confidence_score=round(float(consistency[hours].mean()) * min(1.0, weeks_seen / CONFIDENT_WEEKS), 3),
+            sample_size=int(observed_weeks[hours].sum()),
+            recommendations=(
+                f"Peak traffic {start_hour:02d}:00-{end_hour:02d}:00 on {day_names}. "
+                f"Schedule traffic control and patrols ahead of the peak."
+            ),
+        ))
+    return patterns
+
+
+def find_congestion_zones(cells, matrices, level):
+    """TrafficPattern rows (unsaved) for clusters of busy, slow cells"""
+    hours = matrices['hours'].sum(axis=1)
+    vehicles = matrices['vehicles'].sum(axis=1)
+    speed_sum = matrices['speed_sum'].sum(axis=1)
+    speed_count = matrices['speed_count'].sum(axis=1)
+    eligible = (hours >= MIN_CELL_HOURS) & (vehicles > 0)
+    if eligible.sum() < 3:
+        return []
+
+    # Vehicles per observed hour, on a log scale with a robust z-score
+    rate = np.divide(vehicles, hours, out=np.zeros_like(vehicles), where=hours > 0)
+    log_rate = np.log1p(rate)
+    median = np.median(log_rate[eligible])
+    mad = 1.4826 * np.median(np.abs(log_rate[eligible] - median))
+    if not mad:
+        return []
+    z = (log_rate - median) / mad
+    hot = eligible & (z >= HOTSPOT_Z)
+    if not hot.any():
+        return []
+
+    # Adjacent hot cells (including diagonals) form one zone
+    cols, rows = spatial.cell_coords(cells[hot])
+    grid = np.zeros((rows.max() - rows.min() + 1, cols.max() - cols.min() + 1), dtype=bool)
+    grid[rows - rows.min(), cols - cols.min()] = True
+    labels, count = ndimage.label(grid, structure=np.ones((3, 3)))
+    cluster = labels[rows - rows.min(), cols - cols.min()]
+
+    city_speed = np.median(np.divide(speed_sum, speed_count, out=np.zeros_like(speed_sum), where=speed_count > 0)[eligible])
+    hot_index = np.flatnonzero(hot)
+    lats, lons = spatial.cell_centers(cells[hot], level)
+
+    patterns = []
+    for label in range(1, count + 1):
+        members = cluster == label
+        index = hot_index[members]
+        avg_speed = ratio(speed_sum[index].sum(), speed_count[index].sum())
+        if not speed_count[index].sum() or avg_speed >= city_speed:
+            # Busy but flowing, or no speeds to tell
+            continue
+
+        weights = vehicles[index]
+        profile = matrices['vehicles'][index].sum(axis=0)
+        profile_hours = matrices['hours'][index].sum(axis=0)
+        by_day = profile.reshape(7, 24).sum(axis=1) / np.maximum(profile_hours.reshape(7, 24).sum(axis=1), 1)
+        by_hour = profile.reshape(7, 24).sum(axis=0) / np.maximum(profile_hours.reshape(7, 24).sum(axis=0), 1)
+        days = [int(day) for day in np.flatnonzero(by_day >= by_day[by_day > 0].mean())]
+        # The run of busy hours around the busiest one
+        busy = by_hour >= 0.75 * by_hour.max()
+        peak = int(by_hour.argmax())
+        start_hour, end_hour = peak, peak + 1
+        while start_hour > 0 and busy[start_hour - 1]:
+            start_hour -= 1
+        while end_hour < 24 and busy[end_hour]:
+            end_hour += 1
+
+        anchor = cells[index[weights.argmax()]]
+        sample_hours = hours[index].sum()
+        patterns.append(TrafficPattern(
+            pattern_key=f"congestion:{level}:{anchor}",
+            pattern_type='congestion',
+            location=Point(float(np.average(lons[members], weights=weights)), float(np.average(lats[members], weights=weights))),
+            location_name=f"{members.sum()} cells of {round(spatial.cell_area_m2(level) / 1e6, 2)} km2",
+            days_of_week=days,
+            start_hour=start_hour,
+            end_hour=end_hour % 24,
+            avg_vehicle_count=round(float(rate[index].sum()), 2),
+            avg_speed=round(avg_speed, 2),
+            violation_rate=round(ratio(matrices['violations'][index].sum(), weights.sum()), 4),
+            confidence_score=round(float(stats.norm.cdf(z[index].mean())) * min(1.0, sample_hours / CONFIDENT_CELL_HOURS), 3),
+            sample_size=int(sample_hours),
+            recommendations=(
+                f"Congestion around {start_hour:02d}:00-{end_hour % 24:02d}:00 "
+                f"(average {avg_speed:.0f} km/h against {city_speed:.0f} km/h city-wide). "
+                f"Consider signal timing review and a traffic officer on site."
+            ),
+        ))
+    return patterns
+
+
+UPDATE_FIELDS = [
+    'pattern_type', 'location', 'location_name', 'days_of_week', 'start_hour', 'end_hour',
+    'avg_vehicle_count', 'avg_speed', 'violation_rate', 'confidence_score', 'sample_size',
+    'recommendations', 'updated_at',
+]
+
+
+def mine_traffic_patterns(now=None):
+    """Mine the last WINDOW of traffic and store the patterns. Returns them."""
+    end = now or timezone.now()
+    start = end - WINDOW
+    tz = timezone.get_current_timezone_name()
+    level = spatial.level_for_size(CELL_SIZE)
+
+    loaded = load_cell_matrices(start, end, level, tz)
+    cells, matrices = loaded if loaded is not None else (None, None)
+    weeks = load_city_weeks(start, end, tz)
+
+    patterns = []
+    if weeks is not None:
+        patterns += find_peak_hours(weeks, cells, matrices, level)
+    if cells is not None:
+        patterns += find_congestion_zones(cells, matrices, level)
+
+    with transaction.atomic():
+        TrafficPattern.objects.bulk_create(
+            patterns, update_conflicts=True, unique_fields=['pattern_key'], update_fields=UPDATE_FIELDS
+        )
+        # Mined patterns that did not come up again; hand-made ones have no key
+        stale = TrafficPattern.objects.filter(pattern_key__isnull=False).exclude(
+            pattern_key__in=[p.pattern_key for p in patterns]
+        ).delete()[0]
+
+    logger.info(
+        f"Mined {len(patterns)} traffic patterns "
+        f"({sum(p.pattern_type == 'peak_hour' for p in patterns)} peak hours), removed {stale} stale"
+    )
+    return patterns
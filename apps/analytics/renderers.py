@@ -0,0 +1,16 @@
+from rest_framework.renderers import BaseRenderer
+from .grid_codec import MEDIA_TYPE
+
+
+class HeatMapGridRenderer(BaseRenderer):
+    """Passes an encoded heat map grid through as the response body"""
+    media_type = MEDIA_TYPE
+    format = 'grid'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return bytes(data)
+        # Errors and empty results have no binary form
+        return b''
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from .models import TrafficMetrics, HourlyTrafficMetrics, DailyTrafficMetrics, RollupWatermark
+import logging
+
+logger = logging.getLogger(__name__)
+
+COUNT_COLUMNS = [
+    'vehicle_count', 'car_count', 'truck_count', 'motorcycle_count', 'bus_count',
+    'violation_count', 'citation_count', 'sample_size',
+]
+
+# Each tier is built from the one below it. TrafficMetrics rows are stamped
+# with the end of their 5-minute window, so `offset` shifts them to its
+# start before they are placed in a bucket.
+TIERS = {
+    'hour': {
+        'model': HourlyTrafficMetrics,
+        'unit': 'hour',
+        'step': timedelta(hours=1),
+        'source': TrafficMetrics,
+        'time_field': 'timestamp',
+        'offset': timedelta(minutes=5),
+        'windows': 'COUNT(*)',
+        # Recomputed on every refresh so late or re-run 5-minute windows land
+        'lookback': timedelta(hours=2),
+        'chunk': timedelta(days=7),
+    },
+    'day': {
+        'model': DailyTrafficMetrics,
+        'unit': 'day',
+        'step': timedelta(days=1),
+        'source': HourlyTrafficMetrics,
+        'time_field': 'bucket',
+        'offset': timedelta(0),
+        'windows': 'SUM(window_count)',
+        'lookback': timedelta(days=1),
+        'chunk': timedelta(days=90),
+        'after': 'hour',
+    },
+}
+
+# Coarsest first, for picking a tier to read
+READ_TIERS = [
+    ('day', DailyTrafficMetrics, timedelta(days=1)),
+    ('hour', HourlyTrafficMetrics, timedelta(hours=1)),
+]
+
+
+def truncate(dt, step):
+    """Floor an aware datetime to the hour or UTC day"""
+    dt = dt.astimezone(dt_timezone.utc)
+    if step >= timedelta(days=1):
+        return datetime(dt.year, dt.month, dt.day, tzinfo=dt_timezone.utc)
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_sql(tier):
+    config = TIERS[tier]
+    source = config['source']._meta.db_table
+    target = config['model']._meta.db_table
+    time = config['time_field']
+    if config['offset']:
+        time = f"{time} - interval '{int(config['offset'].total_seconds())} seconds'"
+    # Sample-weighted mean and pooled variance: E[x^2] - E[x]^2 over the windows
+    mean = 'SUM(average_speed * sample_size) / NULLIF(SUM(sample_size), 0)'
+    mean_square = 'SUM(sample_size * (speed_variance + average_speed * average_speed)) / NULLIF(SUM(sample_size), 0)'
+    columns = ['bucket', 'drone_id', 'location'] + COUNT_COLUMNS + [
+        'average_speed', 'max_speed', 'min_speed', 'speed_variance', 'window_count',
+    ]
+    return f"""
+        INSERT INTO "{target}" ({', '.join(columns)})
+        SELECT
+            date_trunc('{config['unit']}', {time}) AS bucket,
+            drone_id,
+            (ARRAY_AGG(location ORDER BY {time} DESC))[1],
+            {', '.join(f'SUM({c})' for c in COUNT_COLUMNS)},
+            COALESCE({mean}, 0),
+            MAX(max_speed),
+            MIN(min_speed),
+            GREATEST(COALESCE({mean_square} - ({mean}) ^ 2, 0), 0),
+            {config['windows']}
+        FROM "{source}"
+        WHERE {config['time_field']} >= %s AND {config['time_field']} < %s
+        GROUP BY 1, drone_id
+        ON CONFLICT (drone_id, bucket) DO UPDATE SET
+            {', '.join(f'{c} = EXCLUDED.{c}' for c in columns[2:])}
+    """
+
+
+def get_watermark(name):
+    return RollupWatermark.objects.filter(name=name).values_list('watermark', flat=True).first()
+
+
+def refresh_rollup(tier, now=None):
+    """
+    Build the tier's complete buckets since its watermark (minus the
+    lookback) and advance the watermark. Returns the number of rows written.
+    """
+    config = TIERS[tier]
+    step = config['step']
+    end = truncate(now or timezone.now(), step)
+    if 'after' in config:
+        # Never run ahead of the tier this one is built from
+        source_watermark = get_watermark(config['after'])
+        if source_watermark is None:
+            return 0
+        end = min(end, truncate(source_watermark, step))
+
+    watermark = get_watermark(tier)
+    if watermark is not None:
+        start = watermark - config['lookback']
+    else:
+        first = config['source'].objects.aggregate(first=Min(config['time_field']))['first']
+        if first is None:
+            return 0
+        start = truncate(first - config['offset'], step)
+
+    written = 0
+    sql = rollup_sql(tier)
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + config['chunk'], end)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Bounds shifted onto the raw column so its index can be used
+            cursor.execute(sql, [chunk_start + config['offset'], chunk_end + config['offset']])
+            written += cursor.rowcount
+            RollupWatermark.objects.update_or_create(name=tier, defaults={'watermark': chunk_end})
+        chunk_start = chunk_end
+
+    if written:
+        logger.info(f"Rolled up {written} {tier} buckets in [{start:%Y-%m-%d %H:%M}, {end:%Y-%m-%d %H:%M})")
+    return written
+
+
+def metrics_tier(start, end):
+    """
+    The coarsest tier that can answer [start, end): its buckets must tile
+    the range exactly and be built through `end`. Falls back to the raw
+    5-minute TrafficMetrics. Returns (tier name, queryset).
+    """
+    for name, model, step in READ_TIERS:
+        aligned = truncate(start, step) == start and truncate(end, step) == end
+        watermark = get_watermark(name)
+        if aligned and end - start >= step and watermark is not None and watermark >= end:
+            return name, model.objects.filter(bucket__gte=start, bucket__lt=end)
+    # 5-minute rows are stamped with their window end
+    return '5min', TrafficMetrics.objects.filter(timestamp__gt=start, timestamp__lte=end)
@@ -1,9 +1,447 @@
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
 from django.db.models import Count, Avg, F
 from django.utils import timezone
 from datetime import timedelta
 from apps.violations.models import Violation
 from apps.detections.models import Detection
-from .models import Recommendation
+from apps.drones.models import Drone, GPSLocation
+from .models import Recommendation, TrafficMetrics, ZoneSpeedSketch
+from .rollups import truncate
+from .sketch import DDSketch, MIN_VALUE as SKETCH_MIN_VALUE, merge_all
+from .grid_codec import encode_cells, decode_cells, grid_cells
+from apps.core import spatial
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METRIC_VEHICLE_TYPES = ('car', 'truck', 'motorcycle', 'bus')
+
+METERS_PER_DEGREE = 111320
+
+
+def vehicle_count_sql(condition='TRUE'):
+    """
+    SQL aggregate counting vehicles among the detections aliased `d` that
+    match `condition`: tracked vehicles count once per track, untracked
+    detections individually. Tracker ids restart with every stream, so a
+    track is identified by its drone and session as well.
+    """
+    return (
+        f"COUNT(DISTINCT (d.drone_id, d.session_id, d.track_id)) "
+        f"FILTER (WHERE d.track_id IS NOT NULL AND {condition}) "
+        f"+ COUNT(*) FILTER (WHERE d.track_id IS NULL AND {condition})"
+    )
+
+
+_TYPE_COUNTS = ',\n            '.join(
+    f"{vehicle_count_sql(f'd.vehicle_type = %(type_{t})s')} AS {t}_count" for t in METRIC_VEHICLE_TYPES
+)
+
+TRAFFIC_METRICS_SQL = f"""
+    WITH window_detections AS (
+        SELECT
+            d.drone_id AS drone_pk,
+            {vehicle_count_sql()} AS vehicle_count,
+            {_TYPE_COUNTS},
+            COALESCE(AVG(d.speed), 0) AS average_speed,
+            COALESCE(MAX(d.speed), 0) AS max_speed,
+            COALESCE(MIN(d.speed), 0) AS min_speed,
+            COALESCE(VAR_POP(d.speed), 0) AS speed_variance,
+            COUNT(*) AS sample_size
+        FROM "{Detection._meta.db_table}" d
+        WHERE d.timestamp >= %(start)s AND d.timestamp < %(end)s
+        GROUP BY d.drone_id
+    ),
+    window_violations AS (
+        SELECT
+            d.drone_id AS drone_pk,
+            COUNT(*) AS violation_count,
+            COUNT(*) FILTER (WHERE v.status = %(citation_status)s) AS citation_count
+        FROM "{Violation._meta.db_table}" v
+        JOIN "{Detection._meta.db_table}" d ON d.id = v.detection_id
+        WHERE v.created_at >= %(start)s AND v.created_at < %(end)s
+        GROUP BY d.drone_id
+    )
+    SELECT
+        dr.drone_id,
+        wd.vehicle_count,
+        {', '.join(f'wd.{t}_count' for t in METRIC_VEHICLE_TYPES)},
+        wd.average_speed, wd.max_speed, wd.min_speed, wd.speed_variance, wd.sample_size,
+        COALESCE(wv.violation_count, 0),
+        COALESCE(wv.citation_count, 0),
+        ST_X(gps.location::geometry),
+        ST_Y(gps.location::geometry)
+    FROM window_detections wd
+    JOIN "{Drone._meta.db_table}" dr ON dr.id = wd.drone_pk
+    LEFT JOIN window_violations wv ON wv.drone_pk = wd.drone_pk
+    LEFT JOIN LATERAL (
+        SELECT g.location
+        FROM "{GPSLocation._meta.db_table}" g
+        WHERE g.drone_id = wd.drone_pk
+        ORDER BY g.timestamp DESC
+        LIMIT 1
+    ) gps ON TRUE
+"""
+
+
+# Speed histogram on the DDSketch bins per drone and cell: the sketches are
+# built from these counts, so no raw speeds leave the database. The bin is
+# NULL for speeds counted in the sketch's zero bin.
+SPEED_BINS_SQL = f"""
+    SELECT
+        dr.drone_id,
+        d.cell_id >> %(shift)s,
+        CASE WHEN d.speed > %(min_value)s THEN CEIL(LN(d.speed) / %(ln_gamma)s)::int END,
+        COUNT(*)
+    FROM "{Detection._meta.db_table}" d
+    JOIN "{Drone._meta.db_table}" dr ON dr.id = d.drone_id
+    WHERE d.timestamp >= %(start)s AND d.timestamp < %(end)s AND d.speed IS NOT NULL
+    GROUP BY 1, 2, 3
+"""
+
+# Per-cell sums over the precomputed cell ids, in one pass over the window's
+# detections. `level` is chosen well below the output grid resolution.
+HEAT_MAP_SQL = f"""
+    WITH window_detections AS (
+        SELECT d.id, d.speed, d.cell_id >> %(shift)s AS cell
+        FROM "{Detection._meta.db_table}" d
+        WHERE d.timestamp >= %(start)s AND d.timestamp < %(end)s AND d.cell_id IS NOT NULL
+    ),
+    detection_violations AS (
+        SELECT v.detection_id, COUNT(*) AS violations
+        FROM "{Violation._meta.db_table}" v
+        JOIN window_detections wd ON wd.id = v.detection_id
+        GROUP BY v.detection_id
+    )
+    SELECT
+        wd.cell,
+        COUNT(*) AS volume,
+        COALESCE(SUM(wd.speed), 0) AS speed_sum,
+        COUNT(wd.speed) AS speed_count,
+        COALESCE(SUM(dv.violations), 0) AS violations
+    FROM window_detections wd
+    LEFT JOIN detection_violations dv ON dv.detection_id = wd.id
+    GROUP BY 1
+"""
+
+# Detections per cell with speed and violation totals, busiest first
+HOTSPOTS_SQL = f"""
+    WITH window_detections AS (
+        SELECT d.id, d.speed, d.cell_id >> %(shift)s AS cell
+        FROM "{Detection._meta.db_table}" d
+        WHERE d.timestamp >= %(start)s AND d.timestamp < %(end)s AND d.cell_id IS NOT NULL
+    )
+    SELECT
+        wd.cell,
+        COUNT(*) AS detections,
+        AVG(wd.speed) AS average_speed,
+        COUNT(v.id) AS violations
+    FROM window_detections wd
+    LEFT JOIN "{Violation._meta.db_table}" v ON v.detection_id = wd.id
+    GROUP BY 1
+    ORDER BY 2 DESC
+    LIMIT %(limit)s
+"""
+
+# GPS fixes per cell: how often and by how many drones each cell was covered
+COVERAGE_SQL = f"""
+    SELECT
+        g.cell_id >> %(shift)s AS cell,
+        COUNT(*) AS fixes,
+        COUNT(DISTINCT g.drone_id) AS drones,
+        MAX(g.timestamp) AS last_seen
+    FROM "{GPSLocation._meta.db_table}" g
+    WHERE g.timestamp >= %(start)s AND g.timestamp < %(end)s AND g.cell_id IS NOT NULL
+    GROUP BY 1
+"""
+
+HEAT_MAP_LAYERS = ('volume', 'speed', 'violations')
+
+# Upper bounds of the green and yellow bands; anything above is red
+HEAT_MAP_COLOR_BANDS = {
+    'volume': (10, 50),
+    'speed': (40, 70),
+    'violations': (1, 5),
+}
+
+
+class HeatMapService:
+    # Approximately 100m
+    GRID_RESOLUTION = 0.001
+
+    @staticmethod
+    def build_layers(start, end, resolution=None):
+        """
+        Bin the detections in [start, end) into grid cells. Detections are
+        grouped by their precomputed cell ids and the cells folded into the
+        grid, so no geometry is read.
+
+        Returns (layers, bounds): layers maps each of HEAT_MAP_LAYERS to its
+        encoded grid (see grid_codec), bounds is (min_lat, max_lat,
+        min_lon, max_lon) of the detections. Both are None when there were
+        no detections.
+        """
+        resolution = resolution or HeatMapService.GRID_RESOLUTION
+        # Cells an eighth of a grid step across, so few straddle two bins
+        level = spatial.level_for_size(resolution * METERS_PER_DEGREE / 8)
+        with connection.cursor() as cursor:
+            cursor.execute(HEAT_MAP_SQL, {'start': start, 'end': end, 'shift': spatial.parent_shift(level)})
+            rows = cursor.fetchall()
+        if not rows:
+            return None, None
+
+        cells = np.array([row[0] for row in rows], dtype='i8')
+        volume, speed_sum, speed_count, violations = np.array([row[1:] for row in rows], dtype='f8').T
+        lats, lons = spatial.cell_centers(cells, level)
+        lat_idx = np.floor(lats / resolution).astype('i8')
+        lon_idx = np.floor(lons / resolution).astype('i8')
+        row0, col0 = lat_idx.min(), lon_idx.min()
+        rows, cols = int(lat_idx.max() - row0 + 1), int(lon_idx.max() - col0 + 1)
+        # Sums per occupied grid cell only; the bounding box of far apart
+        # patrol areas is mostly empty and never allocated
+        indices, inverse = np.unique((lat_idx - row0) * cols + (lon_idx - col0), return_inverse=True)
+
+        def accumulate(values):
+            return np.bincount(inverse, weights=values, minlength=len(indices))
+
+        speed_counts = accumulate(speed_count)
+        sums = {
+            'volume': accumulate(volume),
+            'speed': np.divide(
+                accumulate(speed_sum), speed_counts, out=np.zeros(len(indices)), where=speed_counts > 0
+            ),
+            'violations': accumulate(violations),
+        }
+        layers = {
+            layer: encode_cells(rows, cols, indices, sums[layer], row0 * resolution, col0 * resolution, resolution)
+            for layer in HEAT_MAP_LAYERS
+        }
+
+        # Detections are known to the cell, so bounds are to the cell centre
+        bounds = (float(lats.min()), float(lats.max()), float(lons.min()), float(lons.max()))
+        return layers, bounds
+
+    @staticmethod
+    def cells(heat_map):
+        """JSON cell list of a HeatMap, from its binary grid when it has one"""
+        if not heat_map.grid_data:
+            return heat_map.location_grid.get('cells', [])
+        header, indices, values = decode_cells(heat_map.grid_data)
+        return grid_cells(header, indices, values, HEAT_MAP_COLOR_BANDS[heat_map.metric_type])
+
+class SpatialAggregationService:
+    """Hotspots and coverage as integer GROUP BYs over precomputed cell ids"""
+
+    # Default cell size for hotspots and coverage, in metres
+    CELL_SIZE = 250
+
+    @staticmethod
+    def _cells(rows, level):
+        lats, lons = spatial.cell_centers([row[0] for row in rows], level)
+        return [
+            {'cell_id': row[0], 'lat': round(lat, 6), 'lon': round(lon, 6)}
+            for row, lat, lon in zip(rows, lats.tolist(), lons.tolist())
+        ]
+
+    @staticmethod
+    def hotspots(start, end, cell_size=None, limit=50):
+        """The `limit` busiest cells of [start, end) by detections"""
+        level = spatial.level_for_size(cell_size or SpatialAggregationService.CELL_SIZE)
+        with connection.cursor() as cursor:
+            cursor.execute(HOTSPOTS_SQL, {
+                'start': start, 'end': end, 'shift': spatial.parent_shift(level), 'limit': limit,
+            })
+            rows = cursor.fetchall()
+
+        cells = SpatialAggregationService._cells(rows, level)
+        for cell, (_, detections, average_speed, violations) in zip(cells, rows):
+            cell.update({
+                'detections': detections,
+                'average_speed': round(average_speed, 2) if average_speed is not None else None,
+                'violations': violations,
+            })
+        return level, cells
+
+    @staticmethod
+    def coverage(start, end, cell_size=None):
+        """Cells visited by any drone in [start, end), from the GPS track"""
+        level = spatial.level_for_size(cell_size or SpatialAggregationService.CELL_SIZE)
+        with connection.cursor() as cursor:
+            cursor.execute(COVERAGE_SQL, {'start': start, 'end': end, 'shift': spatial.parent_shift(level)})
+            rows = cursor.fetchall()
+
+        cells = SpatialAggregationService._cells(rows, level)
+        for cell, (_, fixes, drones, last_seen) in zip(cells, rows):
+            cell.update({'fixes': fixes, 'drones': drones, 'last_seen': last_seen})
+        return level, cells
+
+class TrafficMetricsService:
+    @staticmethod
+    def aggregate_window(start, end):
+        """
+        TrafficMetrics rows (unsaved) for every drone with detections in
+        [start, end), timestamped `end`. One grouped query regardless of
+        fleet size.
+        """
+        params = {
+            'start': start,
+            'end': end,
+            'citation_status': 'CITATION_SENT',
+            **{f'type_{t}': t for t in METRIC_VEHICLE_TYPES},
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(TRAFFIC_METRICS_SQL, params)
+            rows = cursor.fetchall()
+
+        metrics = []
+        for row in rows:
+            (drone_id, vehicle_count, car_count, truck_count, motorcycle_count, bus_count,
+             average_speed, max_speed, min_speed, speed_variance, sample_size,
+             violation_count, citation_count, lon, lat) = row
+            metrics.append(TrafficMetrics(
+                timestamp=end,
+                location=Point(lon, lat) if lon is not None else Point(0, 0),
+                drone_id=drone_id,
+                vehicle_count=vehicle_count,
+                car_count=car_count,
+                truck_count=truck_count,
+                motorcycle_count=motorcycle_count,
+                bus_count=bus_count,
+                average_speed=average_speed,
+                max_speed=max_speed,
+                min_speed=min_speed,
+                speed_variance=speed_variance,
+                violation_count=violation_count,
+                citation_count=citation_count,
+                sample_size=sample_size
+            ))
+        return metrics
+
+    @staticmethod
+    def speed_sketches(start, end):
+        """
+        ({drone_id: DDSketch}, {cell_id: DDSketch}) of the speeds detected in
+        [start, end), cells at SpeedPercentileService.ZONE_LEVEL
+        """
+        bins = DDSketch()
+        with connection.cursor() as cursor:
+            cursor.execute(SPEED_BINS_SQL, {
+                'start': start,
+                'end': end,
+                'shift': spatial.parent_shift(SpeedPercentileService.ZONE_LEVEL),
+                'min_value': SKETCH_MIN_VALUE,
+                'ln_gamma': bins.ln_gamma,
+            })
+            rows = cursor.fetchall()
+
+        def collect(groups, key, bin_key, count):
+            keys, counts, zeros = groups.setdefault(key, ([], [], [0]))
+            if bin_key is None:
+                zeros[0] += count
+            else:
+                keys.append(bin_key)
+                counts.append(count)
+
+        drones, cells = {}, {}
+        for drone_id, cell, bin_key, count in rows:
+            collect(drones, drone_id, bin_key, count)
+            if cell is not None:
+                collect(cells, cell, bin_key, count)
+
+        def build(groups):
+            sketches = {}
+            for key, (keys, counts, zeros) in groups.items():
+                sketch = sketches[key] = DDSketch().add_counts(keys, counts)
+                sketch.zero_count = zeros[0]
+            return sketches
+
+        return build(drones), build(cells)
+
+    @staticmethod
+    def rollup(start, end):
+        """Replace the window's TrafficMetrics, so a rerun does not duplicate rows"""
+        metrics = TrafficMetricsService.aggregate_window(start, end)
+        drone_sketches, cell_sketches = TrafficMetricsService.speed_sketches(start, end)
+        for metric in metrics:
+            sketch = drone_sketches.get(metric.drone_id)
+            metric.speed_sketch = sketch.to_bytes() if sketch is not None else None
+        zones = [
+            ZoneSpeedSketch(
+                timestamp=end, level=SpeedPercentileService.ZONE_LEVEL, cell_id=cell,
+                sample_size=sketch.count, sketch=sketch.to_bytes()
+            )
+            for cell, sketch in cell_sketches.items()
+        ]
+        with transaction.atomic():
+            TrafficMetrics.objects.filter(timestamp=end).delete()
+            TrafficMetrics.objects.bulk_create(metrics)
+            ZoneSpeedSketch.objects.filter(timestamp=end).delete()
+            ZoneSpeedSketch.objects.bulk_create(zones, batch_size=1000)
+        logger.info(f"Aggregated metrics for {len(metrics)} drones in [{start:%H:%M}, {end:%H:%M})")
+        return metrics
+
+
+class SpeedPercentileService:
+    """
+    Speed percentiles over any time range, merged from the 5-minute
+    sketches stored with TrafficMetrics (per drone) and ZoneSpeedSketch
+    (per cell) rather than read from detections
+    """
+
+    # About 500m cells
+    ZONE_LEVEL = spatial.level_for_size(500)
+    PERCENTILES = (50, 85, 95)
+    GROUPS = ('none', 'hour', 'drone', 'zone')
+
+    @staticmethod
+    def percentiles(start, end, group_by='none', drone_id=None, cell_id=None, percentiles=PERCENTILES):
+        """
+        [{group, count, p50, ...}] for the windows ending in (start, end].
+        Drone filters and groups read TrafficMetrics; a cell filter or
+        zone grouping reads the zone sketches.
+        """
+        zones = cell_id is not None or group_by == 'zone'
+        if zones:
+            queryset = ZoneSpeedSketch.objects.filter(
+                level=SpeedPercentileService.ZONE_LEVEL, timestamp__gt=start, timestamp__lte=end
+            )
+            if cell_id is not None:
+                queryset = queryset.filter(cell_id=cell_id)
+            rows = queryset.values_list('timestamp', 'cell_id', 'sketch')
+        else:
+            queryset = TrafficMetrics.objects.filter(
+                timestamp__gt=start, timestamp__lte=end, speed_sketch__isnull=False
+            )
+            if drone_id:
+                queryset = queryset.filter(drone_id=drone_id)
+            rows = queryset.values_list('timestamp', 'drone_id', 'speed_sketch')
+
+        groups = {}
+        for timestamp, subject, blob in rows.iterator(chunk_size=2000):
+            if group_by == 'hour':
+                # Windows are stamped with their end
+                key = truncate(timestamp - timedelta(minutes=5), timedelta(hours=1))
+            elif group_by in ('drone', 'zone'):
+                key = subject
+            else:
+                key = None
+            groups.setdefault(key, []).append(blob)
+
+        results = []
+        for key, blobs in sorted(groups.items(), key=lambda item: (item[0] is None, item[0])):
+            sketch = merge_all(blobs)
+            result = {'group': key, 'count': sketch.count}
+            if group_by == 'zone':
+                lats, lons = spatial.cell_centers([key], SpeedPercentileService.ZONE_LEVEL)
+                result.update({'lat': round(float(lats[0]), 6), 'lon': round(float(lons[0]), 6)})
+            for p in percentiles:
+                value = sketch.quantile(p / 100)
+                result[f'p{p:g}'] = round(value, 1) if value is not None else None
+            results.append(result)
+        return results
+
 
 class InferenceEngine:
     @staticmethod
@@ -12,8 +450,9 @@ class InferenceEngine:
         Runs heuristics/models to generate recommendations.
         Should be run periodically (e.g. daily/hourly task).
         """
-        # Clear old active recommendations (optional, or archive them)
-        Recommendation.objects.filter(is_active=True).update(is_active=False)
+        # Clear old active recommendations (optional, or archive them);
+        # streamed anomalies are retired by the analytics consumer
+        Recommendation.objects.filter(is_active=True).exclude(metadata__source='anomaly').update(is_active=False)
         
         last_24h = timezone.now() - timedelta(hours=24)
         last_7d = timezone.now() - timedelta(days=7)
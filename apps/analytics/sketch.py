@@ -0,0 +1,121 @@
+"""
+DDSketch: a mergeable quantile sketch with relative-error guarantees.
+
+Positive values fall into logarithmic bins: key = ceil(log_gamma(x)) with
+gamma = (1 + a) / (1 - a), so every quantile is answered within a
+relative error of `a` (1% by default). Values at or below MIN_VALUE are
+counted in a separate zero bin. Two sketches with the same accuracy merge
+by adding their bin counts, which is what makes them usable as rollups.
+
+Serialised form (little-endian):
+
+    header   magic 'DDSK', version, relative accuracy (float64),
+             zero count, first key (int32), number of keys (uint32)
+    payload  zlib-compressed uint32 counts of the consecutive keys
+"""
+import math
+import numpy as np
+import struct
+import zlib
+
+MAGIC = b'DDSK'
+VERSION = 1
+HEADER = struct.Struct('<4sBdIiI')
+RELATIVE_ACCURACY = 0.01
+# Speeds below this (km/h) count as standing still
+MIN_VALUE = 0.5
+
+
+class DDSketch:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.ln_gamma = math.log(self.gamma)
+        self.zero_count = 0
+        self.offset = 0
+        self.counts = np.zeros(0, dtype='i8')
+
+    @property
+    def count(self):
+        return self.zero_count + int(self.counts.sum())
+
+    def keys_for(self, values):
+        return np.ceil(np.log(values) / self.ln_gamma).astype('i8')
+
+    def add(self, values):
+        """Add an array of values; NaNs are ignored"""
+        values = np.asarray(values, dtype='f8')
+        values = values[~np.isnan(values)]
+        positive = values > MIN_VALUE
+        self.zero_count += int((~positive).sum())
+        self.add_counts(self.keys_for(values[positive]), np.ones(int(positive.sum()), dtype='i8'))
+        return self
+
+    def add_counts(self, keys, counts):
+        """Add `counts` values to bins `keys` (as from a SQL GROUP BY on the key)"""
+        keys = np.asarray(keys, dtype='i8')
+        if not len(keys):
+            return self
+        counts = np.asarray(counts, dtype='i8')
+        low = min(keys.min(), self.offset) if len(self.counts) else keys.min()
+        high = max(keys.max(), self.offset + len(self.counts) - 1) if len(self.counts) else keys.max()
+        merged = np.zeros(high - low + 1, dtype='i8')
+        merged[self.offset - low:self.offset - low + len(self.counts)] = self.counts
+        np.add.at(merged, keys - low, counts)
+        self.offset, self.counts = int(low), merged
+        return self
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches of different accuracy')
+        self.zero_count += other.zero_count
+        return self.add_counts(np.arange(other.offset, other.offset + len(other.counts)), other.counts)
+
+    def value(self, key):
+        # Midpoint of the bin (gamma^(key-1), gamma^key] in relative terms
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), or None for an empty sketch"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        return self.value(self.offset + min(index, len(self.counts) - 1))
+
+    def to_bytes(self):
+        header = HEADER.pack(MAGIC, VERSION, self.relative_accuracy, self.zero_count, self.offset, len(self.counts))
+        return header + zlib.compress(self.counts.astype('<u4').tobytes(), 6)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        magic, version, relative_accuracy, zero_count, offset, length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a DDSketch')
+        sketch = cls(relative_accuracy)
+        sketch.zero_count = zero_count
+        sketch.offset = offset
+        sketch.counts = np.frombuffer(zlib.decompress(data[HEADER.size:]), dtype='<u4', count=length).astype('i8')
+        return sketch
+
+
+def merge_all(blobs, relative_accuracy=RELATIVE_ACCURACY):
+    """One sketch from many serialised ones (empty entries are skipped)"""
+    sketch = DDSketch(relative_accuracy)
+    keys, counts = [], []
+    for blob in blobs:
+        if not blob:
+            continue
+        part = DDSketch.from_bytes(blob)
+        if part.relative_accuracy != relative_accuracy:
+            raise ValueError('Cannot merge sketches of different accuracy')
+        sketch.zero_count += part.zero_count
+        keys.append(np.arange(part.offset, part.offset + len(part.counts)))
+        counts.append(part.counts)
+    if keys:
+        sketch.add_counts(np.concatenate(keys), np.concatenate(counts))
+    return sketch
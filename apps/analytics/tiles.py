@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.db import connection, transaction
+from apps.detections.models import Detection
+from apps.violations.models import Violation
+from .models import HeatMapTile
+import logging
+import numpy as np
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Cells along each side of a tile
+TILE_CELLS = 64
+
+# Half the width of the Web Mercator (EPSG:3857) world, in metres
+MERCATOR_HALF_WIDTH = 20037508.342789244
+
+# Per-cell sums at the finest zoom, in one pass over the hour's detections
+TILE_CELLS_SQL = f"""
+    WITH window_detections AS (
+        SELECT d.id, d.speed, ST_Transform(d.location::geometry, 3857) AS point
+        FROM "{Detection._meta.db_table}" d
+        WHERE d.timestamp >= %(start)s AND d.timestamp < %(end)s AND d.location IS NOT NULL
+    ),
+    detection_violations AS (
+        SELECT v.detection_id, COUNT(*) AS violations
+        FROM "{Violation._meta.db_table}" v
+        JOIN window_detections wd ON wd.id = v.detection_id
+        GROUP BY v.detection_id
+    )
+    SELECT
+        FLOOR((ST_X(wd.point) + %(half)s) / %(cell)s)::bigint AS cx,
+        FLOOR((%(half)s - ST_Y(wd.point)) / %(cell)s)::bigint AS cy,
+        COUNT(*),
+        COALESCE(SUM(wd.speed), 0),
+        COUNT(wd.speed),
+        COALESCE(SUM(dv.violations), 0)
+    FROM window_detections wd
+    LEFT JOIN detection_violations dv ON dv.detection_id = wd.id
+    GROUP BY 1, 2
+"""
+
+
+def encode_tile(grid):
+    return zlib.compress(np.ascontiguousarray(grid, dtype='<f4').tobytes(), 6)
+
+
+def decode_tile(data):
+    return np.frombuffer(zlib.decompress(bytes(data)), dtype='<f4').reshape(TILE_CELLS, TILE_CELLS)
+
+
+def tile_zooms():
+    return range(settings.HEATMAP_TILE_MIN_ZOOM, settings.HEATMAP_TILE_MAX_ZOOM + 1)
+
+
+def finest_cells(start, end):
+    """
+    Detection sums per cell at the maximum zoom, as arrays:
+    (cx, cy, volume, speed_sum, speed_count, violations)
+    """
+    max_zoom = settings.HEATMAP_TILE_MAX_ZOOM
+    world_cells = (2 ** max_zoom) * TILE_CELLS
+    with connection.cursor() as cursor:
+        cursor.execute(TILE_CELLS_SQL, {
+            'start': start,
+            'end': end,
+            'half': MERCATOR_HALF_WIDTH,
+            'cell': 2 * MERCATOR_HALF_WIDTH / world_cells,
+        })
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+
+    columns = np.array(rows, dtype='f8').T
+    cx = np.clip(columns[0].astype('i8'), 0, world_cells - 1)
+    cy = np.clip(columns[1].astype('i8'), 0, world_cells - 1)
+    return cx, cy, columns[2], columns[3], columns[4], columns[5]
+
+
+def build_pyramid(start, end):
+    """
+    Yield (z, x, y, {metric_type: grid}) for every non-empty tile. Coarser
+    zooms are derived from the finest one by merging cells, so the
+    detections are read once.
+    """
+    cells = finest_cells(start, end)
+    if cells is None:
+        return
+    cx, cy, volume, speed_sum, speed_count, violations = cells
+    max_zoom = settings.HEATMAP_TILE_MAX_ZOOM
+
+    for z in tile_zooms():
+        shift = max_zoom - z
+        zx, zy = cx >> shift, cy >> shift
+        tiles, tile_index = np.unique(
+            np.stack([zx // TILE_CELLS, zy // TILE_CELLS], axis=1), axis=0, return_inverse=True
+        )
+        tile_index = tile_index.reshape(-1)
+        local = (zy % TILE_CELLS) * TILE_CELLS + (zx % TILE_CELLS)
+
+        def accumulate(values):
+            grid = np.zeros((len(tiles), TILE_CELLS * TILE_CELLS))
+            np.add.at(grid, (tile_index, local), values)
+            return grid
+
+        volume_grid = accumulate(volume)
+        speed_count_grid = accumulate(speed_count)
+        speed_grid = np.divide(
+            accumulate(speed_sum), speed_count_grid,
+            out=np.zeros_like(speed_count_grid), where=speed_count_grid > 0
+        )
+        violations_grid = accumulate(violations)
+
+        shape = (TILE_CELLS, TILE_CELLS)
+        for i, (x, y) in enumerate(tiles):
+            yield z, int(x), int(y), {
+                'volume': volume_grid[i].reshape(shape),
+                'speed': speed_grid[i].reshape(shape),
+                'violations': violations_grid[i].reshape(shape),
+            }
+
+
+def save_pyramid(date, hour, start, end):
+    """Replace the stored tiles of one hour. Returns the number of tiles written."""
+    tiles = []
+    for z, x, y, layers in build_pyramid(start, end):
+        for metric_type, grid in layers.items():
+            filled = np.count_nonzero(grid)
+            if not filled:
+                continue
+            tiles.append(HeatMapTile(
+                date=date, hour=hour, metric_type=metric_type, z=z, x=x, y=y,
+                data=encode_tile(grid),
+                cell_count=filled,
+                max_value=float(grid.max())
+            ))
+
+    with transaction.atomic():
+        HeatMapTile.objects.filter(date=date, hour=hour).delete()
+        HeatMapTile.objects.bulk_create(tiles, batch_size=500)
+    logger.info(f"Stored {len(tiles)} heat map tiles for {date} {hour:02d}:00")
+    return len(tiles)
+
+
+def sparse_cells(grid):
+    """[[row, col, value], ...] for the non-empty cells of a tile"""
+    rows, cols = np.nonzero(grid)
+    return [[int(r), int(c), round(float(v), 2)] for r, c, v in zip(rows, cols, grid[rows, cols])]
@@ -1,8 +1,14 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Recommendation, TrafficMetrics, HeatMap, TrafficPattern, AnalyticsReport
-from .services import InferenceEngine
+from .models import Recommendation, TrafficMetrics, HourlyTrafficMetrics, DailyTrafficMetrics, HeatMap, HeatMapTile, TrafficPattern, AnalyticsReport
+from .services import InferenceEngine, HeatMapService, SpatialAggregationService, SpeedPercentileService
+from apps.core.spatial import cell_area_m2, cell_id as spatial_cell_id
+from .renderers import HeatMapGridRenderer
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+from .rollups import metrics_tier, truncate
+from .dashboard import get_snapshot, refresh_recommendations
+from .tiles import TILE_CELLS, decode_tile, sparse_cells
 from rest_framework import serializers
 from django.db.models import Count, Sum
 from apps.patrols.models import Patrol
@@ -11,7 +17,8 @@ from apps.detections.models import Detection
 from apps.patrols.serializers import PatrolSerializer
 from apps.violations.serializers import ViolationSerializer
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 
 # Serializers
 class RecommendationSerializer(serializers.ModelSerializer):
@@ -22,12 +29,32 @@ class RecommendationSerializer(serializers.ModelSerializer):
 class TrafficMetricsSerializer(serializers.ModelSerializer):
     class Meta:
         model = TrafficMetrics
+        exclude = ['speed_sketch']
+
+class HourlyTrafficMetricsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HourlyTrafficMetrics
+        fields = '__all__'
+
+class DailyTrafficMetricsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyTrafficMetrics
         fields = '__all__'
 
+ROLLUP_SERIALIZERS = {
+    'hour': HourlyTrafficMetricsSerializer,
+    'day': DailyTrafficMetricsSerializer,
+}
+
 class HeatMapSerializer(serializers.ModelSerializer):
+    location_grid = serializers.SerializerMethodField()
+
     class Meta:
         model = HeatMap
-        fields = '__all__'
+        exclude = ['grid_data']
+
+    def get_location_grid(self, obj):
+        return {'cells': HeatMapService.cells(obj)}
 
 class TrafficPatternSerializer(serializers.ModelSerializer):
     class Meta:
@@ -46,6 +73,23 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
+def parse_range_bound(value):
+    """Aware datetime from an ISO datetime or date (midnight UTC), else None"""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.combine(day, time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
 # ViewSets
 class AdminAnalyticsViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAdminUser]
@@ -54,18 +98,21 @@ class AdminAnalyticsViewSet(viewsets.ViewSet):
     def dashboard(self, request):
         """
         Main Admin Dashboard API.
-        Returns metrics + active recommendations.
+        Returns metrics + active recommendations from the snapshot kept
+        in Redis (see apps.analytics.dashboard); supports If-None-Match.
         """
-        if not Recommendation.objects.filter(is_active=True).exists():
-            InferenceEngine.generate_recommendations()
-            
-        metrics = InferenceEngine.get_dashboard_metrics()
-        recommendations = Recommendation.objects.filter(is_active=True).order_by('-confidence_score')
-        
-        return Response({
-            'metrics': metrics,
-            'recommendations': RecommendationSerializer(recommendations, many=True).data
-        })
+        version, metrics, recommendations = get_snapshot()
+        etag = f'"dashboard-{version}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({
+                'metrics': metrics,
+                'recommendations': recommendations
+            })
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
     @action(detail=False, methods=['post'])
     def run_inference(self, request):
@@ -73,6 +120,7 @@ class AdminAnalyticsViewSet(viewsets.ViewSet):
         Force run the inference engine.
         """
         recs = InferenceEngine.generate_recommendations()
+        refresh_recommendations()
         return Response({
             'status': 'Inference Complete',
             'recommendations_generated': len(recs),
@@ -84,7 +132,13 @@ class AdminAnalyticsViewSet(viewsets.ViewSet):
         """
         Get time-series traffic metrics.
         Supports filtering: drone_id, start_date, end_date
+        resolution: 5min (default), hour, day, or auto to read the coarsest
+        rollup that covers [start_date, end_date)
         """
+        resolution = request.query_params.get('resolution', '5min')
+        if resolution != '5min':
+            return self.rollup_metrics(request, resolution)
+
         queryset = TrafficMetrics.objects.all().order_by('-timestamp')
         
         # Clean Filters
@@ -110,11 +164,46 @@ class AdminAnalyticsViewSet(viewsets.ViewSet):
         # Fallback if pagination disabled (though it's enabled above)
         return Response(TrafficMetricsSerializer(queryset, many=True).data)
 
-    @action(detail=False, methods=['get'])
+    def rollup_metrics(self, request, resolution):
+        if resolution not in ('auto', 'hour', 'day'):
+            return Response({'error': 'resolution must be one of 5min, hour, day, auto'}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = parse_range_bound(request.query_params.get('start_date'))
+        end = parse_range_bound(request.query_params.get('end_date'))
+        if start is None or end is None or start >= end:
+            return Response({'error': 'start_date and end_date are required for rollups'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if resolution == 'auto':
+            resolution, queryset = metrics_tier(start, end)
+        else:
+            model = HourlyTrafficMetrics if resolution == 'hour' else DailyTrafficMetrics
+            step = timedelta(hours=1) if resolution == 'hour' else timedelta(days=1)
+            queryset = model.objects.filter(bucket__gte=truncate(start, step), bucket__lt=end)
+
+        drone_id = request.query_params.get('drone_id')
+        if drone_id:
+            queryset = queryset.filter(drone_id=drone_id)
+
+        if resolution == '5min':
+            serializer_class = TrafficMetricsSerializer
+            queryset = queryset.order_by('-timestamp')
+        else:
+            serializer_class = ROLLUP_SERIALIZERS[resolution]
+            queryset = queryset.order_by('-bucket')
+
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        response = paginator.get_paginated_response(serializer_class(page, many=True).data)
+        response.data['resolution'] = resolution
+        return response
+
+    @action(detail=False, methods=['get'], renderer_classes=[JSONRenderer, BrowsableAPIRenderer, HeatMapGridRenderer])
     def heatmap(self, request):
         """
         Get heatmap. Filters: date (YYYY-MM-DD), hour (0-23), metric_type.
         Defaults to latest available if no filters.
+        With Accept: application/x-heatmap-grid (or ?format=grid) the
+        encoded grid is returned as is.
         """
         queryset = HeatMap.objects.all()
         
@@ -132,10 +221,165 @@ class AdminAnalyticsViewSet(viewsets.ViewSet):
             
         # Get one map
         latest = queryset.order_by('-date', '-hour').first()
+        if request.accepted_renderer.format == HeatMapGridRenderer.format:
+            if latest is None or not latest.grid_data:
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            response = Response(bytes(latest.grid_data))
+            response['X-Heatmap-Date'] = latest.date.isoformat()
+            response['X-Heatmap-Hour'] = str(latest.hour)
+            response['X-Heatmap-Metric'] = latest.metric_type
+            return response
         if latest:
             return Response(HeatMapSerializer(latest).data)
         return Response({})
 
+    @action(detail=False, methods=['get'], url_path=r'heatmap/tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)')
+    def heatmap_tile(self, request, z, x, y):
+        """
+        One heat map tile: the non-empty cells of a TILE_CELLS x TILE_CELLS
+        grid as [row, col, value]. Filters: date, hour, metric_type
+        (default volume). Defaults to the latest hour with tiles.
+        """
+        metric_type = request.query_params.get('metric_type', 'volume')
+        tiles = HeatMapTile.objects.filter(metric_type=metric_type)
+
+        date = request.query_params.get('date')
+        hour = request.query_params.get('hour')
+        if date and hour:
+            try:
+                date, hour = parse_date(date), int(hour)
+            except ValueError:
+                date = None
+            if date is None or not 0 <= hour < 24:
+                return Response({'error': 'date must be YYYY-MM-DD and hour 0-23'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            latest = tiles.order_by('-date', '-hour').values('date', 'hour').first()
+            if latest is None:
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            date, hour = latest['date'], latest['hour']
+        tiles = tiles.filter(date=date, hour=hour)
+
+        # Tiles of past hours no longer change; the current hour is rebuilt,
+        # and an empty tile may fill at the next rebuild
+        hour_end = timezone.make_aware(datetime.combine(date, time(hour))) + timedelta(hours=1)
+        cache_control = 'private, max-age=86400' if hour_end <= timezone.now() else 'private, max-age=60'
+
+        tile = tiles.filter(z=z, x=x, y=y).first()
+        if tile is None:
+            # Nothing detected here; let clients cache the empty tile too
+            response = Response(status=status.HTTP_204_NO_CONTENT)
+            response['Cache-Control'] = cache_control
+            return response
+
+        etag = f'"{tile.pk}-{int(tile.updated_at.timestamp())}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({
+                'z': tile.z,
+                'x': tile.x,
+                'y': tile.y,
+                'date': tile.date,
+                'hour': tile.hour,
+                'metric_type': tile.metric_type,
+                'size': TILE_CELLS,
+                'max_value': tile.max_value,
+                'cells': sparse_cells(decode_tile(tile.data)),
+            })
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    def spatial_window(self, request):
+        """(start, end, cell_size) from start/end (default the last 24 hours) and cell_size in metres"""
+        end = parse_range_bound(request.query_params.get('end')) or timezone.now()
+        start = parse_range_bound(request.query_params.get('start')) or end - timedelta(hours=24)
+        try:
+            cell_size = float(request.query_params.get('cell_size', SpatialAggregationService.CELL_SIZE))
+        except ValueError:
+            cell_size = None
+        if start >= end or not cell_size or cell_size <= 0:
+            return None
+        return start, end, cell_size
+
+    @action(detail=False, methods=['get'])
+    def hotspots(self, request):
+        """
+        Busiest equal-area cells by detections. Filters: start, end
+        (default the last 24 hours), cell_size in metres, limit.
+        """
+        window = self.spatial_window(request)
+        if window is None:
+            return Response({'error': 'start must be before end and cell_size positive'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end, cell_size = window
+        limit = request.query_params.get('limit', '50')
+        limit = min(int(limit), 1000) if limit.isdigit() else 50
+
+        level, cells = SpatialAggregationService.hotspots(start, end, cell_size, limit)
+        return Response({'start': start, 'end': end, 'level': level, 'cell_area_m2': round(cell_area_m2(level)), 'cells': cells})
+
+    @action(detail=False, methods=['get'])
+    def coverage(self, request):
+        """
+        Equal-area cells flown over, from the drones' GPS track. Filters:
+        start, end (default the last 24 hours), cell_size in metres.
+        """
+        window = self.spatial_window(request)
+        if window is None:
+            return Response({'error': 'start must be before end and cell_size positive'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end, cell_size = window
+
+        level, cells = SpatialAggregationService.coverage(start, end, cell_size)
+        area = cell_area_m2(level)
+        return Response({
+            'start': start,
+            'end': end,
+            'level': level,
+            'cell_area_m2': round(area),
+            'covered_km2': round(len(cells) * area / 1e6, 3),
+            'cells': cells,
+        })
+
+    @action(detail=False, methods=['get'])
+    def speed_percentiles(self, request):
+        """
+        Speed percentiles merged from the 5-minute sketches.
+        Filters: start, end (default the last 24 hours), drone_id, and a
+        zone as cell_id or lat/lon. group_by: none (default), hour, drone,
+        zone. percentiles: comma-separated (default 50,85,95).
+        """
+        params = request.query_params
+        end = parse_range_bound(params.get('end')) or timezone.now()
+        start = parse_range_bound(params.get('start')) or end - timedelta(hours=24)
+        group_by = params.get('group_by', 'none')
+        if start >= end or group_by not in SpeedPercentileService.GROUPS:
+            return Response(
+                {'error': f"start must be before end and group_by one of {', '.join(SpeedPercentileService.GROUPS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            percentiles = [float(p) for p in params.get('percentiles', '50,85,95').split(',')]
+            cell_id = int(params['cell_id']) if params.get('cell_id') else None
+            if cell_id is None and params.get('lat') and params.get('lon'):
+                cell_id = spatial_cell_id(float(params['lat']), float(params['lon']), SpeedPercentileService.ZONE_LEVEL)
+        except ValueError:
+            return Response({'error': 'percentiles, cell_id, lat and lon must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(0 <= p <= 100 for p in percentiles):
+            return Response({'error': 'percentiles must be between 0 and 100'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = SpeedPercentileService.percentiles(
+            start, end, group_by, drone_id=params.get('drone_id'), cell_id=cell_id, percentiles=percentiles
+        )
+        return Response({
+            'start': start,
+            'end': end,
+            'group_by': group_by,
+            'zone_level': SpeedPercentileService.ZONE_LEVEL,
+            'cell_id': cell_id,
+            'results': results,
+        })
+
     @action(detail=False, methods=['get'])
     def patterns(self, request):
         """
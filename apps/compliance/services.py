@@ -0,0 +1,52 @@
+from collections import Counter, defaultdict
+from django.db.models import F
+from django.utils import timezone
+from apps.vehicle_lookup.models import VehicleRegistration
+from .models import ComplianceScore
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ComplianceService:
+
+    @staticmethod
+    def award_points(detections, registrations=None):
+        """
+        Award one safe-driving point per compliant detection of a registered
+        vehicle. Scores are upserted with one insert and one UPDATE per
+        distinct point count, instead of a get_or_create/save per detection.
+        """
+        plates = [d.license_plate for d in detections if d.license_plate]
+        if not plates:
+            return 0
+
+        if registrations is None:
+            registrations = VehicleRegistration.objects.in_bulk(set(plates), field_name='license_plate')
+
+        # Unregistered vehicles are ignored
+        points = Counter(
+            registrations[plate].id for plate in plates if plate in registrations
+        )
+        if not points:
+            return 0
+
+        ComplianceScore.objects.bulk_create(
+            [ComplianceScore(vehicle_id=vehicle_id) for vehicle_id in points],
+            ignore_conflicts=True
+        )
+
+        vehicles_by_points = defaultdict(list)
+        for vehicle_id, count in points.items():
+            vehicles_by_points[count].append(vehicle_id)
+
+        now = timezone.now()
+        for count, vehicle_ids in vehicles_by_points.items():
+            # .update() skips auto_now, so set the timestamps explicitly
+            ComplianceScore.objects.filter(vehicle_id__in=vehicle_ids).update(
+                safe_driving_points=F('safe_driving_points') + count,
+                last_observation=now,
+                updated_at=now
+            )
+
+        return sum(points.values())
@@ -0,0 +1,167 @@
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import connections, transaction
+from django.db.models import JSONField
+import datetime
+import decimal
+import io
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SRID = 4326
+
+
+def encode_value(field, value):
+    """
+    CSV text for one model field value as Postgres' COPY expects it.
+
+    None stays None (NULL). Geometries are sent as hex EWKB, which the PostGIS
+    geometry/geography input functions accept directly.
+    """
+    if value is None:
+        return None
+    if isinstance(value, GEOSGeometry):
+        if value.srid is None:
+            value = value.clone()
+            value.srid = DEFAULT_SRID
+        return value.hexewkb.decode('ascii')
+    if isinstance(field, JSONField):
+        return json.dumps(value, cls=field.encoder)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    return value
+
+
+def csv_field(value):
+    """
+    One CSV field: NULL is an unquoted empty field, every other value is
+    quoted so empty strings stay empty strings.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class _RowStream(io.TextIOBase):
+    """
+    File-like object that renders CSV rows on demand, so COPY streams
+    arbitrarily many rows without building the whole payload in memory.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._pending = ''
+
+    def readable(self):
+        return True
+
+    def _fill(self, size):
+        lines = []
+        length = len(self._pending)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = ','.join(csv_field(v) for v in row) + '\n'
+            lines.append(line)
+            length += len(line)
+        self._pending += ''.join(lines)
+
+    def read(self, size=-1):
+        self._fill(size)
+        if size < 0:
+            chunk, self._pending = self._pending, ''
+        else:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+class BulkLoader:
+    """
+    Loads model instances with COPY FROM STDIN (CSV) instead of INSERT.
+
+    Instances are prepared like bulk_create does (defaults and auto_now
+    fields via pre_save) but no signals are sent. With ignore_conflicts the
+    rows are copied into a temporary staging table first and moved with
+    INSERT ... ON CONFLICT DO NOTHING RETURNING, so duplicates are skipped
+    and the caller learns which primary keys were actually inserted.
+    """
+
+    def __init__(self, model, fields=None, using='default'):
+        self.model = model
+        self.using = using
+        self.table = model._meta.db_table
+        concrete = [f for f in model._meta.concrete_fields]
+        if fields is not None:
+            concrete = [f for f in concrete if f.name in fields or f.attname in fields]
+        self.fields = concrete
+        self.columns = ', '.join(f'"{f.column}"' for f in self.fields)
+
+    def rows(self, objs):
+        for obj in objs:
+            yield [encode_value(f, self.value(f, obj)) for f in self.fields]
+
+    @staticmethod
+    def value(field, obj):
+        # Unlike pre_save, keep explicitly set auto_now_add values (e.g. the
+        # device timestamp of buffered GPS fixes)
+        value = getattr(obj, field.attname)
+        if value is None or getattr(field, 'auto_now', False):
+            value = field.pre_save(obj, add=True)
+        return value
+
+    def copy_sql(self, table):
+        return f'COPY "{table}" ({self.columns}) FROM STDIN WITH (FORMAT csv)'
+
+    def load(self, objs, ignore_conflicts=False):
+        """
+        COPY `objs` into the model's table. Returns the set of primary keys
+        inserted (all of them unless ignore_conflicts skipped duplicates).
+        """
+        objs = list(objs)
+        if not objs:
+            return set()
+
+        connection = connections[self.using]
+        pk_field = self.model._meta.pk
+        with transaction.atomic(using=self.using):
+            with connection.cursor() as cursor:
+                raw = cursor.cursor
+                if not ignore_conflicts:
+                    raw.copy_expert(self.copy_sql(self.table), _RowStream(self.rows(objs)))
+                    return {obj.pk for obj in objs}
+
+                staging = f"{self.table}_copy_staging"
+                cursor.execute(
+                    f'CREATE TEMPORARY TABLE IF NOT EXISTS "{staging}" '
+                    f'(LIKE "{self.table}" INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+                )
+                raw.copy_expert(self.copy_sql(staging), _RowStream(self.rows(objs)))
+                cursor.execute(
+                    f'INSERT INTO "{self.table}" ({self.columns}) '
+                    f'SELECT {self.columns} FROM "{staging}" '
+                    f'ON CONFLICT DO NOTHING RETURNING "{pk_field.column}"'
+                )
+                inserted = {pk_field.to_python(row[0]) for row in cursor.fetchall()}
+                # Empty it now in case this runs inside a longer outer transaction
+                cursor.execute(f'TRUNCATE "{staging}"')
+                return inserted
+
+
+def copy_insert(objs, ignore_conflicts=False, using='default'):
+    """COPY a homogeneous list of model instances; see BulkLoader.load"""
+    objs = list(objs)
+    if not objs:
+        return set()
+    return BulkLoader(type(objs[0]), using=using).load(objs, ignore_conflicts=ignore_conflicts)
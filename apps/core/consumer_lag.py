@@ -0,0 +1,61 @@
+from django.utils import timezone
+from django_redis import get_redis_connection
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Entries of workers that stopped reporting age out with the hash
+LAG_TTL = 300
+
+
+def lag_key(group_id):
+    return f"kafka:lag:{group_id}"
+
+
+def partition_lag(consumer):
+    """{TopicPartition: messages behind the log end} for the consumer's assignment"""
+    assigned = consumer.assignment()
+    if not assigned:
+        return {}
+    end_offsets = consumer.end_offsets(list(assigned))
+    return {tp: max(end_offsets[tp] - consumer.position(tp), 0) for tp in assigned}
+
+
+def record_partition_lag(consumer, group_id):
+    """
+    Measure lag for the partitions this consumer owns and publish it to a
+    Redis hash shared by every member of the group. Returns the lag map.
+    """
+    lag = partition_lag(consumer)
+    if not lag:
+        return lag
+
+    now = timezone.now().isoformat()
+    worker = f"{os.uname().nodename}:{os.getpid()}"
+    try:
+        pipe = get_redis_connection('default').pipeline(transaction=False)
+        for tp, behind in lag.items():
+            pipe.hset(lag_key(group_id), f"{tp.topic}:{tp.partition}", json.dumps({
+                'lag': behind,
+                'worker': worker,
+                'updated_at': now,
+            }))
+        pipe.expire(lag_key(group_id), LAG_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not publish consumer lag for {group_id}: {e}")
+
+    summary = ', '.join(f"{tp.partition}={behind}" for tp, behind in sorted(lag.items(), key=lambda i: i[0].partition))
+    logger.info(f"Consumer lag for {group_id} (total {sum(lag.values())}): {summary}")
+    return lag
+
+
+def get_partition_lag(group_id):
+    """Last reported lag per 'topic:partition' for a consumer group"""
+    entries = get_redis_connection('default').hgetall(lag_key(group_id))
+    return {
+        key.decode() if isinstance(key, bytes) else key: json.loads(value)
+        for key, value in entries.items()
+    }
@@ -0,0 +1,372 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connections
+from apps.core.consumer_lag import record_partition_lag
+from apps.core.dead_letter import send_to_dead_letter, decode_raw
+from apps.core.kafka_config import get_kafka_consumer, get_kafka_producer
+from kafka import ConsumerRebalanceListener
+import django
+import json
+import logging
+import multiprocessing
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+# A consumed message and its decoded value
+Record = namedtuple('Record', ['message', 'value'])
+
+
+class JSONCodec:
+    """UTF-8 JSON payloads, as written by the core producers"""
+
+    def decode(self, raw):
+        return json.loads(raw)
+
+
+class RawCodec:
+    """Leaves payloads as bytes for handlers that parse them themselves"""
+
+    def decode(self, raw):
+        return raw
+
+
+class _FlushOnRevoke(ConsumerRebalanceListener):
+    def __init__(self, runner):
+        self.runner = runner
+
+    def on_partitions_revoked(self, revoked):
+        logger.info(f"{self.runner.name}: partitions revoked: {sorted(tp.partition for tp in revoked)}")
+        self.runner.flush_pending()
+
+    def on_partitions_assigned(self, assigned):
+        logger.info(f"{self.runner.name}: partitions assigned: {sorted(tp.partition for tp in assigned)}")
+
+
+class BatchConsumer:
+    """
+    Base for Kafka pipeline stages.
+
+    Messages are polled in batches of up to `batch_size` (waiting at most
+    `batch_timeout_ms`), decoded with `codec`, and passed to handle_batch().
+    Offsets are committed only after a batch was handled, so a crash
+    replays it. A failing batch is decoded once and retried `max_retries`
+    times, then handed to handle_failed_batch(). Batches being collected when
+    partitions are revoked are handled and committed first. If a dead letter
+    sent with dead_letter() was not delivered, the consumer stops without
+    committing, so the batch is replayed by the next owner or on restart.
+
+    Subclasses set `topic_key` (a KAFKA_TOPICS key) and `group_id`, and
+    implement handle_record() or handle_batch(). With `executor` set to
+    'thread' or 'process', the default handle_batch() fans records out over
+    `concurrency` workers; for 'process', handle_record must be a
+    staticmethod so it can be pickled.
+
+    Throughput is logged and per-partition lag published every
+    `metrics_interval` seconds.
+    """
+
+    topic_key = None
+    group_id = None
+    codec = JSONCodec()
+    auto_offset_reset = 'latest'
+    batch_size = 500
+    batch_timeout_ms = 500
+    max_retries = 3
+    retry_delay = 5.0
+    executor = None
+    concurrency = 4
+    # Undecodable messages go here when set, instead of only being logged
+    dead_letter_topic_key = None
+    # Seconds to wait for each dead-letter delivery before committing
+    dead_letter_timeout = 30.0
+    # Flush the core producer before committing, so produced output is
+    # durable before the input offsets move on
+    produces = False
+    metrics_interval = 30.0
+
+    def __init__(self, **options):
+        for key, value in options.items():
+            if value is None:
+                continue
+            if not hasattr(type(self), key):
+                raise TypeError(f"{type(self).__name__} has no option {key!r}")
+            setattr(self, key, value)
+        self.name = type(self).__name__
+        self.running = False
+        self.pending = []
+        # Producer futures of the dead letters sent since the last commit
+        self.dead_letters = []
+        self.consumer = None
+        self.pool = None
+
+    # Hooks
+
+    def handle_record(self, value):
+        raise NotImplementedError
+
+    def handle_batch(self, records):
+        """Handle one batch of Records. Default: handle_record for each value."""
+        if self.executor == 'process':
+            return self.map(type(self).handle_record, [r.value for r in records])
+        return self.map(self.handle_record, [r.value for r in records])
+
+    def handle_failed_batch(self, records, attempts, exc):
+        """Called once a batch has failed `max_retries` times; default skips it"""
+        logger.error(f"{self.name}: dropping batch of {len(records)} messages after {attempts} attempts: {exc}")
+
+    def on_decode_error(self, message, exc):
+        if self.dead_letter_topic_key:
+            self.dead_letter(
+                decode_raw(message.value), f"Undecodable payload: {exc}", stage='decode', message=message, exc=exc
+            )
+        else:
+            logger.error(f"{self.name}: skipping undecodable message at {message.topic}:{message.partition}@{message.offset}: {exc}")
+
+    def before_commit(self):
+        """
+        Make the handled batch durable; runs right before offsets are
+        committed. Raises if a dead letter was not delivered, as committing
+        would lose its event for good.
+        """
+        if self.produces or self.dead_letter_topic_key:
+            get_kafka_producer().flush()
+        futures, self.dead_letters = self.dead_letters, []
+        failed = []
+        for future in futures:
+            try:
+                future.get(timeout=self.dead_letter_timeout)
+            except Exception as e:
+                failed.append(e)
+        if failed:
+            raise RuntimeError(
+                f"{self.name}: {len(failed)} of {len(futures)} dead letters were not delivered, "
+                f"not committing: {failed[0]}"
+            )
+
+    def on_tick(self):
+        """Called once per loop iteration, batch or not"""
+
+    def on_stop(self):
+        """Called after the last batch was committed"""
+
+    # Helpers
+
+    def dead_letter(self, event, reason, stage, **kwargs):
+        """
+        Send an event to `dead_letter_topic_key`; its delivery is checked
+        before the next commit
+        """
+        future = send_to_dead_letter(self.dead_letter_topic_key, event, reason, stage, **kwargs)
+        self.dead_letters.append(future)
+        return future
+
+    def map(self, fn, items):
+        if self.pool is None:
+            return [fn(item) for item in items]
+        return list(self.pool.map(fn, items))
+
+    def stop(self, *args):
+        if self.running:
+            logger.info(f"Stopping {self.name}...")
+        self.running = False
+
+    # Running
+
+    def run(self, workers=1):
+        if workers > 1:
+            self.supervise(workers)
+        else:
+            self.consume()
+
+    def supervise(self, workers):
+        """
+        Run `workers` consumer processes in the same group and restart any
+        that die. Kafka spreads the topic's partitions across them.
+        """
+        logger.info(f"Starting {workers} {self.name} workers in group {self.group_id}")
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+
+        def start(index):
+            process = context.Process(target=self.consume, name=f"{self.name}-{index}")
+            process.start()
+            return process
+
+        processes = {index: start(index) for index in range(workers)}
+        self.running = True
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        while self.running:
+            for index, process in processes.items():
+                if not process.is_alive():
+                    logger.error(f"{process.name} exited with code {process.exitcode}, restarting")
+                    processes[index] = start(index)
+            time.sleep(1)
+
+        # Workers finish and commit their current batch on SIGTERM
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            process.join(timeout=60)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in time, killing it")
+                process.kill()
+
+    def consume(self):
+        topic = settings.KAFKA_TOPICS[self.topic_key]
+        logger.info(
+            f"Starting {self.name} on topic: {topic}, group {self.group_id} "
+            f"(batch size {self.batch_size}, timeout {self.batch_timeout_ms}ms)"
+        )
+
+        self.consumer = get_kafka_consumer(
+            topic=None,
+            group_id=self.group_id,
+            auto_offset_reset=self.auto_offset_reset,
+            enable_auto_commit=False,
+            max_poll_records=self.batch_size,
+            # Decoded per message with the codec, so bad payloads can be skipped
+            value_deserializer=None
+        )
+        self.consumer.subscribe([topic], listener=_FlushOnRevoke(self))
+
+        self.running = True
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        if self.executor == 'thread':
+            self.pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=self.name)
+        elif self.executor == 'process':
+            # Fresh interpreters rather than forks of a process with live
+            # Kafka and database connections
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup
+            )
+
+        self.reset_metrics()
+        try:
+            while self.running:
+                self.poll_batch()
+                batch, self.pending = self.pending, []
+                self.on_tick()
+                self.report_metrics()
+                if not batch:
+                    continue
+                # Decoded once, so undecodable messages are reported once
+                # however often the batch is retried
+                if self.process_with_retries(self.decode(batch)):
+                    self.commit()
+        finally:
+            self.consumer.close()
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.on_stop()
+
+    def poll_batch(self):
+        """
+        Collect up to `batch_size` messages into `self.pending`, waiting at
+        most `batch_timeout_ms`. A rebalance during poll() may flush what
+        has been collected so far.
+        """
+        deadline = time.monotonic() + self.batch_timeout_ms / 1000.0
+        while self.running and len(self.pending) < self.batch_size:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            records = self.consumer.poll(timeout_ms=remaining_ms, max_records=self.batch_size - len(self.pending))
+            for messages in records.values():
+                self.pending.extend(messages)
+
+    def decode(self, batch):
+        records = []
+        for message in batch:
+            try:
+                records.append(Record(message, self.codec.decode(message.value)))
+            except (TypeError, ValueError) as e:
+                self.on_decode_error(message, e)
+        return records
+
+    def process(self, records):
+        # A long-running consumer must not hold on to a dead connection
+        close_old_connections()
+        started = time.perf_counter()
+        self.handle_batch(records)
+        self.metrics['records'] += len(records)
+        self.metrics['batches'] += 1
+        self.metrics['busy'] += time.perf_counter() - started
+
+    def commit(self):
+        self.before_commit()
+        self.consumer.commit()
+
+    def process_with_retries(self, records):
+        """
+        Process the records, retrying `max_retries` times before handing
+        them to handle_failed_batch(). Returns False if the consumer was
+        stopped between attempts, leaving the batch uncommitted.
+        """
+        attempts = 0
+        while True:
+            try:
+                self.process(records)
+                return True
+            except Exception as e:
+                attempts += 1
+                if attempts > self.max_retries:
+                    self.handle_failed_batch(records, attempts, e)
+                    return True
+                logger.error(
+                    f"{self.name}: error processing batch of {len(records)} messages "
+                    f"(attempt {attempts}/{self.max_retries}): {e}", exc_info=True
+                )
+            time.sleep(self.retry_delay)
+            if not self.running:
+                return False
+
+    def flush_pending(self):
+        """
+        Handle and commit the partially collected batch ahead of a
+        rebalance. If that fails nothing is committed and the partitions'
+        next owner re-reads the messages from the last committed offset.
+        """
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            self.process(self.decode(batch))
+            self.commit()
+        except Exception as e:
+            logger.error(
+                f"{self.name}: could not flush {len(batch)} messages before rebalance, "
+                f"leaving them uncommitted: {e}", exc_info=True
+            )
+
+    # Metrics
+
+    def reset_metrics(self):
+        self.metrics = {'records': 0, 'batches': 0, 'busy': 0.0, 'since': time.monotonic()}
+
+    def report_metrics(self):
+        elapsed = time.monotonic() - self.metrics['since']
+        if elapsed < self.metrics_interval:
+            return
+        records, batches = self.metrics['records'], self.metrics['batches']
+        logger.info(
+            f"{self.name}: {records} messages in {batches} batches over {elapsed:.0f}s "
+            f"({records / elapsed:.0f} msg/s, {self.metrics['busy'] / elapsed:.0%} busy, "
+            f"{self.metrics['busy'] * 1000 / batches if batches else 0:.1f}ms per batch)"
+        )
+        try:
+            record_partition_lag(self.consumer, self.group_id)
+        except Exception as e:
+            logger.warning(f"{self.name}: could not measure lag: {e}")
+        self.reset_metrics()
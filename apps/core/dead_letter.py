@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.utils import timezone
+from apps.core.kafka_config import get_kafka_producer
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+def decode_raw(raw):
+    """Best-effort text for a payload that could not be deserialized"""
+    if isinstance(raw, bytes):
+        return raw.decode('utf-8', errors='replace')
+    return raw
+
+
+def dead_letter_envelope(event, reason, stage, message=None, exc=None, attempts=1):
+    """
+    Wraps a failed event with what is needed to diagnose and replay it:
+    the original payload, the error, and where it was read from.
+    """
+    envelope = {
+        'event': event,
+        'drone_id': event.get('drone_id') if isinstance(event, dict) else None,
+        'error': {
+            'stage': stage,
+            'reason': reason,
+            'type': type(exc).__name__ if exc else None,
+            'traceback': ''.join(traceback.format_exception(exc)) if exc else None,
+        },
+        'attempts': attempts,
+        'failed_at': timezone.now().isoformat(),
+        'source': None,
+    }
+    if message is not None:
+        envelope['source'] = {
+            'topic': message.topic,
+            'partition': message.partition,
+            'offset': message.offset,
+            'timestamp': message.timestamp,
+        }
+    return envelope
+
+
+def send_to_dead_letter(topic_key, event, reason, stage, message=None, exc=None, attempts=1):
+    """
+    Publishes a failed event to the dead-letter topic configured under
+    `topic_key` in KAFKA_TOPICS. Returns the producer future.
+    """
+    topic = settings.KAFKA_TOPICS[topic_key]
+    envelope = dead_letter_envelope(event, reason, stage, message=message, exc=exc, attempts=attempts)
+    logger.warning(f"Routing event to {topic} ({stage}): {reason}")
+    return get_kafka_producer().send(topic, envelope)
+
+
+def unwrap_dead_letter(value):
+    """Original event from a dead-letter envelope"""
+    if isinstance(value, dict) and 'event' in value and 'error' in value:
+        return value['event']
+    return value
@@ -1,36 +1,147 @@
 from kafka import KafkaProducer, KafkaConsumer
 from kafka.errors import NoBrokersAvailable
 from django.conf import settings
+import atexit
 import json
 import logging
+import os
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 
+# KafkaProducer options a profile may set; everything else is ours
+PRODUCER_OPTIONS = ('compression_type', 'linger_ms', 'batch_size', 'acks', 'max_request_size', 'retries')
+
+
+def serialize_value(value):
+    return json.dumps(value).encode('utf-8')
+
+
+def get_producer_profile(name):
+    """
+    Resolved producer profile: the 'default' profile overlaid with `name`.
+    """
+    profiles = settings.KAFKA_PRODUCER_PROFILES
+    profile = dict(profiles['default'])
+    profile.update(profiles.get(name, {}))
+    # Settings use 'none' for readability; kafka-python wants None
+    if profile.get('compression_type') in ('none', ''):
+        profile['compression_type'] = None
+    return profile
+
+
+def profile_name_for_topic(topic):
+    """Maps a topic name back to its KAFKA_TOPICS key, which names its profile"""
+    for name, topic_name in settings.KAFKA_TOPICS.items():
+        if topic_name == topic:
+            return name
+    return 'default'
+
+
+def partition_key(profile, value):
+    """Extracts the partition key configured for a profile from a message"""
+    field = profile.get('key')
+    if not field or not isinstance(value, dict):
+        return None
+    key = value.get(field)
+    return str(key).encode('utf-8') if key is not None else None
+
+
+class ProducerMetrics:
+    """
+    Per-topic delivery counters fed by the producer's delivery callbacks.
+    Callbacks fire on the producer's sender thread, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics = {}
+
+    def _topic(self, topic):
+        if topic not in self._topics:
+            self._topics[topic] = {
+                'sent': 0, 'delivered': 0, 'failed': 0,
+                'bytes': 0, 'latency_ms_total': 0.0, 'last_error': None,
+            }
+        return self._topics[topic]
+
+    def record_send(self, topic, size):
+        with self._lock:
+            stats = self._topic(topic)
+            stats['sent'] += 1
+            stats['bytes'] += size
+
+    def record_delivery(self, topic, started):
+        with self._lock:
+            stats = self._topic(topic)
+            stats['delivered'] += 1
+            stats['latency_ms_total'] += (time.monotonic() - started) * 1000
+
+    def record_failure(self, topic, exc):
+        with self._lock:
+            stats = self._topic(topic)
+            stats['failed'] += 1
+            stats['last_error'] = str(exc)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for topic, stats in self._topics.items():
+                stats = dict(stats)
+                delivered = stats['delivered']
+                stats['avg_latency_ms'] = stats.pop('latency_ms_total') / delivered if delivered else 0.0
+                result[topic] = stats
+            return result
+
+
 class KafkaProducerManager:
+    """
+    Process-wide pool of Kafka producers, one per producer profile.
+
+    KafkaProducer runs a background sender thread that does not survive
+    fork(), so the pool remembers the PID that created it and starts over in
+    a forked child (e.g. a Celery prefork worker) instead of reusing the
+    parent's dead producers. Every send is tracked until its delivery
+    callback fires so in-flight messages can be counted and flushed on
+    shutdown.
+    """
     _instance = None
-    _producer = None
-    
+
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialize_producer()
+        if cls._instance is None or cls._instance._pid != os.getpid():
+            instance = super().__new__(cls)
+            instance._reset()
+            cls._instance = instance
         return cls._instance
-    
-    def _initialize_producer(self):
+
+    def _reset(self):
+        # Producers inherited across a fork are abandoned, not closed: their
+        # sockets and sender thread belong to the parent process
+        self._pid = os.getpid()
+        self._producers = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.metrics = ProducerMetrics()
+
+    @classmethod
+    def _after_fork_in_child(cls):
+        # Drop the parent's pool eagerly; the next get_kafka_producer() rebuilds it
+        cls._instance = None
+
+    def _create_producer(self, profile):
         retries = 10
         delay = 5
+        options = {k: profile[k] for k in PRODUCER_OPTIONS if k in profile}
         for i in range(retries):
             try:
-                self._producer = KafkaProducer(
+                producer = KafkaProducer(
                     bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
-                    value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-                    max_request_size=10485760,  # 10MB for large frames
-                    compression_type='gzip',
-                    retries=3
+                    **options
                 )
-                logger.info("Kafka producer initialized successfully")
-                return
+                logger.info(f"Kafka producer initialized successfully in pid {self._pid} ({options})")
+                return producer
             except NoBrokersAvailable:
                 logger.warning(f"Kafka broker not available yet (attempt {i+1}/{retries}). Retrying in {delay}s...")
                 time.sleep(delay)
@@ -39,37 +150,133 @@ class KafkaProducerManager:
                 if i == retries - 1:
                     raise
                 time.sleep(delay)
-    
-    def send(self, topic, value):
-        if self._producer:
-            return self._producer.send(topic, value=value)
-        else:
-            # Try to re-initialize if it failed
-            self._initialize_producer()
-            if self._producer:
-                return self._producer.send(topic, value=value)
-            raise Exception("Kafka producer not initialized")
-    
-    def close(self):
-        if self._producer:
-            self._producer.close()
+        raise Exception("Kafka producer not initialized")
+
+    def _producer_for(self, name, profile):
+        producer = self._producers.get(name)
+        if producer is None:
+            with self._lock:
+                producer = self._producers.get(name)
+                if producer is None:
+                    producer = self._producers[name] = self._create_producer(profile)
+        return producer
+
+    def send(self, topic, value, key=None):
+        """
+        Sends `value` to `topic` using the producer profile configured for it.
+        The partition key defaults to the profile's key field (e.g. drone_id).
+        """
+        name = profile_name_for_topic(topic)
+        profile = get_producer_profile(name)
+        producer = self._producer_for(name, profile)
+
+        if key is None:
+            key = partition_key(profile, value)
+        elif isinstance(key, str):
+            key = key.encode('utf-8')
+
+        # Bound the number of unconfirmed messages: beyond the cap, wait for
+        # the backlog to drain instead of growing it until the buffer fills
+        if self.in_flight >= settings.KAFKA_PRODUCER_MAX_IN_FLIGHT:
+            logger.warning(f"{self.in_flight} Kafka messages in flight, flushing before sending to {topic}")
+            producer.flush()
+
+        payload = serialize_value(value)
+        started = time.monotonic()
+        future = producer.send(topic, value=payload, key=key)
+        self.metrics.record_send(topic, len(payload))
+        self._track(1)
+        future.add_callback(self._on_delivery, topic, started)
+        future.add_errback(self._on_failure, topic)
+        return future
+
+    def _track(self, delta):
+        with self._in_flight_lock:
+            self._in_flight += delta
+
+    def _on_delivery(self, topic, started, _metadata):
+        self._track(-1)
+        self.metrics.record_delivery(topic, started)
+
+    def _on_failure(self, topic, exc):
+        self._track(-1)
+        self.metrics.record_failure(topic, exc)
+        logger.error(f"Kafka delivery to {topic} failed: {exc}")
+
+    @property
+    def in_flight(self):
+        """Messages handed to a producer whose delivery is not yet confirmed"""
+        return self._in_flight
+
+    def stats(self):
+        return {
+            'pid': self._pid,
+            'producers': sorted(self._producers),
+            'in_flight': self.in_flight,
+            'topics': self.metrics.snapshot(),
+        }
+
+    def flush(self, timeout=None):
+        for producer in list(self._producers.values()):
+            producer.flush(timeout=timeout)
+
+    def close(self, timeout=None):
+        """Flush outstanding messages and close every producer in the pool"""
+        if self._pid != os.getpid():
+            return
+        pending = self.in_flight
+        for producer in list(self._producers.values()):
+            try:
+                producer.flush(timeout=timeout)
+                producer.close(timeout=timeout)
+            except Exception as e:
+                logger.error(f"Error closing Kafka producer: {e}")
+        self._producers = {}
+        if pending:
+            logger.info(
+                f"Kafka producers closed in pid {self._pid}: flushed {pending} in-flight messages, "
+                f"{self.in_flight} undelivered"
+            )
+
+
+def shutdown_kafka_producers(timeout=10, **kwargs):
+    """
+    Flushes and closes this process's producers, if it created any.
+    Connected to interpreter exit and Celery worker shutdown signals.
+    """
+    instance = KafkaProducerManager._instance
+    if instance is not None:
+        instance.close(timeout=timeout)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=KafkaProducerManager._after_fork_in_child)
+atexit.register(shutdown_kafka_producers)
+
 
 def get_kafka_producer():
     return KafkaProducerManager()
 
-def get_kafka_consumer(topic, group_id=None, auto_offset_reset='latest'):
+def get_kafka_consumer(topic, group_id=None, auto_offset_reset='latest', **kwargs):
+    """
+    Extra keyword arguments are passed to KafkaConsumer (e.g.
+    enable_auto_commit=False for consumers that commit offsets themselves).
+    """
     retries = 10
     delay = 5
+    # Without a topic the consumer is left unsubscribed for manual assign()
+    topics = [topic] if topic else []
+    kwargs.setdefault('value_deserializer', lambda m: json.loads(m.decode('utf-8')))
     for i in range(retries):
         try:
             return KafkaConsumer(
-                topic,
+                *topics,
                 bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
                 group_id=group_id,
                 auto_offset_reset=auto_offset_reset,
-                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
                 # Add api_version to avoid NoBrokersAvailable in some environments
-                api_version=(2, 5, 0) 
+                api_version=(2, 5, 0),
+                **kwargs
             )
         except NoBrokersAvailable:
             logger.warning(f"Kafka broker not available for topic {topic} (attempt {i+1}/{retries}). Retrying in {delay}s...")
@@ -78,4 +285,4 @@ def get_kafka_consumer(topic, group_id=None, auto_offset_reset='latest'):
             logger.error(f"Failed to create Kafka consumer for topic {topic}: {e}")
             if i == retries - 1:
                 raise
-            time.sleep(delay)
\ No newline at end of file
+            time.sleep(delay)
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+from apps.core.spatial import cell_ids
+from apps.detections.models import Detection
+from apps.drones.models import GPSLocation
+import time
+
+MODELS = {
+    'detections': Detection,
+    'gps': GPSLocation,
+}
+
+
+class Command(BaseCommand):
+    help = 'Fills in cell_id for detections and GPS fixes stored before it was computed at ingest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=[*MODELS, 'all'], default='all')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        names = list(MODELS) if options['model'] == 'all' else [options['model']]
+        for name in names:
+            self.backfill(name, MODELS[name]._meta.db_table, options['batch_size'])
+
+    def backfill(self, name, table, batch_size):
+        # The (cell_id, timestamp) index finds the NULLs, and matching on
+        # timestamp as well as id lets each update touch a single partition
+        select_sql = f"""
+            SELECT id, "timestamp", ST_Y(location::geometry), ST_X(location::geometry)
+            FROM "{table}"
+            WHERE cell_id IS NULL AND location IS NOT NULL
+            LIMIT %s
+        """
+        update_sql = f"""
+            UPDATE "{table}" t SET cell_id = v.cell_id
+            FROM (VALUES %s) AS v(id, ts, cell_id)
+            WHERE t.id = v.id AND t."timestamp" = v.ts
+        """
+
+        total = 0
+        started = time.perf_counter()
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(select_sql, [batch_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                ids = cell_ids([row[2] for row in rows], [row[3] for row in rows])
+                execute_values(
+                    cursor.cursor, update_sql,
+                    [(row[0], row[1], int(cell)) for row, cell in zip(rows, ids)],
+                    template='(%s::uuid, %s::timestamptz, %s::bigint)', page_size=batch_size
+                )
+            total += len(rows)
+            self.stdout.write(f"  {name}: {total} rows")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} {name} cell ids in {elapsed:.1f}s"))
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from apps.core.bulk_loader import copy_insert
+from apps.detections.models import Detection
+from apps.drones.models import Drone, GPSLocation
+import random
+import time
+import uuid
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares ORM create, bulk_create and COPY for detections or GPS fixes. '
+        'Every run happens in a rolled-back transaction, so nothing is kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['gps', 'detections'], default='gps')
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=1000, help='bulk_create batch size')
+        parser.add_argument(
+            '--skip-create', action='store_true',
+            help='Skip the row-by-row ORM create run, which is slow for large --rows'
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        self.stdout.write(f"Inserting {rows} {options['model']} rows per method")
+
+        methods = [
+            ('bulk_create', lambda objs: type(objs[0]).objects.bulk_create(objs, batch_size=options['batch_size'])),
+            ('copy', copy_insert),
+        ]
+        if not options['skip_create']:
+            methods.insert(0, ('create', lambda objs: [obj.save() for obj in objs]))
+
+        results = []
+        for name, insert in methods:
+            elapsed = self.run(options['model'], rows, insert)
+            results.append((name, elapsed))
+            self.stdout.write(f"  {name:<12} {elapsed:8.3f}s  {rows / elapsed:10.0f} rows/s")
+
+        fastest = min(elapsed for _, elapsed in results)
+        for name, elapsed in results:
+            self.stdout.write(f"  {name:<12} {elapsed / fastest:6.1f}x the fastest")
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (all rows rolled back)'))
+
+    def run(self, model, rows, insert):
+        elapsed = None
+        try:
+            with transaction.atomic():
+                drone = Drone.objects.create(
+                    drone_id=f"BENCH-{uuid.uuid4().hex[:8]}",
+                    name='Benchmark drone',
+                    model='Benchmark',
+                    serial_number=f"BENCH-{uuid.uuid4().hex}",
+                    is_active=False
+                )
+                objs = self.build(model, drone, rows)
+                started = time.perf_counter()
+                insert(objs)
+                elapsed = time.perf_counter() - started
+                raise _Rollback
+        except _Rollback:
+            pass
+        return elapsed
+
+    @staticmethod
+    def build(model, drone, rows):
+        now = timezone.now()
+        objs = []
+        for i in range(rows):
+            point = Point(36.8219 + random.uniform(-0.05, 0.05), -1.2921 + random.uniform(-0.05, 0.05))
+            timestamp = now - timedelta(milliseconds=i * 40)
+            if model == 'gps':
+                objs.append(GPSLocation(drone=drone, location=point, altitude=random.uniform(50, 150), timestamp=timestamp))
+            else:
+                # No speed or plate, so the ORM create run does not raise
+                # violations or award points through post_save
+                objs.append(Detection(
+                    drone=drone,
+                    timestamp=timestamp,
+                    frame_number=i // 4,
+                    vehicle_type=random.choice(['car', 'truck', 'bus', 'motorcycle']),
+                    confidence=random.uniform(0.6, 0.99),
+                    box_coordinates=[100, 100, 200, 200],
+                    location=point
+                ))
+        return objs
@@ -0,0 +1,247 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.utils import timezone
+from kafka import codec
+from kafka.partitioner.default import murmur2
+from apps.core.kafka_config import (
+    get_producer_profile, partition_key, serialize_value, PRODUCER_OPTIONS
+)
+import base64
+import os
+import random
+import time
+
+CODECS = {
+    None: lambda payload: payload,
+    'gzip': codec.gzip_encode,
+    'snappy': codec.snappy_encode,
+    'lz4': codec.lz4_encode,
+    'zstd': codec.zstd_encode,
+}
+
+
+class LocalBrokerStandIn:
+    """
+    In-process stand-in for a broker that models what the producer puts on
+    the wire for a given profile: messages are partitioned by key, collected
+    into per-partition batches closed by batch_size or linger_ms (on a virtual
+    clock driven by the arrival rate) and each batch is compressed with the
+    profile's codec.
+    """
+
+    def __init__(self, profile, partitions=12, rate=1000.0):
+        self.profile = profile
+        self.partitions = partitions
+        self.interval = 1.0 / rate
+        self.encode = CODECS[profile.get('compression_type')]
+        # kafka-python only fails on first use when a codec's library is missing
+        try:
+            self.encode(b'probe')
+        except Exception as e:
+            raise NotImplementedError(f"{profile.get('compression_type')} codec is not available: {e}") from e
+        self.batch_size = profile.get('batch_size', 16384)
+        self.linger = profile.get('linger_ms', 0) / 1000.0
+        self.reset()
+
+    def reset(self):
+        self.clock = 0.0
+        self.open = {}  # partition -> [first arrival, payloads, size]
+        self.stats = {
+            'messages': 0, 'batches': 0, 'raw_bytes': 0, 'wire_bytes': 0,
+            'encode_seconds': 0.0, 'wait_seconds': 0.0, 'rejected': 0,
+        }
+
+    def send(self, value):
+        self.clock += self.interval
+        self._expire_lingering()
+
+        payload = serialize_value(value)
+        if len(payload) > self.profile.get('max_request_size', 1048576):
+            self.stats['rejected'] += 1
+            return
+
+        key = partition_key(self.profile, value)
+        if key is None:
+            partition = random.randrange(self.partitions)
+        else:
+            partition = (murmur2(key) & 0x7fffffff) % self.partitions
+
+        batch = self.open.setdefault(partition, [self.clock, [], 0])
+        batch[1].append((self.clock, payload))
+        batch[2] += len(payload)
+        self.stats['messages'] += 1
+        self.stats['raw_bytes'] += len(payload)
+
+        if batch[2] >= self.batch_size:
+            self._close(partition)
+
+    def flush(self):
+        for partition in list(self.open):
+            self._close(partition)
+
+    def _expire_lingering(self):
+        for partition, (first, _, _) in list(self.open.items()):
+            if self.clock - first >= self.linger:
+                self._close(partition)
+
+    def _close(self, partition):
+        _, messages, _ = self.open.pop(partition)
+        started = time.perf_counter()
+        wire = self.encode(b''.join(p for _, p in messages))
+        self.stats['encode_seconds'] += time.perf_counter() - started
+        self.stats['wire_bytes'] += len(wire)
+        self.stats['batches'] += 1
+        self.stats['wait_seconds'] += sum(self.clock - arrived for arrived, _ in messages)
+
+
+class Command(BaseCommand):
+    help = 'Compares Kafka producer profiles for frame and detection payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='Messages per run')
+        parser.add_argument('--rate', type=float, default=1000.0, help='Simulated arrival rate (msgs/s)')
+        parser.add_argument('--partitions', type=int, default=12)
+        parser.add_argument(
+            '--payload', choices=['frames', 'detections', 'both'], default='both'
+        )
+        parser.add_argument(
+            '--codecs', default='none,gzip,lz4,zstd',
+            help='Codecs to compare against each configured profile'
+        )
+        parser.add_argument(
+            '--live', action='store_true',
+            help='Also send through a real KafkaProducer to KAFKA_BOOTSTRAP_SERVERS'
+        )
+
+    def handle(self, *args, **options):
+        payloads = []
+        if options['payload'] in ('frames', 'both'):
+            payloads.append(('RAW_FRAMES', self.frame_messages(options['messages'])))
+        if options['payload'] in ('detections', 'both'):
+            payloads.append(('DETECTIONS', self.detection_messages(options['messages'])))
+
+        codecs = [None if c == 'none' else c for c in options['codecs'].split(',') if c]
+        for name in codecs:
+            if name not in CODECS:
+                raise CommandError(f"Unknown codec: {name}")
+
+        header = (
+            f"{'payload':<11} {'profile':<18} {'codec':<6} {'batches':>8} {'avg batch KB':>13} "
+            f"{'ratio':>6} {'wire MB':>8} {'encode ms':>10} {'msgs/s (cpu)':>13} {'avg wait ms':>12}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for topic_key, messages in payloads:
+            configured = get_producer_profile(topic_key)
+            variants = [('configured', configured)]
+            for name in codecs:
+                if name != configured.get('compression_type'):
+                    variants.append((f"configured+{name or 'none'}", dict(configured, compression_type=name)))
+
+            for label, profile in variants:
+                try:
+                    stats = self.run_stand_in(profile, messages, options)
+                except NotImplementedError as e:
+                    self.stdout.write(self.style.WARNING(f"{topic_key:<11} {label:<18} skipped: {e}"))
+                    continue
+                self.report(topic_key, label, profile, stats)
+
+            if options['live']:
+                self.run_live(topic_key, configured, messages)
+
+    def run_stand_in(self, profile, messages, options):
+        broker = LocalBrokerStandIn(profile, partitions=options['partitions'], rate=options['rate'])
+        serialize_started = time.perf_counter()
+        for message in messages:
+            broker.send(message)
+        broker.flush()
+        broker.stats['total_seconds'] = time.perf_counter() - serialize_started
+        return broker.stats
+
+    def report(self, topic_key, label, profile, stats):
+        batches = stats['batches'] or 1
+        messages = stats['messages'] or 1
+        ratio = stats['raw_bytes'] / stats['wire_bytes'] if stats['wire_bytes'] else 0
+        self.stdout.write(
+            f"{topic_key:<11} {label:<18} {str(profile.get('compression_type') or 'none'):<6} "
+            f"{stats['batches']:>8} {stats['wire_bytes'] / batches / 1024:>13.1f} "
+            f"{ratio:>6.2f} {stats['wire_bytes'] / 1e6:>8.2f} "
+            f"{stats['encode_seconds'] * 1000:>10.1f} "
+            f"{messages / stats['total_seconds']:>13.0f} "
+            f"{stats['wait_seconds'] / messages * 1000:>12.2f}"
+        )
+        if stats['rejected']:
+            self.stdout.write(self.style.WARNING(
+                f"  {stats['rejected']} messages exceed max_request_size"
+            ))
+
+    def run_live(self, topic_key, profile, messages):
+        from kafka import KafkaProducer
+
+        topic = settings.KAFKA_TOPICS[topic_key]
+        options = {k: profile[k] for k in PRODUCER_OPTIONS if k in profile}
+        producer = KafkaProducer(bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS, **options)
+        started = time.perf_counter()
+        for message in messages:
+            producer.send(topic, value=serialize_value(message), key=partition_key(profile, message))
+        producer.flush()
+        elapsed = time.perf_counter() - started
+        producer.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"{topic_key:<11} live broker: {len(messages)} msgs in {elapsed:.2f}s "
+            f"({len(messages) / elapsed:.0f} msgs/s)"
+        ))
+
+    def frame_messages(self, count):
+        frames = self.sample_jpegs()
+        streams = [str(os.urandom(16).hex()) for _ in range(4)]
+        return [
+            {
+                'stream_id': streams[i % len(streams)],
+                'drone_id': f"DR-{i % len(streams):03d}",
+                'frame_number': i,
+                'timestamp': timezone.now().isoformat(),
+                'frame_data': frames[i % len(frames)],
+                'gps': {'latitude': -1.2921, 'longitude': 36.8219, 'altitude': 80.0},
+                'resolution': '1280x720',
+                'frame_rate': 30,
+            }
+            for i in range(count)
+        ]
+
+    def detection_messages(self, count):
+        vehicle_types = ['car', 'truck', 'motorcycle', 'bus']
+        return [
+            {
+                'drone_id': f"DR-{i % 10:03d}",
+                'stream_id': f"session-{i % 10}",
+                'timestamp': timezone.now().isoformat(),
+                'frame_number': i,
+                'track_id': i % 50,
+                'vehicle_type': random.choice(vehicle_types),
+                'confidence': random.uniform(0.5, 0.99),
+                'box_coordinates': [random.randint(0, 1280) for _ in range(4)],
+                'license_plate': f"KC{random.choice('ABCDEF')} {random.randint(100, 999)}A",
+                'speed': round(random.uniform(20, 120), 1),
+                'location': {'latitude': -1.2921, 'longitude': 36.8219, 'altitude': 80.0},
+            }
+            for i in range(count)
+        ]
+
+    def sample_jpegs(self):
+        """A few real JPEGs when OpenCV is available, incompressible bytes otherwise"""
+        try:
+            import cv2
+            import numpy as np
+            frames = []
+            for seed in range(5):
+                # Gradient plus sensor-like noise, roughly the entropy of aerial footage
+                rng = np.random.default_rng(seed)
+                gradient = np.linspace(0, 255, 1280)[None, :, None]
+                image = np.clip(gradient + rng.normal(0, 25, (720, 1280, 3)), 0, 255).astype(np.uint8)
+                _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+                frames.append(base64.b64encode(buffer).decode('utf-8'))
+            return frames
+        except ImportError:
+            return [base64.b64encode(os.urandom(120 * 1024)).decode('utf-8') for _ in range(5)]
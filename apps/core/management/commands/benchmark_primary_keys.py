@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+from apps.core.models import uuid7
+import time
+import uuid
+
+
+KEY_TYPES = {
+    'uuid4': ('uuid PRIMARY KEY', uuid.uuid4),
+    'uuid7': ('uuid PRIMARY KEY', uuid7),
+    'bigint': ('bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY', None),
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares insert throughput and primary key index size for uuid4, '
+        'uuid7 and bigint identity keys, using temporary tables shaped like detections'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--keys', nargs='+', choices=list(KEY_TYPES), default=list(KEY_TYPES))
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        self.stdout.write(f"Inserting {rows} rows per key type in batches of {options['batch_size']}")
+        self.stdout.write(f"  {'key':<8} {'seconds':>8} {'rows/s':>10} {'pk index':>10} {'bytes/row':>10} {'leaf fill':>10}")
+
+        for key in options['keys']:
+            result = self.run(key, rows, options['batch_size'])
+            fill = f"{result['leaf_density']:.0f}%" if result['leaf_density'] is not None else 'n/a'
+            self.stdout.write(
+                f"  {key:<8} {result['elapsed']:8.2f} {rows / result['elapsed']:10.0f} "
+                f"{result['index_bytes'] / 1024 / 1024:8.1f}MB {result['index_bytes'] / rows:10.1f} {fill:>10}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (tables were temporary)'))
+        self.stdout.write('Leaf fill needs the pgstattuple extension; lower fill means more page splits and bloat.')
+
+    def run(self, key, rows, batch_size):
+        column, generate = KEY_TYPES[key]
+        table = f"pk_benchmark_{key}"
+        result = {}
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TEMPORARY TABLE "{table}" ('
+                    f'id {column}, drone_id uuid NOT NULL, "timestamp" timestamptz NOT NULL, '
+                    f'vehicle_type varchar(50) NOT NULL, confidence double precision NOT NULL)'
+                )
+                drone_id = uuid.uuid4()
+                if generate:
+                    sql = f'INSERT INTO "{table}" (id, drone_id, "timestamp", vehicle_type, confidence) VALUES %s'
+                    template = "(%s, %s, now(), 'car', 0.9)"
+                else:
+                    sql = f'INSERT INTO "{table}" (drone_id, "timestamp", vehicle_type, confidence) VALUES %s'
+                    template = "(%s, now(), 'car', 0.9)"
+
+                started = time.perf_counter()
+                for offset in range(0, rows, batch_size):
+                    count = min(batch_size, rows - offset)
+                    if generate:
+                        values = [(generate(), drone_id) for _ in range(count)]
+                    else:
+                        values = [(drone_id,) for _ in range(count)]
+                    execute_values(cursor.cursor, sql, values, template=template, page_size=batch_size)
+                result['elapsed'] = time.perf_counter() - started
+
+                cursor.execute(f"SELECT pg_relation_size('{table}_pkey')")
+                result['index_bytes'] = cursor.fetchone()[0]
+                result['leaf_density'] = self.leaf_density(cursor, f'{table}_pkey')
+                raise _Rollback
+        except _Rollback:
+            pass
+        return result
+
+    @staticmethod
+    def leaf_density(cursor, index):
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple'")
+        if not cursor.fetchone():
+            return None
+        cursor.execute('SELECT avg_leaf_density FROM pgstatindex(%s)', [index])
+        return cursor.fetchone()[0]
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from apps.core.consumer_lag import get_partition_lag
+
+
+class Command(BaseCommand):
+    help = 'Shows the last reported per-partition lag of a Kafka consumer group'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group-id', default='skymarshal_detection_group')
+
+    def handle(self, *args, **options):
+        lag = get_partition_lag(options['group_id'])
+        if not lag:
+            self.stdout.write(self.style.WARNING(f"No lag reported for {options['group_id']} recently"))
+            return
+
+        def sort_key(item):
+            topic, _, partition = item[0].rpartition(':')
+            return topic, int(partition)
+
+        for partition, entry in sorted(lag.items(), key=sort_key):
+            self.stdout.write(f"{partition:<32} {entry['lag']:>10}  {entry['worker']}  {entry['updated_at']}")
+        self.stdout.write(self.style.SUCCESS(f"Total lag: {sum(e['lag'] for e in lag.values())}"))
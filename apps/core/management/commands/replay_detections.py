@@ -0,0 +1,239 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import close_old_connections
+from apps.core.dead_letter import unwrap_dead_letter, decode_raw
+from apps.core.kafka_config import get_kafka_consumer
+from apps.detections.services import DetectionIngestService
+from kafka import TopicPartition
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-ingests detection events from the dead-letter topic, an offset range '
+        'of the detections topic, or a JSONL dump, through the batched ingest path'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['dlq', 'topic', 'file'], required=True)
+        parser.add_argument('--file', help='JSONL file of events or dead-letter envelopes (--source file)')
+        parser.add_argument('--topic', help='Topic to read (defaults to the DLQ or detections topic)')
+        parser.add_argument('--partition', type=int, action='append', help='Partition(s) to replay (--source topic)')
+        parser.add_argument('--start-offset', type=int, help='First offset to replay in each partition')
+        parser.add_argument('--end-offset', type=int, help='Last offset to replay in each partition (inclusive)')
+        parser.add_argument(
+            '--group-id', default='skymarshal_detection_replay',
+            help='Consumer group whose offsets track DLQ progress (--source dlq)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=4, help='Batches ingested in parallel')
+        parser.add_argument('--limit', type=int, help='Stop after this many events')
+        parser.add_argument(
+            '--idle-timeout', type=float, default=10.0,
+            help='Stop after this many seconds without new messages (Kafka sources)'
+        )
+        parser.add_argument('--failed-file', help='Append events that still fail here as JSONL')
+        parser.add_argument('--report-interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stats = {'read': 0, 'inserted': 0, 'failed': 0, 'invalid': 0}
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.failed_file = open(options['failed_file'], 'a') if options['failed_file'] else None
+
+        source = options['source']
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='replay') as pool:
+                self.pool = pool
+                if source == 'file':
+                    self.replay_file()
+                elif source == 'dlq':
+                    self.replay_dlq()
+                else:
+                    self.replay_topic_range()
+        finally:
+            if self.failed_file:
+                self.failed_file.close()
+
+        self.report(final=True)
+
+    # Sources
+
+    def replay_file(self):
+        path = self.options['file']
+        if not path:
+            raise CommandError('--file is required with --source file')
+
+        round_events = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    round_events.append(unwrap_dead_letter(json.loads(line)))
+                except ValueError as e:
+                    self.record_failure(line, f"Invalid JSON: {e}", invalid=True)
+                if len(round_events) >= self.round_size or self.limit_reached(len(round_events)):
+                    self.run_round(round_events)
+                    round_events = []
+                    if self.limit_reached():
+                        return
+        self.run_round(round_events)
+
+    def replay_dlq(self):
+        topic = self.options['topic'] or settings.KAFKA_TOPICS['DETECTIONS_DLQ']
+        consumer = get_kafka_consumer(
+            topic=topic,
+            group_id=self.options['group_id'],
+            auto_offset_reset='earliest',
+            enable_auto_commit=False,
+            value_deserializer=None
+        )
+        try:
+            while not self.limit_reached():
+                messages = self.poll_round(consumer)
+                if messages is None:
+                    break
+                self.run_round([unwrap_dead_letter(e) for e in self.decode(messages)])
+                # Progress is only recorded once the round is in the database
+                consumer.commit()
+        finally:
+            consumer.close()
+
+    def replay_topic_range(self):
+        topic = self.options['topic'] or settings.KAFKA_TOPICS['DETECTIONS']
+        consumer = get_kafka_consumer(
+            topic=None,
+            group_id=None,
+            enable_auto_commit=False,
+            value_deserializer=None
+        )
+        try:
+            partitions = self.options['partition'] or sorted(consumer.partitions_for_topic(topic) or [])
+            if not partitions:
+                raise CommandError(f"Topic {topic} has no partitions")
+            tps = [TopicPartition(topic, p) for p in partitions]
+            consumer.assign(tps)
+
+            # Stop at the requested end offset, or at the end of the log as it is now
+            high_watermarks = consumer.end_offsets(tps)
+            end_offsets = {
+                tp: min(self.options['end_offset'], high_watermarks[tp] - 1)
+                if self.options['end_offset'] is not None else high_watermarks[tp] - 1
+                for tp in tps
+            }
+            for tp in tps:
+                if self.options['start_offset'] is not None:
+                    consumer.seek(tp, self.options['start_offset'])
+                else:
+                    consumer.seek_to_beginning(tp)
+
+            remaining = {tp for tp in tps if consumer.position(tp) <= end_offsets[tp]}
+            for tp in set(tps) - remaining:
+                consumer.pause(tp)
+            while remaining and not self.limit_reached():
+                messages = self.poll_round(consumer)
+                if messages is None:
+                    break
+                in_range = []
+                for message in messages:
+                    tp = TopicPartition(message.topic, message.partition)
+                    if message.offset <= end_offsets[tp]:
+                        in_range.append(message)
+                    if message.offset >= end_offsets[tp]:
+                        remaining.discard(tp)
+                        consumer.pause(tp)
+                self.run_round(self.decode(in_range))
+        finally:
+            consumer.close()
+
+    # Plumbing
+
+    @property
+    def round_size(self):
+        return self.options['batch_size'] * self.options['workers']
+
+    def limit_reached(self, pending=0):
+        limit = self.options['limit']
+        return limit is not None and self.stats['read'] + pending >= limit
+
+    def poll_round(self, consumer):
+        """Up to one round of messages, or None once the source stays idle"""
+        messages = []
+        idle_since = time.monotonic()
+        while len(messages) < self.round_size:
+            records = consumer.poll(timeout_ms=500, max_records=self.round_size - len(messages))
+            for batch in records.values():
+                messages.extend(batch)
+            if messages and not records:
+                break
+            if not messages and time.monotonic() - idle_since >= self.options['idle_timeout']:
+                return None
+        return messages
+
+    def decode(self, messages):
+        events = []
+        for message in messages:
+            try:
+                events.append(json.loads(message.value))
+            except (TypeError, ValueError) as e:
+                self.record_failure(decode_raw(message.value), f"Undecodable payload: {e}", invalid=True)
+        return events
+
+    def run_round(self, events):
+        """Ingest one round of events, split into batches across the worker pool"""
+        if self.options['limit'] is not None:
+            events = events[:max(self.options['limit'] - self.stats['read'], 0)]
+        if not events:
+            return
+
+        size = self.options['batch_size']
+        chunks = [events[i:i + size] for i in range(0, len(events), size)]
+        for inserted, failures in self.pool.map(self.ingest, chunks):
+            self.stats['inserted'] += inserted
+            for event, reason in failures:
+                self.record_failure(event, reason)
+        self.stats['read'] += len(events)
+        self.report()
+
+    def ingest(self, events):
+        close_old_connections()
+        rejected = []
+        try:
+            created = DetectionIngestService.ingest_batch(events, rejected=rejected)
+            return len(created), rejected
+        except Exception as e:
+            logger.error(f"Replay batch of {len(events)} events failed: {e}", exc_info=True)
+            return 0, [(event, str(e)) for event in events]
+        finally:
+            close_old_connections()
+
+    def record_failure(self, event, reason, invalid=False):
+        # Undecodable input never reaches ingest, so it is not counted as read
+        self.stats['invalid' if invalid else 'failed'] += 1
+        if self.failed_file:
+            self.failed_file.write(json.dumps({'event': event, 'error': {'reason': reason}}) + '\n')
+
+    def report(self, final=False):
+        now = time.monotonic()
+        if not final and now - self.last_report < self.options['report_interval']:
+            return
+        self.last_report = now
+
+        elapsed = now - self.started
+        read = self.stats['read']
+        # Events that were read and neither inserted nor failed were already stored
+        skipped = max(read - self.stats['inserted'] - self.stats['failed'], 0)
+        line = (
+            f"{read} events in {elapsed:.1f}s ({read / elapsed if elapsed else 0:.0f} events/s): "
+            f"{self.stats['inserted']} inserted, {skipped} already present, {self.stats['failed']} failed, "
+            f"{self.stats['invalid']} undecodable"
+        )
+        self.stdout.write(self.style.SUCCESS(line) if final else line)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.analytics.consumers import AnomalyConsumer
+
+
+class Command(BaseCommand):
+    help = 'Flags traffic anomalies from the analytics event stream'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Events handled per offset commit')
+        parser.add_argument('--group-id', default=None, help='Kafka consumer group (default skymarshal_analytics_group)')
+
+    def handle(self, *args, **options):
+        AnomalyConsumer(batch_size=options['batch_size'], group_id=options['group_id']).run()
@@ -1,87 +1,47 @@
 from django.core.management.base import BaseCommand
-from django.conf import settings
-from django.contrib.gis.geos import Point
-from apps.detections.models import Detection
-from apps.drones.models import Drone
-from apps.core.kafka_config import get_kafka_consumer
-from apps.patrols.services import PatrolService
-import logging
-import signal
-import sys
+from apps.detections.consumers import DetectionConsumer
 
-logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = 'Runs the Kafka consumer for detection events'
 
-    def handle(self, *args, **options):
-        topic = settings.KAFKA_TOPICS['DETECTIONS']
-        
-        logger.info(f"Starting Detection Consumer on topic: {topic}")
-        
-        # Use Factory from core config
-        consumer = get_kafka_consumer(
-            topic=topic, 
-            group_id='skymarshal_detection_group'
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Maximum detections inserted per transaction'
+        )
+        parser.add_argument(
+            '--batch-timeout-ms', type=int, default=500,
+            help='Maximum time to wait while filling a batch'
+        )
+        parser.add_argument(
+            '--retry-delay', type=float, default=5.0,
+            help='Seconds to wait before retrying a batch that failed to insert'
+        )
+        parser.add_argument(
+            '--max-retries', type=int, default=3,
+            help='Batch retries before failing events are sent to the dead-letter topic'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Consumer processes to run; useful up to the number of topic partitions'
+        )
+        parser.add_argument(
+            '--group-id', default='skymarshal_detection_group',
+            help='Consumer group shared by every worker and instance'
+        )
+        parser.add_argument(
+            '--lag-interval', type=float, default=30.0,
+            help='Seconds between throughput and per-partition lag reports'
         )
-        
-        # Handle graceful shutdown
-        def signal_handler(sig, frame):
-            logger.info('Stopping Detection Consumer...')
-            consumer.close()
-            sys.exit(0)
-            
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
-        
-        for message in consumer:
-            try:
-                data = message.value
-                self.process_message(data)
-            except Exception as e:
-                logger.error(f"Error processing message: {e}", exc_info=True)
-
-    def process_message(self, data):
-        """
-        Create a Detection record from the message data
-        """
-        try:
-            drone_id = data.get('drone_id')
-            timestamp = data.get('timestamp')
-            
-            # Find the drone
-            try:
-                drone = Drone.objects.get(drone_id=drone_id)
-            except Drone.DoesNotExist:
-                logger.warning(f"Drone ID {drone_id} not found. Skipping detection.")
-                return
-            
-            # Create Point for location
-            location = None
-            if 'location' in data and data['location']:
-                lat = data['location'].get('latitude')
-                lon = data['location'].get('longitude')
-                if lat is not None and lon is not None:
-                    location = Point(lon, lat)
-
-            # Retrieve active patrol
-            patrol = PatrolService.get_active_patrol(drone_id)
 
-            Detection.objects.create(
-                drone=drone,
-                patrol=patrol,
-                timestamp=timestamp,
-                frame_number=data.get('frame_number'),
-                vehicle_type=data.get('vehicle_type', 'unknown'),
-                confidence=data.get('confidence', 0.0),
-                box_coordinates=data.get('box_coordinates', []),
-                license_plate=data.get('license_plate'),
-                speed=data.get('speed'),
-                location=location,
-                altitude=data.get('location', {}).get('altitude')
-            )
-            
-            logger.info(f"Saved detection for {drone_id} (Frame {data.get('frame_number')})")
-            
-        except Exception as e:
-            logger.error(f"Failed to save detection: {e}", exc_info=True)
+    def handle(self, *args, **options):
+        consumer = DetectionConsumer(
+            batch_size=options['batch_size'],
+            batch_timeout_ms=options['batch_timeout_ms'],
+            retry_delay=options['retry_delay'],
+            max_retries=options['max_retries'],
+            group_id=options['group_id'],
+            metrics_interval=options['lag_interval']
+        )
+        consumer.run(workers=options['workers'])
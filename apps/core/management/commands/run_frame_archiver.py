@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from apps.stream_ingestion.consumers import FrameArchiveConsumer
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Archives raw video frames from Kafka into per-session segment files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Frames written per offset commit')
+
+    def handle(self, *args, **options):
+        logger.info(f"Archiving raw frames to {settings.FRAME_ARCHIVE_ROOT}")
+        FrameArchiveConsumer(batch_size=options['batch_size']).run()
@@ -17,6 +17,9 @@ from apps.violations.models import Violation
 from apps.compliance.models import ComplianceScore, LotteryEvent
 from apps.analytics.models import Recommendation, TrafficMetrics, HeatMap, TrafficPattern, AnalyticsReport
 from apps.notifications.models import Notification
+from apps.core.bulk_loader import copy_insert
+from apps.analytics.grid_codec import encode_grid
+from apps.violations.services import ViolationEngine
 
 
 class Command(BaseCommand):
@@ -139,16 +142,29 @@ class Command(BaseCommand):
             # API Key
             DroneAPIKey.objects.get_or_create(drone=drone)
             
-            # Initial GPS
-            GPSLocation.objects.create(
-                drone=drone,
-                location=Point(36.8219 + random.uniform(-0.05, 0.05), -1.2921 + random.uniform(-0.05, 0.05)),
-                altitude=random.uniform(50, 150)
-            )
-            
             drones.append(drone)
+
+        self.seed_gps_tracks(drones)
         return drones
 
+    def seed_gps_tracks(self, drones):
+        # A day of fixes per drone, ending with the current position
+        now = timezone.now()
+        locations = []
+        for drone in drones:
+            lon = 36.8219 + random.uniform(-0.05, 0.05)
+            lat = -1.2921 + random.uniform(-0.05, 0.05)
+            for minutes_ago in range(24 * 60, -1, -5):
+                lon += random.uniform(-0.001, 0.001)
+                lat += random.uniform(-0.001, 0.001)
+                locations.append(GPSLocation(
+                    drone=drone,
+                    location=Point(lon, lat),
+                    altitude=random.uniform(50, 150),
+                    timestamp=now - timedelta(minutes=minutes_ago)
+                ))
+        copy_insert(locations)
+
     def seed_vehicles(self):
         self.stdout.write('Seeding vehicles...')
         vehicles = []
@@ -223,7 +239,7 @@ class Command(BaseCommand):
                 else:
                     speed = random.uniform(20, limit - 2)
                 
-                d = Detection.objects.create(
+                d = Detection(
                     drone=p.drone,
                     patrol=p,
                     timestamp=p.start_time + timedelta(minutes=random.randint(5, 120)),
@@ -237,6 +253,10 @@ class Command(BaseCommand):
                     altitude=random.uniform(20, 100)
                 )
                 detections.append(d)
+
+        copy_insert(detections)
+        # COPY sends no post_save, so evaluate the rules as the consumer does
+        ViolationEngine.evaluate(detections)
         return detections
 
     def seed_violations(self, patrols, detections):
@@ -318,7 +338,9 @@ class Command(BaseCommand):
                 hour=random.randint(8, 20),
                 metric_type='volume',
                 defaults={
-                    'location_grid': {"data": [[random.random() for _ in range(10)] for _ in range(10)]},
+                    'grid_data': encode_grid(
+                        [[random.uniform(0, 100) for _ in range(10)] for _ in range(10)], -1.4, 36.7, 0.02
+                    ),
                     'min_lat': -1.4, 'max_lat': -1.2, 'min_lon': 36.7, 'max_lon': 36.9
                 }
             )
@@ -1,7 +1,51 @@
 from django.db import models
+import os
+import threading
+import time
 import uuid
 
 
+_uuid7_lock = threading.Lock()
+_last_uuid7_ms = 0
+_uuid7_sequence = 0
+
+
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48 bits of Unix milliseconds,
+    a 12-bit sequence that keeps ids from one process increasing within a
+    millisecond, then 62 random bits.
+
+    New keys land at the right-hand edge of the primary key B-tree instead
+    of at random pages, and the value still fits a plain uuid column.
+    """
+    global _last_uuid7_ms, _uuid7_sequence
+
+    # Ids are created from thread pools too; the clock and sequence must
+    # advance together
+    with _uuid7_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _last_uuid7_ms:
+            # Same millisecond (or the clock stepped back): keep counting from the last id
+            _uuid7_sequence += 1
+            if _uuid7_sequence > 0xFFF:
+                _last_uuid7_ms += 1
+                _uuid7_sequence = 0
+            ms = _last_uuid7_ms
+        else:
+            _last_uuid7_ms = ms
+            _uuid7_sequence = int.from_bytes(os.urandom(2), 'big') & 0x3FF
+        sequence = _uuid7_sequence
+
+    rand_b = int.from_bytes(os.urandom(8), 'big') & 0x3FFF_FFFF_FFFF_FFFF
+    value = (ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76
+    value |= sequence << 64
+    value |= 0b10 << 62
+    value |= rand_b
+    return uuid.UUID(int=value)
+
+
 class TimestampedModel(models.Model):
     """Abstract base model with UUID primary key and timestamps"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -10,4 +54,15 @@ class TimestampedModel(models.Model):
     
     class Meta:
         abstract = True
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+
+class TimeOrderedModel(TimestampedModel):
+    """
+    TimestampedModel with UUIDv7 primary keys, for append-heavy tables.
+    Rows created before the switch keep their uuid4 ids.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+
+    class Meta(TimestampedModel.Meta):
+        abstract = True
@@ -0,0 +1,228 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = {
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+PARTITION_SUFFIX = re.compile(r'_p(\d{8})$')
+
+
+def interval_delta(interval):
+    try:
+        return INTERVALS[interval]
+    except KeyError:
+        raise ValueError(f"Unsupported partition interval: {interval}")
+
+
+def period_start(dt, interval):
+    """Start (UTC midnight, Monday for weeks) of the partition containing `dt`"""
+    dt = dt.astimezone(dt_timezone.utc)
+    start = datetime(dt.year, dt.month, dt.day, tzinfo=dt_timezone.utc)
+    if interval == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def table_config(table):
+    return settings.TIME_PARTITIONED_TABLES[table]
+
+
+def existing_partitions(cursor, table):
+    """{partition name: start} for the range partitions of `table`"""
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        [table]
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions[name] = datetime.strptime(match.group(1), '%Y%m%d').replace(tzinfo=dt_timezone.utc)
+    return partitions
+
+
+def create_partition(cursor, table, start, config=None):
+    """
+    Create and attach the partition starting at `start`.
+
+    Rows that landed in the default partition for this range (e.g. clock
+    skew or a late maintenance run) are moved into the new partition first,
+    otherwise attaching would fail. `config` defaults to the table's entry
+    in TIME_PARTITIONED_TABLES.
+    """
+    config = config or table_config(table)
+    column = config['column']
+    end = start + interval_delta(config['interval'])
+    name = partition_name(table, start)
+
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM "{default_partition_name(table)}"
+            WHERE "{column}" >= %s AND "{column}" < %s
+            RETURNING *
+        )
+        INSERT INTO "{name}" SELECT * FROM moved
+        """,
+        [start, end]
+    )
+    moved = cursor.rowcount
+    cursor.execute(
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+        [start, end]
+    )
+    logger.info(f"Created partition {name} [{start:%Y-%m-%d}, {end:%Y-%m-%d}), moved {moved} rows from default")
+    return name
+
+
+def ensure_partitions(table, start=None, end=None, using=None, config=None):
+    """
+    Make sure partitions exist from `start` (default: now) through `end`
+    (default: `premake` intervals ahead). Returns the names created.
+    """
+    config = config or table_config(table)
+    interval = config['interval']
+    step = interval_delta(interval)
+    now = timezone.now()
+    current = period_start(start or now, interval)
+    end = end or now + step * config['premake']
+
+    conn = using or connection
+    created = []
+    with conn.cursor() as cursor:
+        existing = set(existing_partitions(cursor, table).values())
+        while current <= end:
+            if current not in existing:
+                with transaction.atomic(using=conn.alias):
+                    created.append(create_partition(cursor, table, current, config))
+            current += step
+    return created
+
+
+def is_referenced(cursor, partition, references):
+    """True if any row of `partition` is still referenced from another table"""
+    for ref_table, ref_column in references:
+        cursor.execute(
+            f'SELECT 1 FROM "{ref_table}" r JOIN "{partition}" p ON p.id = r."{ref_column}" LIMIT 1'
+        )
+        if cursor.fetchone():
+            return True
+    return False
+
+
+def drop_expired_partitions(table, now=None, using=None):
+    """
+    Apply the table's retention policy: partitions that end before the
+    retention cutoff are detached, and dropped unless the policy is
+    'detach'. Partitions holding rows other tables still reference (e.g.
+    detections with violations) are kept. Returns the names removed.
+    """
+    config = table_config(table)
+    retention_days = config.get('retention_days')
+    if not retention_days:
+        return []
+
+    step = interval_delta(config['interval'])
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    action = config.get('retention_action', 'drop')
+
+    conn = using or connection
+    removed = []
+    with conn.cursor() as cursor:
+        for name, start in sorted(existing_partitions(cursor, table).items(), key=lambda p: p[1]):
+            if start + step > cutoff:
+                continue
+            if is_referenced(cursor, name, config.get('referenced_by', [])):
+                logger.warning(f"Keeping expired partition {name}: rows are still referenced")
+                continue
+            with transaction.atomic(using=conn.alias):
+                cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                if action == 'drop':
+                    cursor.execute(f'DROP TABLE "{name}"')
+            logger.info(f"{'Dropped' if action == 'drop' else 'Detached'} expired partition {name}")
+            removed.append(name)
+    return removed
+
+
+def maintain_partitions():
+    """Create upcoming partitions and enforce retention for every partitioned table"""
+    report = {}
+    for table in settings.TIME_PARTITIONED_TABLES:
+        report[table] = {
+            'created': ensure_partitions(table),
+            'removed': drop_expired_partitions(table),
+        }
+    return report
+
+
+def partition_existing_table(connection, table, config, foreign_keys, indexes, referencing_constraints=()):
+    """
+    Convert a plain table into a range-partitioned one, for migrations.
+
+    The table is rebuilt as `PARTITION BY RANGE (<column>)` with a default
+    partition and one partition per interval from its oldest row to
+    `premake` intervals ahead, and its rows are copied over. `config` gives
+    the column, interval and premake; migrations pass their own frozen
+    values rather than the current settings. Postgres requires the
+    partition column in every unique index, so the primary key becomes
+    (id, <column>). `foreign_keys` is a list of (column, referenced table)
+    pairs and `indexes` a list of CREATE INDEX statements, both recreated
+    on the new table.
+
+    `referencing_constraints` lists (table, constraint) pairs of foreign
+    keys from other tables into this one; they are dropped first. Any other
+    object depending on the table makes the migration fail rather than
+    being dropped with it.
+    """
+    column = config['column']
+    legacy = f"{table}_legacy"
+
+    with connection.cursor() as cursor:
+        for ref_table, constraint in referencing_constraints:
+            cursor.execute(f'ALTER TABLE "{ref_table}" DROP CONSTRAINT "{constraint}"')
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+        cursor.execute(
+            f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+            f'PARTITION BY RANGE ("{column}")'
+        )
+        cursor.execute(f'CREATE TABLE "{default_partition_name(table)}" PARTITION OF "{table}" DEFAULT')
+
+        cursor.execute(f'SELECT MIN("{column}") FROM "{legacy}"')
+        oldest = cursor.fetchone()[0]
+        ensure_partitions(table, start=oldest, using=connection, config=config)
+
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"')
+        # Also drops the legacy indexes, freeing their names for reuse below
+        cursor.execute(f'DROP TABLE "{legacy}"')
+
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, "{column}")')
+        for fk_column, ref_table in foreign_keys:
+            cursor.execute(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_{fk_column}_fk_{ref_table}_id" '
+                f'FOREIGN KEY ("{fk_column}") REFERENCES "{ref_table}" (id) DEFERRABLE INITIALLY DEFERRED'
+            )
+        for statement in indexes:
+            cursor.execute(statement)
@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'reference_cache:invalidate'
+
+# Stored for keys the loader could not find, so lookups for e.g. a drone
+# without an active patrol are cached too instead of hitting the database
+NEGATIVE = '__reference_cache_none__'
+
+
+class ReferenceCache:
+    """
+    Two-tier cache for slowly changing reference data (drones, patrols, ...).
+
+    Lookups go to a process-local LRU first, then Redis, then `loader`, which
+    receives the list of missing keys and returns {key: value} for those it
+    found. Keys are always strings.
+
+    Writers call invalidate(); it clears Redis and publishes the keys on a
+    pub/sub channel so every process drops its local copy. The short local
+    TTL bounds staleness should an invalidation message be missed.
+
+    Values a loader returns as model instances should not be pickled into
+    Redis, where they outlive the code that wrote them: `dump` turns a
+    value into plain data for Redis and `restore` rebuilds it on the way
+    back. The local tier keeps the restored values.
+    """
+    _registry = {}
+
+    def __init__(self, name, loader, local_ttl=None, redis_ttl=None, max_entries=None, dump=None, restore=None):
+        self.name = name
+        self.loader = loader
+        self.dump = dump
+        self.restore = restore
+        self.local_ttl = local_ttl if local_ttl is not None else settings.REFERENCE_CACHE_LOCAL_TTL
+        self.redis_ttl = redis_ttl if redis_ttl is not None else settings.REFERENCE_CACHE_REDIS_TTL
+        self.max_entries = max_entries or settings.REFERENCE_CACHE_MAX_ENTRIES
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        ReferenceCache._registry[name] = self
+
+    def redis_key(self, key):
+        return f"refcache:{self.name}:{key}"
+
+    def get(self, key):
+        return self.get_many([key]).get(str(key))
+
+    def get_many(self, keys):
+        """{key: value} for every key that exists; absent keys are omitted"""
+        _ensure_listener()
+        keys = {str(k) for k in keys}
+        found = {}
+
+        misses = self._get_local(keys, found)
+        if misses:
+            misses = self._get_redis(misses, found)
+        if misses:
+            self._load(misses, found)
+
+        return {k: v for k, v in found.items() if v != NEGATIVE}
+
+    def _get_local(self, keys, found):
+        now = time.monotonic()
+        misses = []
+        with self._lock:
+            for key in keys:
+                entry = self._local.get(key)
+                if entry is not None and entry[0] > now:
+                    self._local.move_to_end(key)
+                    found[key] = entry[1]
+                else:
+                    misses.append(key)
+        return misses
+
+    def _get_redis(self, keys, found):
+        try:
+            cached = cache.get_many([self.redis_key(k) for k in keys])
+        except Exception as e:
+            logger.warning(f"Reference cache '{self.name}' could not read Redis: {e}")
+            return keys
+
+        misses = []
+        hits = {}
+        for key in keys:
+            redis_key = self.redis_key(key)
+            if redis_key in cached:
+                value = cached[redis_key]
+                hits[key] = self.restore(value) if self.restore and value != NEGATIVE else value
+            else:
+                misses.append(key)
+        self._set_local(hits)
+        found.update(hits)
+        return misses
+
+    def _load(self, keys, found):
+        loaded = self.loader(keys)
+        values = {k: loaded.get(k, NEGATIVE) for k in keys}
+        try:
+            cache.set_many({
+                self.redis_key(k): self.dump(v) if self.dump and v != NEGATIVE else v
+                for k, v in values.items()
+            }, timeout=self.redis_ttl)
+        except Exception as e:
+            logger.warning(f"Reference cache '{self.name}' could not write Redis: {e}")
+        self._set_local(values)
+        found.update(values)
+
+    def _set_local(self, values):
+        expires = time.monotonic() + self.local_ttl
+        with self._lock:
+            for key, value in values.items():
+                self._local[key] = (expires, value)
+                self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def clear_local(self, keys=None):
+        with self._lock:
+            if keys is None:
+                self._local.clear()
+            else:
+                for key in keys:
+                    self._local.pop(str(key), None)
+
+    def invalidate(self, *keys):
+        """Drop `keys` from Redis and from the local tier of every process"""
+        keys = [str(k) for k in keys]
+        if not keys:
+            return
+        self.clear_local(keys)
+        try:
+            cache.delete_many([self.redis_key(k) for k in keys])
+            get_redis_connection('default').publish(
+                INVALIDATION_CHANNEL, json.dumps({'cache': self.name, 'keys': keys})
+            )
+        except Exception as e:
+            logger.warning(f"Reference cache '{self.name}' could not publish invalidation: {e}")
+
+
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    """Start the invalidation subscriber once per process (again after fork)"""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        # A forked child inherits the parent's local entries but not its thread
+        for reference_cache in ReferenceCache._registry.values():
+            reference_cache.clear_local()
+        threading.Thread(
+            target=_listen_for_invalidations, name='reference-cache-invalidation', daemon=True
+        ).start()
+
+
+def _listen_for_invalidations():
+    delay = 1
+    while True:
+        try:
+            pubsub = get_redis_connection('default').pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            delay = 1
+            for message in pubsub.listen():
+                payload = json.loads(message['data'])
+                reference_cache = ReferenceCache._registry.get(payload.get('cache'))
+                if reference_cache is not None:
+                    reference_cache.clear_local(payload.get('keys'))
+        except Exception as e:
+            logger.warning(f"Reference cache invalidation listener failed: {e}. Reconnecting in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+        # Messages may have been missed while disconnected
+        for reference_cache in ReferenceCache._registry.values():
+            reference_cache.clear_local()
@@ -1,6 +1,7 @@
 import boto3
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.utils.functional import cached_property
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,9 +10,15 @@ class StorageService:
     """
     Service for file storage operations via S3 (or default storage)
     """
-    def __init__(self):
+    def __init__(self, storage=None):
+        # Defaults to the configured default storage (S3, or the local
+        # filesystem when STORAGE_BACKEND=local)
+        self.storage = storage or default_storage
+
+    @cached_property
+    def s3_client(self):
          # S3 is largely handled by django-storages, but we might need direct access for specific operations
-        self.s3_client = boto3.client(
+        return boto3.client(
             's3',
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
@@ -23,7 +30,7 @@ class StorageService:
         Uploads a file to S3 using django-storages default storage
         """
         try:
-            return default_storage.save(file_path, file_obj)
+            return self.storage.save(file_path, file_obj)
         except Exception as e:
              logger.error(f"Failed to upload file {file_path}: {e}")
              raise
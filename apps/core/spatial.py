@@ -0,0 +1,133 @@
+"""
+Hierarchical equal-area cell ids.
+
+Points are projected with the Lambert cylindrical equal-area projection
+(x = longitude, y = sin(latitude)), which maps equal areas on the sphere to
+equal areas in the plane, and the unit square is split as a quadtree.
+A cell id is the Morton (Z-order) interleaving of the cell's column and row
+at MAX_LEVEL, so:
+
+- every cell at a level covers the same area of the earth,
+- longitudes wrap at the antimeridian instead of overflowing,
+- the ancestor at level L is `cell_id >> 2 * (MAX_LEVEL - L)`, so a
+  rollup at any level is an integer GROUP BY.
+"""
+from django.db import models
+import math
+import numpy as np
+
+# 2^24 columns: about 2.4m at the equator, about 1.8m^2 per cell
+MAX_LEVEL = 24
+
+EARTH_AREA_M2 = 4 * math.pi * 6371008.8 ** 2
+
+
+def _spread(v):
+    """Interleave zeros between the low 32 bits of v (uint64 arrays)"""
+    v = v & np.uint64(0x00000000FFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def _compact(v):
+    """Inverse of _spread"""
+    v = v & np.uint64(0x5555555555555555)
+    v = (v | (v >> np.uint64(1))) & np.uint64(0x3333333333333333)
+    v = (v | (v >> np.uint64(2))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v >> np.uint64(4))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v >> np.uint64(8))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v >> np.uint64(16))) & np.uint64(0x00000000FFFFFFFF)
+    return v
+
+
+def cell_ids(lats, lons, level=MAX_LEVEL):
+    """Cell ids (int64 array) at `level` for arrays of latitudes and longitudes"""
+    lats = np.asarray(lats, dtype='f8')
+    lons = np.asarray(lons, dtype='f8')
+    size = 1 << level
+    # Wrap longitudes into [-180, 180) so the antimeridian is continuous
+    x = np.mod(lons + 180.0, 360.0) / 360.0
+    y = (np.sin(np.radians(np.clip(lats, -90.0, 90.0))) + 1.0) / 2.0
+    col = np.minimum((x * size).astype('u8'), size - 1)
+    row = np.minimum((y * size).astype('u8'), size - 1)
+    return (_spread(col) | (_spread(row) << np.uint64(1))).astype('i8')
+
+
+def cell_id(lat, lon, level=MAX_LEVEL):
+    return int(cell_ids([lat], [lon], level)[0])
+
+
+def parent_shift(level):
+    """Right shift that turns a MAX_LEVEL cell id into its `level` ancestor"""
+    if not 0 <= level <= MAX_LEVEL:
+        raise ValueError(f"Cell level must be between 0 and {MAX_LEVEL}")
+    return 2 * (MAX_LEVEL - level)
+
+
+def parent_sql(column, level):
+    """SQL expression for the `level` ancestor of a cell id column"""
+    return f'({column} >> {parent_shift(level)})'
+
+
+def cell_coords(ids):
+    """(cols, rows) int64 arrays of cells on their level's grid"""
+    ids = np.asarray(ids, dtype='i8').astype('u8')
+    return _compact(ids).astype('i8'), _compact(ids >> np.uint64(1)).astype('i8')
+
+
+def cell_centers(ids, level):
+    """(lats, lons) arrays of the centres of `level` cells"""
+    size = 1 << level
+    col, row = cell_coords(ids)
+    lons = (col + 0.5) / size * 360.0 - 180.0
+    lats = np.degrees(np.arcsin(np.clip((row + 0.5) / size * 2.0 - 1.0, -1.0, 1.0)))
+    return lats, lons
+
+
+def cell_area_m2(level):
+    return EARTH_AREA_M2 / 4 ** level
+
+
+def level_for_size(meters):
+    """Finest level whose cells are at least `meters` across (as sqrt of area)"""
+    for level in range(MAX_LEVEL, -1, -1):
+        if math.sqrt(cell_area_m2(level)) >= meters:
+            return level
+    return 0
+
+
+class CellIdField(models.BigIntegerField):
+    """
+    MAX_LEVEL cell id of the point in `source_field`, filled in on save,
+    bulk_create and COPY loads whenever it is not set explicitly.
+    """
+
+    def __init__(self, *args, source_field='location', **kwargs):
+        self.source_field = source_field
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.source_field != 'location':
+            kwargs['source_field'] = self.source_field
+        # Only record values that differ from this field's own defaults
+        for key, field_default, default in (('null', False, True), ('blank', False, True), ('editable', True, False)):
+            value = kwargs.pop(key, field_default)
+            if value != default:
+                kwargs[key] = value
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        point = getattr(model_instance, self.source_field, None)
+        if value is None and point is not None:
+            value = cell_id(point.y, point.x)
+            setattr(model_instance, self.attname, value)
+        return value
@@ -1,3 +1,4 @@
 from .email import send_email_task
 from .sms import send_sms_task
+from .partitions import maintain_time_partitions
 # Future tasks can be imported here
@@ -0,0 +1,14 @@
+from celery import shared_task
+from apps.core.partitions import maintain_partitions
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def maintain_time_partitions():
+    """
+    Celery task creating upcoming partitions and applying retention
+    """
+    report = maintain_partitions()
+    logger.info(f"Partition maintenance completed: {report}")
+    return report
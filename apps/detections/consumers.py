@@ -0,0 +1,50 @@
+from django.db import close_old_connections
+from apps.core.consumers import BatchConsumer
+from apps.detections.services import DetectionIngestService
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionConsumer(BatchConsumer):
+    """Ingests detection events in batches; bad events go to the dead-letter topic"""
+
+    topic_key = 'DETECTIONS'
+    group_id = 'skymarshal_detection_group'
+    dead_letter_topic_key = 'DETECTIONS_DLQ'
+
+    def handle_batch(self, records):
+        """
+        Create Detection records for a batch of messages in one transaction
+        """
+        started = time.perf_counter()
+        messages_by_event = {id(record.value): record.message for record in records}
+        rejected = []
+        created = DetectionIngestService.ingest_batch([record.value for record in records], rejected=rejected)
+
+        for event, reason in rejected:
+            self.dead_letter(event, reason, stage='validate', message=messages_by_event.get(id(event)))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"Saved {len(created)}/{len(records)} detections in {elapsed_ms:.1f}ms "
+            f"({len(rejected)} rejected)"
+        )
+
+    def handle_failed_batch(self, records, attempts, exc):
+        """
+        Give up on the batch as a whole; whatever still fails on its own
+        goes to the dead-letter topic
+        """
+        close_old_connections()
+        for message, event in records:
+            rejected = []
+            try:
+                DetectionIngestService.ingest_batch([event], rejected=rejected)
+            except Exception as e:
+                close_old_connections()
+                self.dead_letter(event, str(e), stage='ingest', message=message, exc=e, attempts=attempts)
+                continue
+            for event, reason in rejected:
+                self.dead_letter(event, reason, stage='validate', message=message)
@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detections', '0003_initial'),
+        ('stream_ingestion', '0002_streamsession_live_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detection',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='detections', to='stream_ingestion.streamsession'),
+        ),
+        migrations.AddConstraint(
+            model_name='detection',
+            constraint=models.UniqueConstraint(condition=models.Q(('session__isnull', False), ('track_id__isnull', False)), fields=('session', 'frame_number', 'track_id'), name='detections_session_frame_track_uniq'),
+        ),
+    ]
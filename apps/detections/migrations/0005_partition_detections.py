@@ -0,0 +1,62 @@
+# Generated by Django 5.0 on 2026-10-19 11:42
+
+from django.db import migrations, models
+
+# Frozen when the migration was written; later changes to
+# TIME_PARTITIONED_TABLES must not change what replaying it does
+PARTITIONING = {'column': 'timestamp', 'interval': 'day', 'premake': 7}
+
+
+def partition_detections(apps, schema_editor):
+    from apps.core.partitions import partition_existing_table
+
+    # The violations foreign key was already removed by
+    # violations.0002_violation_detection_no_db_constraint
+    partition_existing_table(
+        schema_editor.connection,
+        'detections',
+        PARTITIONING,
+        foreign_keys=[
+            ('drone_id', 'drones'),
+            ('patrol_id', 'patrols'),
+            ('session_id', 'stream_sessions'),
+        ],
+        indexes=[
+            'CREATE INDEX "detections_timestamp_idx" ON "detections" ("timestamp")',
+            'CREATE INDEX "detections_created_at_idx" ON "detections" ("created_at")',
+            'CREATE INDEX "detections_drone_id_idx" ON "detections" ("drone_id")',
+            'CREATE INDEX "detections_patrol_id_idx" ON "detections" ("patrol_id")',
+            'CREATE INDEX "detections_session_id_idx" ON "detections" ("session_id")',
+            'CREATE INDEX "detections_location_id" ON "detections" USING GIST ("location")',
+            'CREATE INDEX "detections_drone_i_5e998f_idx" ON "detections" ("drone_id", "timestamp" DESC)',
+            'CREATE UNIQUE INDEX "detections_session_frame_track_uniq" ON "detections" '
+            '("session_id", "frame_number", "track_id", "timestamp") '
+            'WHERE ("session_id" IS NOT NULL AND "track_id" IS NOT NULL)',
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detections', '0004_detection_session_dedup'),
+        ('violations', '0002_violation_detection_no_db_constraint'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_detections),
+            ],
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='detection',
+                    name='detections_session_frame_track_uniq',
+                ),
+                migrations.AddConstraint(
+                    model_name='detection',
+                    constraint=models.UniqueConstraint(condition=models.Q(('session__isnull', False), ('track_id__isnull', False)), fields=('session', 'frame_number', 'track_id', 'timestamp'), name='detections_session_frame_track_uniq'),
+                ),
+            ],
+        ),
+    ]
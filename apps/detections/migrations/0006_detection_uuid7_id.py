@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-19 13:10
+
+import apps.core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detections', '0005_partition_detections'),
+    ]
+
+    operations = [
+        # Python-side default only: existing uuid4 ids are kept and the
+        # column is unchanged, so this is a no-op in the database
+        migrations.AlterField(
+            model_name='detection',
+            name='id',
+            field=models.UUIDField(default=apps.core.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 15:40
+
+import apps.core.spatial
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detections', '0006_detection_uuid7_id'),
+    ]
+
+    # Existing rows keep a NULL cell_id until backfill_cell_ids has run
+    operations = [
+        migrations.AddField(
+            model_name='detection',
+            name='cell_id',
+            field=apps.core.spatial.CellIdField(),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(fields=['cell_id', 'timestamp'], name='detections_cell_ts_idx'),
+        ),
+    ]
@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.gis.db import models as gis_models
-from apps.core.models import TimestampedModel
+from apps.core.models import TimeOrderedModel
+from apps.core.spatial import CellIdField
 from apps.drones.models import Drone
 
-class Detection(TimestampedModel):
+class Detection(TimeOrderedModel):
     drone = models.ForeignKey(Drone, on_delete=models.CASCADE, related_name='detections')
     patrol = models.ForeignKey('patrols.Patrol', on_delete=models.SET_NULL, null=True, blank=True, related_name='detections')
+    session = models.ForeignKey('stream_ingestion.StreamSession', on_delete=models.SET_NULL, null=True, blank=True, related_name='detections')
     timestamp = models.DateTimeField(db_index=True)
     frame_number = models.IntegerField()
     
@@ -23,12 +25,26 @@ class Detection(TimestampedModel):
     # Location where detection happened
     location = gis_models.PointField(geography=True, null=True, blank=True)
     altitude = models.FloatField(null=True, blank=True)
+    # Equal-area cell of `location`, for spatial GROUP BYs (apps.core.spatial)
+    cell_id = CellIdField()
 
     class Meta:
         db_table = 'detections'
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['drone', '-timestamp']),
+            models.Index(fields=['cell_id', 'timestamp'], name='detections_cell_ts_idx'),
+        ]
+        constraints = [
+            # Natural idempotency key: a tracked vehicle appears once per frame
+            # of a stream session, so Kafka redeliveries insert nothing. The
+            # table is range-partitioned on timestamp, which every unique
+            # index must include; a frame always carries one timestamp.
+            models.UniqueConstraint(
+                fields=['session', 'frame_number', 'track_id', 'timestamp'],
+                condition=models.Q(session__isnull=False, track_id__isnull=False),
+                name='detections_session_frame_track_uniq'
+            ),
         ]
 
     def __str__(self):
@@ -0,0 +1,128 @@
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from apps.analytics.events import publish_traffic_events
+from apps.core.bulk_loader import copy_insert
+from apps.drones.services import DroneService
+from apps.patrols.services import PatrolService
+from apps.stream_ingestion.services import session_id_cache
+from .models import Detection
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionIngestService:
+    """
+    Turns detection events from the CV pipeline into Detection rows.
+    """
+
+    @staticmethod
+    def build_detection(data, drone, patrol_id, session_id=None):
+        """
+        Unsaved Detection for one event. Raises ValueError if the event is
+        unusable.
+        """
+        timestamp = data.get('timestamp')
+        if isinstance(timestamp, str):
+            timestamp = parse_datetime(timestamp)
+        if timestamp is None:
+            raise ValueError(f"Detection from {data.get('drone_id')} has no valid timestamp")
+
+        location = None
+        location_data = data.get('location') or {}
+        lat = location_data.get('latitude')
+        lon = location_data.get('longitude')
+        if lat is not None and lon is not None:
+            location = Point(lon, lat)
+
+        return Detection(
+            drone=drone,
+            patrol_id=patrol_id,
+            session_id=session_id,
+            timestamp=timestamp,
+            frame_number=data.get('frame_number'),
+            vehicle_type=data.get('vehicle_type', 'unknown'),
+            confidence=data.get('confidence', 0.0),
+            box_coordinates=data.get('box_coordinates', []),
+            track_id=data.get('track_id'),
+            license_plate=data.get('license_plate'),
+            speed=data.get('speed'),
+            location=location,
+            altitude=location_data.get('altitude')
+        )
+
+    @staticmethod
+    def ingest_batch(events, rejected=None):
+        """
+        Insert a batch of detection events and evaluate their rules in a
+        single transaction. Ingestion is idempotent: events already stored
+        are skipped, which is only safe because a stored detection always
+        comes with its violations and compliance points.
+
+        Drones and active patrols are resolved once for the whole batch.
+        Events for unknown drones or with unusable payloads are skipped and,
+        if a `rejected` list is given, reported in it as (event, reason)
+        pairs. Database and rule evaluation errors propagate so the caller
+        can retry the batch; side effects outside the database (analytics
+        events, notifications, evidence requests) only run once it commits.
+        Returns the list of newly created Detection instances.
+        """
+        def reject(event, reason):
+            logger.warning(f"Skipping detection event: {reason}")
+            if rejected is not None:
+                rejected.append((event, reason))
+
+        valid = []
+        for event in events:
+            if isinstance(event, dict):
+                valid.append(event)
+            else:
+                reject(event, f"Payload is not an object: {type(event).__name__}")
+        events = valid
+
+        drone_ids = {e.get('drone_id') for e in events if e.get('drone_id')}
+        drones = DroneService.get_drones(drone_ids)
+
+        patrol_ids = PatrolService.get_active_patrol_ids(drones.keys())
+        # 'stream_id' on detection events is the StreamSession id
+        sessions = session_id_cache.get_many(
+            {str(e['stream_id']) for e in events if e.get('stream_id')}
+        )
+
+        detections = []
+        for data in events:
+            drone = drones.get(data.get('drone_id'))
+            if drone is None:
+                reject(data, f"Drone ID {data.get('drone_id')} not found")
+                continue
+            try:
+                detections.append(DetectionIngestService.build_detection(
+                    data, drone, patrol_ids.get(drone.drone_id),
+                    sessions.get(str(data.get('stream_id')))
+                ))
+            except (ValueError, TypeError) as e:
+                reject(data, str(e))
+
+        if not detections:
+            return []
+
+        from apps.violations.services import ViolationEngine
+        with transaction.atomic():
+            # Streamed in with COPY; redelivered events hit the (session,
+            # frame_number, track_id) unique index and are skipped by ON
+            # CONFLICT DO NOTHING, and RETURNING tells us which rows are new
+            inserted = copy_insert(detections, ignore_conflicts=True)
+
+            duplicates = len(detections) - len(inserted)
+            if duplicates:
+                logger.info(f"Skipped {duplicates} already ingested detections")
+            detections = [d for d in detections if d.id in inserted]
+            if not detections:
+                return []
+
+            # COPY skips post_save, so rules are evaluated for the whole
+            # batch here rather than by the per-row signal receivers
+            violations = ViolationEngine.evaluate(detections)
+            transaction.on_commit(lambda: publish_traffic_events(detections, violations))
+        return detections
@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-19 11:44
+
+from django.db import migrations
+
+# Frozen when the migration was written; later changes to
+# TIME_PARTITIONED_TABLES must not change what replaying it does
+PARTITIONING = {'column': 'timestamp', 'interval': 'day', 'premake': 7}
+
+
+def partition_gps_locations(apps, schema_editor):
+    from apps.core.partitions import partition_existing_table
+
+    partition_existing_table(
+        schema_editor.connection,
+        'gps_locations',
+        PARTITIONING,
+        foreign_keys=[
+            ('drone_id', 'drones'),
+        ],
+        indexes=[
+            'CREATE INDEX "gps_locations_timestamp_idx" ON "gps_locations" ("timestamp")',
+            'CREATE INDEX "gps_locations_created_at_idx" ON "gps_locations" ("created_at")',
+            'CREATE INDEX "gps_locations_drone_id_idx" ON "gps_locations" ("drone_id")',
+            'CREATE INDEX "gps_locations_location_id" ON "gps_locations" USING GIST ("location")',
+            'CREATE INDEX "gps_locatio_drone_i_6ea882_idx" ON "gps_locations" ("drone_id", "timestamp" DESC)',
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_gps_locations),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-19 13:10
+
+import apps.core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0003_partition_gps_locations'),
+    ]
+
+    operations = [
+        # Python-side default only: existing uuid4 ids are kept and the
+        # column is unchanged, so this is a no-op in the database
+        migrations.AlterField(
+            model_name='gpslocation',
+            name='id',
+            field=models.UUIDField(default=apps.core.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
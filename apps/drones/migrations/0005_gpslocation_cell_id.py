@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 15:40
+
+import apps.core.spatial
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0004_gpslocation_uuid7_id'),
+    ]
+
+    # Existing rows keep a NULL cell_id until backfill_cell_ids has run
+    operations = [
+        migrations.AddField(
+            model_name='gpslocation',
+            name='cell_id',
+            field=apps.core.spatial.CellIdField(),
+        ),
+        migrations.AddIndex(
+            model_name='gpslocation',
+            index=models.Index(fields=['cell_id', 'timestamp'], name='gps_locations_cell_ts_idx'),
+        ),
+    ]
@@ -2,7 +2,8 @@ from django.db import models
 from django.contrib.gis.db import models as gis_models
 from django.utils import timezone
 import secrets
-from apps.core.models import TimestampedModel
+from apps.core.models import TimestampedModel, TimeOrderedModel
+from apps.core.spatial import CellIdField
 
 
 class Drone(TimestampedModel):
@@ -50,17 +51,20 @@ class DroneStatus(TimestampedModel):
         return f"Status for {self.drone.name}"
 
 
-class GPSLocation(TimestampedModel):
+class GPSLocation(TimeOrderedModel):
     drone = models.ForeignKey(Drone, on_delete=models.CASCADE, related_name='gps_locations')
     location = gis_models.PointField(geography=True) 
     altitude = models.FloatField()
     timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Equal-area cell of `location`, for coverage rollups (apps.core.spatial)
+    cell_id = CellIdField()
     
     class Meta:
         db_table = 'gps_locations'
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['drone', '-timestamp']),
+            models.Index(fields=['cell_id', 'timestamp'], name='gps_locations_cell_ts_idx'),
         ]
     
     def __str__(self):
@@ -119,6 +119,23 @@ class GPSLocationUpdateSerializer(serializers.Serializer):
     altitude = serializers.FloatField(required=True)
 
 
+class GPSFixSerializer(GPSLocationUpdateSerializer):
+    """A buffered GPS fix; timestamp defaults to the time of upload"""
+    timestamp = serializers.DateTimeField(required=False)
+
+
+class GPSLocationBatchSerializer(serializers.Serializer):
+    """Serializer for uploading many GPS fixes at once"""
+    MAX_FIXES = 5000
+
+    locations = GPSFixSerializer(many=True, allow_empty=False)
+
+    def validate_locations(self, value):
+        if len(value) > self.MAX_FIXES:
+            raise serializers.ValidationError(f"At most {self.MAX_FIXES} locations per request")
+        return value
+
+
 class StreamRegistrationSerializer(serializers.Serializer):
     """Serializer for stream registration from drones"""
     rtsp_url = serializers.URLField()
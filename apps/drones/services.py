@@ -0,0 +1,36 @@
+from apps.core.reference_cache import ReferenceCache
+from .models import Drone
+
+
+# Drone fields kept in Redis; the rest load on first access
+CACHED_FIELDS = ('id', 'drone_id')
+
+
+def _load_drones(drone_ids):
+    return Drone.objects.in_bulk(drone_ids, field_name='drone_id')
+
+
+def _dump_drone(drone):
+    return [str(getattr(drone, field)) for field in CACHED_FIELDS]
+
+
+def _restore_drone(values):
+    values = [Drone._meta.get_field(field).to_python(value) for field, value in zip(CACHED_FIELDS, values)]
+    return Drone.from_db('default', CACHED_FIELDS, values)
+
+
+# Drones by their external drone_id; Redis holds plain field values, only
+# the process-local tier holds Drone instances
+drone_cache = ReferenceCache('drone_fields', _load_drones, dump=_dump_drone, restore=_restore_drone)
+
+
+class DroneService:
+    @staticmethod
+    def get_drone(drone_id):
+        """Drone for `drone_id` from the reference cache, or None"""
+        return drone_cache.get(drone_id)
+
+    @staticmethod
+    def get_drones(drone_ids):
+        """{drone_id: Drone} for the drones in `drone_ids` that exist"""
+        return drone_cache.get_many(drone_ids)
@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Drone, DroneAPIKey
 import logging
@@ -11,3 +11,14 @@ def create_api_key_for_drone(sender, instance, created, **kwargs):
     if created:
         api_key = DroneAPIKey.objects.create(drone=instance)
         logger.info(f"Generated API key for new drone: {instance.drone_id}")
+
+
+@receiver(post_save, sender=Drone)
+@receiver(post_delete, sender=Drone)
+def invalidate_drone_cache(sender, instance, **kwargs):
+    from apps.patrols.services import active_patrol_cache
+    from .services import drone_cache
+
+    drone_cache.invalidate(instance.drone_id)
+    # Active patrols are cached by drone_id
+    active_patrol_cache.invalidate(instance.drone_id)
@@ -13,8 +13,9 @@ from ..models import Drone, DroneStatus, GPSLocation
 from ..serializers import (
     DroneSerializer, DroneCreateSerializer, DroneStatusSerializer,
     GPSLocationSerializer, DroneStatusUpdateSerializer,
-    DroneAssignSerializer, GPSLocationUpdateSerializer
+    DroneAssignSerializer, GPSLocationUpdateSerializer, GPSLocationBatchSerializer
 )
+from apps.core.bulk_loader import copy_insert
 from apps.core.permissions import IsDroneAuthenticated
 
 from rest_framework.filters import SearchFilter, OrderingFilter
@@ -43,7 +44,7 @@ class DroneViewSet(viewsets.ModelViewSet):
         """
         if self.action in ['create', 'update', 'partial_update', 'destroy', 'assign', 'activate', 'deactivate']:
             permission_classes = [IsAdmin]
-        elif self.action in ['list', 'retrieve', 'status', 'history', 'location']:
+        elif self.action in ['list', 'retrieve', 'status', 'history', 'location', 'location_batch']:
             permission_classes = [permissions.IsAuthenticated]
         else:
             permission_classes = [permissions.IsAuthenticated]
@@ -56,6 +57,8 @@ class DroneViewSet(viewsets.ModelViewSet):
             return DroneAssignSerializer
         if self.action == 'location' and self.request.method == 'POST':
             return GPSLocationUpdateSerializer
+        if self.action == 'location_batch':
+            return GPSLocationBatchSerializer
         if self.action in ['status', 'update_status'] and self.request.method in ['PUT', 'PATCH']:
             return DroneStatusUpdateSerializer
         return DroneSerializer
@@ -171,6 +174,36 @@ class DroneViewSet(viewsets.ModelViewSet):
             
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], url_path='location/batch', permission_classes=[IsDroneAuthenticated])
+    def location_batch(self, request):
+        """Upload buffered GPS fixes in one request (from ESP32)"""
+        drone = request.auth
+
+        if not drone:
+            return Response(
+                {'error': 'Authentication required'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        serializer = GPSLocationBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        locations = [
+            GPSLocation(
+                drone=drone,
+                location=Point(fix['longitude'], fix['latitude']),
+                altitude=fix['altitude'],
+                timestamp=fix.get('timestamp') or now
+            )
+            for fix in serializer.validated_data['locations']
+        ]
+        # COPY rather than one INSERT per fix
+        inserted = copy_insert(locations)
+
+        return Response({'inserted': len(inserted)}, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], permission_classes=[IsAdmin])
     def assign(self, request, drone_id=None):
         """Assign drone to officer"""
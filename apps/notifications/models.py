@@ -1,9 +1,9 @@
 from django.db import models
 from django.conf import settings
-from apps.core.models import TimestampedModel
+from apps.core.models import TimeOrderedModel
 import uuid
 
-class Notification(TimestampedModel):
+class Notification(TimeOrderedModel):
     """
     Model to store user notifications
     """
@@ -48,6 +48,58 @@ def send_notification(user_id, title, message, notification_type='general', rela
         logger.error(f"Failed to process notification task: {e}", exc_info=True)
 
 
+@shared_task
+def send_bulk_notifications(notifications):
+    """
+    Stores and pushes many notifications in one task.
+
+    `notifications` is a list of dicts with the same keys as the arguments of
+    send_notification. Rows are written with a single bulk_create.
+    """
+    from channels.layers import get_channel_layer
+    from asgiref.sync import async_to_sync
+
+    User = get_user_model()
+    try:
+        users = User.objects.in_bulk({n['user_id'] for n in notifications})
+        users = {str(pk): user for pk, user in users.items()}
+
+        created = []
+        for n in notifications:
+            user = users.get(str(n['user_id']))
+            if user is None:
+                logger.error(f"User {n['user_id']} not found for notification: {n['title']}")
+                continue
+            created.append(Notification(
+                recipient=user,
+                title=n['title'],
+                message=n['message'],
+                notification_type=n.get('notification_type', 'general'),
+                related_object_id=n.get('related_object_id')
+            ))
+        Notification.objects.bulk_create(created)
+        logger.info(f"Stored {len(created)} notifications")
+
+        channel_layer = get_channel_layer()
+        if channel_layer:
+            for notification in created:
+                async_to_sync(channel_layer.group_send)(
+                    f"user_{notification.recipient_id}",
+                    {
+                        'type': 'notification_message',
+                        'id': str(notification.id),
+                        'title': notification.title,
+                        'message': notification.message,
+                        'notification_type': notification.notification_type,
+                        'created_at': notification.created_at.isoformat(),
+                        'related_object_id': notification.related_object_id
+                    }
+                )
+
+    except Exception as e:
+        logger.error(f"Failed to process bulk notification task: {e}", exc_info=True)
+
+
 @shared_task
 def send_sms_to_citizen(phone_number, message):
     """
@@ -1,34 +1,74 @@
-from django.core.cache import cache
+from apps.core.reference_cache import ReferenceCache
 from .models import Patrol
 
+DEFAULT_SPEED_LIMIT = 60.0
+DEFAULT_FINE = 50.00
+
+
+def _load_active_patrols(drone_ids):
+    patrols = {}
+    # Oldest first, so the latest active patrol per drone wins
+    for drone_id, patrol_id in Patrol.objects.filter(
+        drone__drone_id__in=drone_ids,
+        status='ACTIVE'
+    ).order_by('start_time').values_list('drone__drone_id', 'id'):
+        patrols[drone_id] = str(patrol_id)
+    return patrols
+
+
+def parse_speed_rules(patrol_config):
+    """
+    (speed_limit, fine_amount) from a patrol config, or None if the config
+    is empty. Values may be strings or numbers; empty means unset.
+    """
+    if not patrol_config:
+        return None
+    return (
+        float(patrol_config.get('speed_limit') or DEFAULT_SPEED_LIMIT),
+        float(patrol_config.get('fine_amount') or DEFAULT_FINE),
+    )
+
+
+def _load_speed_rules(patrol_ids):
+    return {
+        str(patrol_id): parse_speed_rules(config)
+        for patrol_id, config in Patrol.objects.filter(id__in=patrol_ids).values_list('id', 'patrol_config')
+    }
+
+
+# Active patrol id per drone_id (negative entries for drones without one).
+# Only the id, never the Patrol with its officer, is kept in Redis.
+active_patrol_cache = ReferenceCache('active_patrol_id', _load_active_patrols)
+# Parsed speed rules per patrol id
+speed_rules_cache = ReferenceCache('patrol_speed_rules', _load_speed_rules)
+
+
 class PatrolService:
     @staticmethod
-    def get_active_patrol(drone_id):
+    def get_active_patrol_id(drone_id):
+        """
+        Id of the currently active patrol for a drone, or None.
+        Served from the reference cache to avoid hitting the DB on every frame.
+        """
+        return active_patrol_cache.get(drone_id)
+
+    @staticmethod
+    def get_active_patrol_ids(drone_ids):
         """
-        Get the currently active patrol for a drone.
-        Uses caching to avoid hitting the DB on every frame.
+        Bulk variant of get_active_patrol_id: {drone_id: patrol_id} for every
+        drone in `drone_ids` that has an active patrol.
         """
-        cache_key = f"active_patrol_{drone_id}"
-        patrol_id = cache.get(cache_key)
-        
-        if patrol_id:
-            try:
-                return Patrol.objects.get(id=patrol_id)
-            except Patrol.DoesNotExist:
-                cache.delete(cache_key)
-    
-        try:
-            patrol = Patrol.objects.filter(
-                drone__drone_id=drone_id, 
-                status='ACTIVE'
-            ).latest('start_time')
-            
-            cache.set(cache_key, patrol.id, timeout=60)
-            return patrol
-            
-        except Patrol.DoesNotExist:
-            return None
+        return active_patrol_cache.get_many(drone_ids)
+
+    @staticmethod
+    def get_speed_rules(patrol_ids):
+        """{patrol_id: (speed_limit, fine_amount)} for patrols with a config"""
+        return {
+            patrol_id: rules
+            for patrol_id, rules in speed_rules_cache.get_many(patrol_ids).items()
+            if rules is not None
+        }
 
     @staticmethod
     def clear_cache(drone_id):
-        cache.delete(f"active_patrol_{drone_id}")
+        active_patrol_cache.invalidate(drone_id)
@@ -0,0 +1,26 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Patrol
+from .services import active_patrol_cache, speed_rules_cache
+
+
+@receiver(post_save, sender=Patrol)
+@receiver(post_delete, sender=Patrol)
+def invalidate_patrol_cache(sender, instance, **kwargs):
+    """Patrols starting, ending or changing config invalidate cached lookups"""
+    speed_rules_cache.invalidate(instance.id)
+    try:
+        active_patrol_cache.invalidate(instance.drone.drone_id)
+    except ObjectDoesNotExist:
+        # Cascade from a deleted drone; its own signal clears the entry
+        pass
+
+
+@receiver(post_save, sender=Patrol)
+@receiver(post_delete, sender=Patrol)
+def update_dashboard_patrols(sender, instance, **kwargs):
+    """Keep the dashboard's active patrol count current"""
+    from apps.analytics.dashboard import refresh_active_patrols
+    transaction.on_commit(refresh_active_patrols)
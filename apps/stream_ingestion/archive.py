@@ -0,0 +1,171 @@
+from django.conf import settings
+from pathlib import Path
+import logging
+import mmap
+import numpy as np
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# One index record per frame: capture time (epoch seconds), frame number,
+# byte offset and length of the JPEG inside the segment file.
+INDEX_DTYPE = np.dtype([
+    ('ts', '<f8'),
+    ('frame_number', '<u4'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+])
+
+
+def segment_start(ts, segment_seconds):
+    return int(ts // segment_seconds) * segment_seconds
+
+
+class SegmentWriter:
+    """
+    Appends frames for one stream session into fixed-duration segment files.
+
+    Each segment is a pair of files named after the segment start time:
+    `<start>.seg` holds the concatenated JPEGs and `<start>.idx` the packed
+    INDEX_DTYPE records pointing into it. Frames are bucketed by their capture
+    timestamp, so late or reordered Kafka messages still land in the right
+    segment.
+    """
+
+    def __init__(self, session_id, root=None, segment_seconds=None, idle_close_seconds=30):
+        self.session_id = str(session_id)
+        self.segment_seconds = segment_seconds or settings.FRAME_ARCHIVE_SEGMENT_SECONDS
+        self.directory = Path(root or settings.FRAME_ARCHIVE_ROOT) / self.session_id
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.idle_close_seconds = idle_close_seconds
+        self._open = {}  # segment start -> (data file, index file, last write)
+
+    def write(self, ts, frame_number, jpeg_bytes):
+        start = segment_start(ts, self.segment_seconds)
+        data_file, index_file, _ = self._segment(start)
+
+        offset = data_file.tell()
+        data_file.write(jpeg_bytes)
+        record = np.array([(ts, frame_number, offset, len(jpeg_bytes))], dtype=INDEX_DTYPE)
+        index_file.write(record.tobytes())
+        self._open[start] = (data_file, index_file, time.monotonic())
+
+    def _segment(self, start):
+        if start not in self._open:
+            data_file = open(self.directory / f"{start}.seg", 'ab')
+            index_file = open(self.directory / f"{start}.idx", 'ab')
+            self._open[start] = (data_file, index_file, time.monotonic())
+        return self._open[start]
+
+    def flush(self):
+        for data_file, index_file, _ in self._open.values():
+            # Data before index, so an index record never points past the data
+            data_file.flush()
+            index_file.flush()
+
+    def close_idle(self):
+        cutoff = time.monotonic() - self.idle_close_seconds
+        for start in [s for s, (_, _, last) in self._open.items() if last < cutoff]:
+            self._close(start)
+
+    def close(self):
+        for start in list(self._open):
+            self._close(start)
+
+    @property
+    def is_idle(self):
+        return not self._open
+
+    def _close(self, start):
+        data_file, index_file, _ = self._open.pop(start)
+        data_file.close()
+        index_file.close()
+
+
+class SegmentReader:
+    """
+    Random access over the archived segments of one stream session.
+
+    Index files are memory-mapped and searched with numpy, and frame bytes
+    are served as slices of the memory-mapped segment, so seeking to any
+    point of a patrol costs a couple of binary searches rather than a scan.
+    """
+
+    def __init__(self, session_id, root=None, segment_seconds=None):
+        self.session_id = str(session_id)
+        self.segment_seconds = segment_seconds or settings.FRAME_ARCHIVE_SEGMENT_SECONDS
+        self.directory = Path(root or settings.FRAME_ARCHIVE_ROOT) / self.session_id
+
+    def exists(self):
+        return self.directory.is_dir()
+
+    def segments(self):
+        """Sorted list of segment start times available for this session"""
+        if not self.exists():
+            return []
+        return sorted(int(p.stem) for p in self.directory.glob('*.idx'))
+
+    def time_range(self):
+        """(first_ts, last_ts) covered by the archive, or None"""
+        starts = self.segments()
+        if not starts:
+            return None
+        first = self._load_index(starts[0])
+        last = self._load_index(starts[-1])
+        if not len(first) or not len(last):
+            return None
+        return float(first['ts'].min()), float(last['ts'].max())
+
+    def frames(self, start_ts=None, end_ts=None):
+        """
+        Yields (ts, frame_number, jpeg bytes) for frames in [start_ts, end_ts].
+        """
+        # Only open segments that can overlap the requested range
+        for start in self.segments():
+            if end_ts is not None and start > end_ts:
+                break
+            if start_ts is not None and start + self.segment_seconds <= start_ts:
+                continue
+
+            index = self._load_index(start)
+            if not len(index):
+                continue
+
+            lo = 0 if start_ts is None else np.searchsorted(index['ts'], start_ts, side='left')
+            hi = len(index) if end_ts is None else np.searchsorted(index['ts'], end_ts, side='right')
+            if lo >= hi:
+                continue
+
+            yield from self._read_frames(start, index[lo:hi])
+
+    def _load_index(self, start):
+        path = self.directory / f"{start}.idx"
+        size = path.stat().st_size
+        # Ignore a trailing partial record from an interrupted write
+        usable = size - size % INDEX_DTYPE.itemsize
+        if usable <= 0:
+            return np.empty(0, dtype=INDEX_DTYPE)
+
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                index = np.frombuffer(mm, dtype=INDEX_DTYPE, count=usable // INDEX_DTYPE.itemsize).copy()
+
+        # Reordered messages append out of order; searchsorted needs sorted ts
+        if len(index) > 1 and np.any(np.diff(index['ts']) < 0):
+            index = index[np.argsort(index['ts'], kind='stable')]
+        return index
+
+    def _read_frames(self, start, records):
+        path = self.directory / f"{start}.seg"
+        size = os.path.getsize(path)
+        if size == 0:
+            return
+
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for ts, frame_number, offset, length in records:
+                    end = int(offset) + int(length)
+                    if end > size:
+                        continue
+                    yield float(ts), int(frame_number), mm[int(offset):end]
@@ -0,0 +1,67 @@
+from datetime import datetime
+from apps.core.consumers import BatchConsumer
+from apps.stream_ingestion.archive import SegmentWriter
+import base64
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class FrameArchiveConsumer(BatchConsumer):
+    """Archives raw video frames from Kafka into per-session segment files"""
+
+    topic_key = 'RAW_FRAMES'
+    group_id = 'skymarshal_frame_archiver_group'
+    # Idle writers are closed at most this often
+    flush_interval = 1.0
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.writers = {}
+        self.last_flush = time.monotonic()
+
+    def handle_batch(self, records):
+        archived = 0
+        for record in records:
+            try:
+                self.archive_message(record.value)
+                archived += 1
+            except Exception as e:
+                logger.error(f"Error archiving frame: {e}", exc_info=True)
+        logger.debug(f"Archived {archived} frames")
+
+    def archive_message(self, data):
+        session_id = data.get('stream_id')
+        frame_data = data.get('frame_data')
+        if not session_id or not frame_data:
+            return
+
+        ts = datetime.fromisoformat(data['timestamp']).timestamp()
+
+        writer = self.writers.get(session_id)
+        if writer is None:
+            writer = self.writers[session_id] = SegmentWriter(session_id)
+
+        writer.write(ts, data.get('frame_number', 0), base64.b64decode(frame_data))
+
+    def before_commit(self):
+        # Frames are on disk before their offsets are committed
+        for writer in self.writers.values():
+            writer.flush()
+
+    def on_tick(self):
+        if time.monotonic() - self.last_flush < self.flush_interval:
+            return
+        self.last_flush = time.monotonic()
+        for session_id, writer in list(self.writers.items()):
+            writer.close_idle()
+            # Session went quiet; free the writer until frames arrive again
+            if writer.is_idle:
+                del self.writers[session_id]
+
+    def on_stop(self):
+        for writer in self.writers.values():
+            writer.flush()
+            writer.close()
+        self.writers = {}
@@ -0,0 +1,204 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from django_redis import get_redis_connection
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+REQUEST_KEY_TTL = 600
+
+
+def request_key(drone_id):
+    return f"evidence:requests:{drone_id}"
+
+
+def request_evidence(drone_id, violation_id, event_time):
+    """
+    Ask the ingestion loop currently streaming `drone_id` to cut an evidence
+    clip around `event_time` for the given violation.
+
+    Requests are queued in Redis because violations are raised in a different
+    process (the detection consumer) from the one holding the frame ring.
+    """
+    request_evidence_many([(drone_id, violation_id, event_time)])
+
+
+def request_evidence_many(requests):
+    """
+    Queue several (drone_id, violation_id, event_time) evidence requests in
+    one Redis round trip.
+    """
+    if not requests:
+        return
+    try:
+        redis = get_redis_connection('default')
+        pipe = redis.pipeline(transaction=False)
+        for drone_id, violation_id, event_time in requests:
+            pipe.rpush(request_key(drone_id), json.dumps({
+                'violation_id': str(violation_id),
+                'event_ts': event_time.timestamp(),
+            }))
+        for drone_id in {r[0] for r in requests}:
+            pipe.expire(request_key(drone_id), REQUEST_KEY_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to queue {len(requests)} evidence requests: {e}")
+
+
+class FrameRing:
+    """
+    Bounded ring of already-encoded JPEG frames covering the last `seconds`.
+
+    Frames are appended in timestamp order, so cuts are two binary searches
+    and a slice; nothing is decoded or re-encoded.
+    """
+
+    def __init__(self, seconds, max_frames=None):
+        self.seconds = seconds
+        self._frames = deque(maxlen=max_frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def append(self, ts, frame_number, jpeg_bytes):
+        self._frames.append((ts, frame_number, jpeg_bytes))
+        cutoff = ts - self.seconds
+        while self._frames and self._frames[0][0] < cutoff:
+            self._frames.popleft()
+
+    @property
+    def newest_ts(self):
+        return self._frames[-1][0] if self._frames else None
+
+    def cut(self, start_ts, end_ts):
+        """Returns the (ts, frame_number, jpeg_bytes) tuples in [start_ts, end_ts]"""
+        frames = list(self._frames)
+        timestamps = [f[0] for f in frames]
+        lo = bisect_left(timestamps, start_ts)
+        hi = bisect_left(timestamps, end_ts, lo=lo)
+        if hi < len(timestamps) and timestamps[hi] == end_ts:
+            hi += 1
+        return frames[lo:hi]
+
+
+class EvidenceRecorder:
+    """
+    Serves evidence requests for one ingestion stream.
+
+    The stream loop feeds every encoded frame into the ring and calls poll();
+    once the post-event window has been buffered the matching slice is handed
+    to a background pool that writes the clip (concatenated JPEGs, i.e. an
+    MJPEG stream) and the snapshot through StorageService.
+    """
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, drone_id, pre_seconds=None, post_seconds=None, max_workers=None):
+        self.drone_id = drone_id
+        self.pre_seconds = pre_seconds if pre_seconds is not None else settings.EVIDENCE_PRE_SECONDS
+        self.post_seconds = post_seconds if post_seconds is not None else settings.EVIDENCE_POST_SECONDS
+        # Keep more than pre+post so requests that arrive late (CV and
+        # consumer lag) can still be served from the buffer
+        self.ring = FrameRing(
+            max(settings.EVIDENCE_BUFFER_SECONDS, self.pre_seconds + self.post_seconds),
+            max_frames=settings.EVIDENCE_MAX_BUFFERED_FRAMES
+        )
+        self._pending = []
+        self._last_poll = 0.0
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or settings.EVIDENCE_UPLOAD_WORKERS,
+            thread_name_prefix=f"evidence-{drone_id}"
+        )
+        self._redis = get_redis_connection('default')
+
+    def add_frame(self, ts, frame_number, jpeg_bytes):
+        # cv2.imencode hands back a numpy buffer; keep an immutable copy
+        if hasattr(jpeg_bytes, 'tobytes'):
+            jpeg_bytes = jpeg_bytes.tobytes()
+        self.ring.append(ts, frame_number, jpeg_bytes)
+
+    def poll(self, force=False):
+        """Pick up new requests and cut any whose window is complete."""
+        now = time.monotonic()
+        if not force and now - self._last_poll < self.POLL_INTERVAL:
+            return
+        self._last_poll = now
+
+        self._pending.extend(self._drain_requests())
+        if not self._pending:
+            return
+
+        newest = self.ring.newest_ts
+        ready, waiting = [], []
+        for req in self._pending:
+            if force or (newest is not None and newest >= req['event_ts'] + self.post_seconds):
+                ready.append(req)
+            else:
+                waiting.append(req)
+        self._pending = waiting
+
+        for req in ready:
+            self._cut(req)
+
+    def close(self):
+        """Serve what can still be served and wait for uploads to finish."""
+        self.poll(force=True)
+        self._pool.shutdown(wait=True)
+
+    def _drain_requests(self):
+        key = request_key(self.drone_id)
+        try:
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.lrange(key, 0, -1)
+            pipe.delete(key)
+            raw, _ = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to read evidence requests for {self.drone_id}: {e}")
+            return []
+        return [json.loads(r) for r in raw]
+
+    def _cut(self, req):
+        event_ts = req['event_ts']
+        frames = self.ring.cut(event_ts - self.pre_seconds, event_ts + self.post_seconds)
+        if not frames:
+            logger.warning(
+                f"No buffered frames for violation {req['violation_id']} "
+                f"(drone {self.drone_id}); evidence window already evicted"
+            )
+            return
+        self._pool.submit(self._store, req['violation_id'], event_ts, frames)
+
+    def _store(self, violation_id, event_ts, frames):
+        from apps.core.services.storage import StorageService
+        from apps.violations.models import Violation
+
+        try:
+            # Snapshot is the frame closest to the event itself
+            snapshot = min(frames, key=lambda f: abs(f[0] - event_ts))[2]
+            clip = b''.join(f[2] for f in frames)
+
+            storage = StorageService()
+            clip_path = storage.upload_file(
+                ContentFile(clip), f"evidence/videos/{violation_id}.mjpeg"
+            )
+            snapshot_path = storage.upload_file(
+                ContentFile(snapshot), f"evidence/images/{violation_id}.jpg"
+            )
+
+            Violation.objects.filter(id=violation_id).update(
+                video_clip=clip_path,
+                image_snapshot=snapshot_path
+            )
+            logger.info(
+                f"Stored evidence for violation {violation_id}: "
+                f"{len(frames)} frames, {len(clip)} bytes"
+            )
+        except Exception as e:
+            logger.error(f"Failed to store evidence for violation {violation_id}: {e}", exc_info=True)
+        finally:
+            close_old_connections()
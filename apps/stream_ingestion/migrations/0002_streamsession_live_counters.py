@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stream_ingestion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='streamsession',
+            name='frames_read',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='streamsession',
+            name='frames_dropped',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='streamsession',
+            name='bytes_published',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='streamsession',
+            name='encode_time_ms',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='streamsession',
+            name='counters_flushed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -24,6 +24,14 @@ class StreamSession(TimestampedModel):
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
     frames_processed = models.IntegerField(default=0)
+    
+    # Totals flushed periodically from the live Redis counters
+    frames_read = models.IntegerField(default=0)
+    frames_dropped = models.IntegerField(default=0)
+    bytes_published = models.BigIntegerField(default=0)
+    encode_time_ms = models.FloatField(default=0.0)
+    counters_flushed_at = models.DateTimeField(null=True, blank=True)
+    
     kafka_topic = models.CharField(max_length=100)
     
     class Meta:
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from .models import VideoStream, StreamSession
+from .services import SessionCounters, session_frames_published
 from apps.drones.models import Drone
 
 
@@ -30,6 +31,15 @@ class VideoStreamSerializer(serializers.ModelSerializer):
         return active_session.id if active_session else None
 
 
+class StreamSessionListSerializer(serializers.ListSerializer):
+    """Fetches live counters for the whole page in one Redis round trip"""
+
+    def to_representation(self, data):
+        sessions = list(data.all() if hasattr(data, 'all') else data)
+        self.context['live_counters'] = SessionCounters.read_many([s.id for s in sessions])
+        return super().to_representation(sessions)
+
+
 class StreamSessionSerializer(serializers.ModelSerializer):
     """Serializer for StreamSession model with computed fields"""
     stream_id = serializers.UUIDField(source='stream.stream_id', read_only=True)
@@ -39,13 +49,35 @@ class StreamSessionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = StreamSession
+        list_serializer_class = StreamSessionListSerializer
         fields = [
             'id', 'stream', 'stream_id', 'stream_drone_name', 'start_time',
-            'end_time', 'frames_processed', 'kafka_topic', 'duration',
-            'frames_per_second', 'created_at', 'updated_at'
+            'end_time', 'frames_processed', 'frames_read', 'frames_dropped',
+            'bytes_published', 'encode_time_ms', 'counters_flushed_at',
+            'kafka_topic', 'duration', 'frames_per_second', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def get_live_counters(self, obj):
+        """Live Redis counters for this session, if it has any"""
+        live_counters = self.context.get('live_counters')
+        if live_counters is None:
+            return SessionCounters.read(obj.id)
+        return live_counters.get(str(obj.id))
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        live = self.get_live_counters(obj)
+        if live:
+            # Redis holds the running totals; the DB copy lags by one flush
+            data['frames_processed'] = session_frames_published(obj, live)
+            data['frames_read'] = max(live['frames_read'], obj.frames_read)
+            data['frames_dropped'] = max(live['frames_dropped'], obj.frames_dropped)
+            data['bytes_published'] = max(live['bytes_published'], obj.bytes_published)
+            data['encode_time_ms'] = max(live['encode_time_ms'], obj.encode_time_ms)
+            data['frames_per_second'] = self._fps(obj, data['frames_processed'])
+        return data
+
     def get_duration(self, obj):
         """Calculate session duration in seconds"""
         end_time = obj.end_time or timezone.now()
@@ -54,9 +86,12 @@ class StreamSessionSerializer(serializers.ModelSerializer):
 
     def get_frames_per_second(self, obj):
         """Calculate frames per second"""
+        return self._fps(obj, obj.frames_processed)
+
+    def _fps(self, obj, frames):
         duration = self.get_duration(obj)
         if duration > 0:
-            return obj.frames_processed / duration
+            return frames / duration
         return 0
 
 
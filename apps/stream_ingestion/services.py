@@ -0,0 +1,195 @@
+from django.utils import timezone
+from datetime import timedelta
+from django_redis import get_redis_connection
+from apps.core.reference_cache import ReferenceCache
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Counters tracked per session. Integer fields use HINCRBY, float fields HINCRBYFLOAT.
+INT_COUNTERS = ('frames_read', 'frames_published', 'frames_dropped', 'bytes_published')
+FLOAT_COUNTERS = ('encode_time_ms',)
+COUNTER_FIELDS = INT_COUNTERS + FLOAT_COUNTERS
+
+
+class SessionCounters:
+    """
+    Live per-session ingestion counters kept in a Redis hash.
+
+    The ingestion loop accumulates deltas in-process and pushes them with
+    atomic HINCRBY calls at most once per `push_interval` seconds, so the
+    hot loop never blocks on Redis or Postgres. A periodic task copies the
+    totals into StreamSession (see flush_session_counters).
+    """
+    ACTIVE_SET = 'stream_sessions:live'
+    KEY_TTL = 60 * 60 * 24
+    END_GRACE_SECONDS = 300
+
+    def __init__(self, session_id, push_interval=1.0):
+        self.session_id = str(session_id)
+        self.push_interval = push_interval
+        self._pending = dict.fromkeys(COUNTER_FIELDS, 0)
+        self._last_push = time.monotonic()
+        self._redis = get_redis_connection('default')
+
+    @staticmethod
+    def key_for(session_id):
+        return f"stream_session:{session_id}:counters"
+
+    @property
+    def key(self):
+        return self.key_for(self.session_id)
+
+    def incr(self, **deltas):
+        for field, value in deltas.items():
+            self._pending[field] += value
+
+        if time.monotonic() - self._last_push >= self.push_interval:
+            self.push()
+
+    def push(self):
+        """Send accumulated deltas to Redis in a single pipeline."""
+        self._last_push = time.monotonic()
+        if not any(self._pending.values()):
+            return
+
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for field in INT_COUNTERS:
+                if self._pending[field]:
+                    pipe.hincrby(self.key, field, int(self._pending[field]))
+            for field in FLOAT_COUNTERS:
+                if self._pending[field]:
+                    pipe.hincrbyfloat(self.key, field, float(self._pending[field]))
+            pipe.expire(self.key, self.KEY_TTL)
+            pipe.sadd(self.ACTIVE_SET, self.session_id)
+            pipe.execute()
+            self._pending = dict.fromkeys(COUNTER_FIELDS, 0)
+        except Exception as e:
+            # Keep the deltas and retry on the next push
+            logger.warning(f"Failed to push counters for session {self.session_id}: {e}")
+
+    @classmethod
+    def read_many(cls, session_ids):
+        """
+        Returns {session_id: {field: value}} for sessions that have live counters.
+        """
+        session_ids = [str(s) for s in session_ids]
+        if not session_ids:
+            return {}
+
+        try:
+            pipe = get_redis_connection('default').pipeline(transaction=False)
+            for session_id in session_ids:
+                pipe.hgetall(cls.key_for(session_id))
+            raw = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to read live session counters: {e}")
+            return {}
+
+        live = {}
+        for session_id, values in zip(session_ids, raw):
+            if values:
+                live[session_id] = cls._decode(values)
+        return live
+
+    @classmethod
+    def read(cls, session_id):
+        return cls.read_many([session_id]).get(str(session_id))
+
+    @staticmethod
+    def _decode(values):
+        decoded = dict.fromkeys(COUNTER_FIELDS, 0)
+        for field, value in values.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field in INT_COUNTERS:
+                decoded[field] = int(value)
+            elif field in FLOAT_COUNTERS:
+                decoded[field] = float(value)
+        return decoded
+
+    @classmethod
+    def flush_to_db(cls, session_ids=None):
+        """
+        Copy live totals into StreamSession rows with a single bulk_update.
+        Sessions that have ended are dropped from the live set once flushed.
+        """
+        from .models import StreamSession
+
+        redis = get_redis_connection('default')
+        if session_ids is None:
+            session_ids = [s.decode() if isinstance(s, bytes) else s for s in redis.smembers(cls.ACTIVE_SET)]
+
+        live = cls.read_many(session_ids)
+        # Hashes that expired leave dangling members behind
+        expired = [s for s in session_ids if str(s) not in live]
+        if expired:
+            redis.srem(cls.ACTIVE_SET, *expired)
+        if not live:
+            return 0
+
+        sessions = list(StreamSession.objects.filter(id__in=live.keys()))
+        for session in sessions:
+            counters = live[str(session.id)]
+            session.frames_read = counters['frames_read']
+            session.frames_processed = counters['frames_published']
+            session.frames_dropped = counters['frames_dropped']
+            session.bytes_published = counters['bytes_published']
+            session.encode_time_ms = counters['encode_time_ms']
+            session.counters_flushed_at = timezone.now()
+
+        StreamSession.objects.bulk_update(
+            sessions,
+            ['frames_read', 'frames_processed', 'frames_dropped',
+             'bytes_published', 'encode_time_ms', 'counters_flushed_at'],
+        )
+
+        # Ended sessions won't receive more increments once the ingestion
+        # loop has noticed the stop, so give it a grace period before dropping
+        grace_cutoff = timezone.now() - timedelta(seconds=cls.END_GRACE_SECONDS)
+        ended = [str(s.id) for s in sessions if s.end_time and s.end_time < grace_cutoff]
+        # Sessions deleted from Postgres should not linger in the live set either
+        missing = set(live.keys()) - {str(s.id) for s in sessions}
+        finished = ended + list(missing)
+        if finished:
+            pipe = redis.pipeline(transaction=False)
+            pipe.srem(cls.ACTIVE_SET, *finished)
+            for session_id in finished:
+                pipe.delete(cls.key_for(session_id))
+            pipe.execute()
+
+        return len(sessions)
+
+
+def session_frames_published(session, live=None):
+    """
+    Frames published for a session, preferring the live Redis counter over
+    the periodically flushed database value.
+    """
+    if live is None:
+        live = SessionCounters.read(session.id)
+    if live:
+        return max(live['frames_published'], session.frames_processed)
+    return session.frames_processed
+
+
+def _load_session_ids(session_ids):
+    from .models import StreamSession
+
+    valid = []
+    for session_id in session_ids:
+        try:
+            valid.append(uuid.UUID(session_id))
+        except ValueError:
+            continue
+    return {
+        str(session_id): session_id
+        for session_id in StreamSession.objects.filter(id__in=valid).values_list('id', flat=True)
+    }
+
+
+# Existence of stream sessions by id; sessions are never re-keyed, so
+# entries only need to expire
+session_id_cache = ReferenceCache('stream_session', _load_session_ids)
@@ -5,13 +5,36 @@ from datetime import timedelta
 import cv2
 import base64
 import logging
+import time
 from .models import VideoStream, StreamSession
+from .services import SessionCounters, session_frames_published
+from .evidence import EvidenceRecorder
 from apps.core.kafka_config import get_kafka_producer
 from apps.drones.models import GPSLocation
 from apps.patrols.services import PatrolService
 
 logger = logging.getLogger(__name__)
 
+GPS_REFRESH_SECONDS = 1.0
+
+
+def latest_gps(drone):
+    try:
+        gps = drone.gps_locations.latest('timestamp')
+        return {
+            'latitude': float(gps.latitude),
+            'longitude': float(gps.longitude),
+            'altitude': gps.altitude
+        }
+    except Exception:
+        # Fallback if no GPS data
+        return {
+            'latitude': 0.0,
+            'longitude': 0.0,
+            'altitude': 0.0
+        }
+
+
 @shared_task(bind=True, max_retries=3)
 def process_rtsp_stream(self, stream_id):
        
@@ -20,11 +43,11 @@ def process_rtsp_stream(self, stream_id):
         logger.info(f"Starting stream processing: {stream_id} - {stream.rtsp_url}")
         
         # Find active patrol
-        patrol = PatrolService.get_active_patrol(stream.drone.drone_id)
+        patrol_id = PatrolService.get_active_patrol_id(stream.drone.drone_id)
 
         session = StreamSession.objects.create(
             stream=stream,
-            patrol=patrol,
+            patrol_id=patrol_id,
             kafka_topic=settings.KAFKA_TOPICS['RAW_FRAMES']
         )
         
@@ -40,12 +63,17 @@ def process_rtsp_stream(self, stream_id):
         
         frame_count = 0
         consecutive_failures = 0
+        counters = SessionCounters(session.id)
+        gps_data = None
+        gps_read_at = float('-inf')
+        evidence = EvidenceRecorder(stream.drone.drone_id)
         
         while stream.is_active:
             ret, frame = cap.read()
             
             if not ret:
                 consecutive_failures += 1
+                counters.incr(frames_dropped=1)
                 logger.warning(f"Failed to read frame from {stream_id}, attempt {consecutive_failures}")
                 
                 if consecutive_failures >= 10:
@@ -56,34 +84,29 @@ def process_rtsp_stream(self, stream_id):
             
             consecutive_failures = 0
             frame_count += 1
+            counters.incr(frames_read=1)
       
             if frame_count % 3 == 0:
                 try:
+                    encode_start = time.perf_counter()
                     _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
                     frame_base64 = base64.b64encode(buffer).decode('utf-8')
+                    encode_ms = (time.perf_counter() - encode_start) * 1000
+                    frame_time = timezone.now()
+                    evidence.add_frame(frame_time.timestamp(), frame_count, buffer)
                     
-                    try:
-                        gps = stream.drone.gps_locations.latest('timestamp')
-                        gps_data = {
-                            'latitude': float(gps.latitude),
-                            'longitude': float(gps.longitude),
-                            'altitude': gps.altitude
-                        }
-                    except Exception:
-                        # Fallback if no GPS data
-                        gps_data = {
-                            'latitude': 0.0,
-                            'longitude': 0.0,
-                            'altitude': 0.0
-                        }
+                    # Position is refreshed at most once per interval
+                    # rather than queried for every published frame
+                    if time.monotonic() - gps_read_at >= GPS_REFRESH_SECONDS:
+                        gps_data = latest_gps(stream.drone)
+                        gps_read_at = time.monotonic()
 
-                    
                     # Create message
                     message = {
                         'stream_id': str(session.id),
                         'drone_id': stream.drone.drone_id,
                         'frame_number': frame_count,
-                        'timestamp': timezone.now().isoformat(),
+                        'timestamp': frame_time.isoformat(),
                         'frame_data': frame_base64,
                         'gps': gps_data,
                         'resolution': stream.resolution,
@@ -92,25 +115,37 @@ def process_rtsp_stream(self, stream_id):
                     
                     producer.send(settings.KAFKA_TOPICS['RAW_FRAMES'], value=message)
                    
-                    session.frames_processed += 1
-                    
-                    # Save every 30 frames
-                    if frame_count % 30 == 0:
-                        session.save(update_fields=['frames_processed'])
+                    counters.incr(
+                        frames_published=1,
+                        bytes_published=len(buffer),
+                        encode_time_ms=encode_ms
+                    )
                     
                 except Exception as e:
+                    counters.incr(frames_dropped=1)
                     logger.error(f"Error publishing frame to Kafka: {e}", exc_info=True)
             
+            evidence.poll()
+            
             if frame_count % 300 == 0:
-                logger.info(f"Processed {frame_count} frames from stream {stream_id}")
+                logger.info(
+                    f"Processed {frame_count} frames from stream {stream_id} "
+                    f"({producer.in_flight} Kafka messages in flight)"
+                )
            
             if frame_count % 100 == 0:
-                stream.refresh_from_db()
+                stream.refresh_from_db(fields=['is_active'])
         
         # Cleanup
         cap.release()
-        session.end_time = timezone.now()
-        session.save()
+        # Frames still queued in the producer belong to this session
+        producer.flush(timeout=30)
+        evidence.close()
+        counters.push()
+        SessionCounters.flush_to_db([session.id])
+        session.refresh_from_db()
+        session.end_time = session.end_time or timezone.now()
+        session.save(update_fields=['end_time'])
         
         duration = (session.end_time - session.start_time).total_seconds()
         fps = session.frames_processed / duration if duration > 0 else 0
@@ -163,7 +198,7 @@ def cleanup_old_sessions():
 
 @shared_task
 def monitor_stream_health():
-    from .models import VideoStream
+    from .models import VideoStream, StreamSession
     
     logger.info("Starting monitor_stream_health task")
     
@@ -177,12 +212,21 @@ def monitor_stream_health():
         'orphaned_streams': []
     }
     
+    open_sessions = {
+        session.stream_id: session
+        for session in StreamSession.objects.filter(
+            stream__in=active_streams, end_time__isnull=True
+        ).order_by('start_time')
+    }
+    live_counters = SessionCounters.read_many([s.id for s in open_sessions.values()])
+    
     for stream in active_streams:
-        session = stream.sessions.filter(end_time__isnull=True).first()
+        session = open_sessions.get(stream.id)
         
         if session:
             duration = (timezone.now() - session.start_time).total_seconds()
-            fps = session.frames_processed / duration if duration > 0 else 0
+            frames = session_frames_published(session, live_counters.get(str(session.id), {}))
+            fps = frames / duration if duration > 0 else 0
  
             if fps < 5:
                 if duration > 10:
@@ -215,3 +259,14 @@ def monitor_stream_health():
     
     logger.info(f"Health check completed: {health_report}")
     return health_report
+
+
+@shared_task
+def flush_session_counters():
+    """
+    Copy live Redis session counters into StreamSession rows.
+    """
+    flushed = SessionCounters.flush_to_db()
+    if flushed:
+        logger.info(f"Flushed live counters for {flushed} stream sessions")
+    return flushed
@@ -4,9 +4,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from ..archive import SegmentReader
 from ..models import StreamSession
 from ..serializers import StreamSessionSerializer
 
+REPLAY_BOUNDARY = 'skymarshalframe'
+
 class StreamSessionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing stream sessions (read-only)
@@ -19,7 +24,7 @@ class StreamSessionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = StreamSessionSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['stream', 'stream__drone']
+    filterset_fields = ['stream', 'stream__drone', 'patrol']
     ordering_fields = ['start_time', 'end_time', 'frames_processed']
     ordering = ['-start_time']
     pagination_class = StandardResultsSetPagination
@@ -55,3 +60,80 @@ class StreamSessionViewSet(viewsets.ReadOnlyModelViewSet):
             'count': active_sessions.count(),
             'results': serializer.data
         }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def archive(self, request, pk=None):
+        """
+        Describe the archived frames available for replay
+        GET /api/v1/sessions/{id}/archive/
+        """
+        session = self.get_object()
+        reader = SegmentReader(session.id)
+        time_range = reader.time_range()
+        
+        return Response({
+            'session_id': str(session.id),
+            'segments': len(reader.segments()),
+            'start': time_range[0] if time_range else None,
+            'end': time_range[1] if time_range else None,
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'])
+    def replay(self, request, pk=None):
+        """
+        Stream archived frames for a time range as multipart MJPEG
+        GET /api/v1/sessions/{id}/replay/?start=<iso>&end=<iso>
+        Alternatively ?offset=<seconds>&duration=<seconds> relative to session start.
+        """
+        session = self.get_object()
+        reader = SegmentReader(session.id)
+        
+        if not reader.segments():
+            return Response(
+                {'error': 'No archived frames for this session'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            start_ts, end_ts = self._replay_range(session, request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        def frame_stream():
+            for ts, frame_number, jpeg in reader.frames(start_ts, end_ts):
+                yield (
+                    f"--{REPLAY_BOUNDARY}\r\n"
+                    f"Content-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n"
+                    f"X-Frame-Timestamp: {ts:.3f}\r\n"
+                    f"X-Frame-Number: {frame_number}\r\n\r\n"
+                ).encode() + jpeg + b"\r\n"
+        
+        return StreamingHttpResponse(
+            frame_stream(),
+            content_type=f'multipart/x-mixed-replace; boundary={REPLAY_BOUNDARY}'
+        )
+    
+    def _replay_range(self, session, params):
+        start_ts = end_ts = None
+        
+        if params.get('start') or params.get('end'):
+            for name in ('start', 'end'):
+                value = params.get(name)
+                if value:
+                    parsed = parse_datetime(value)
+                    if parsed is None:
+                        raise ValueError(f"Invalid {name} datetime: {value}")
+                    if name == 'start':
+                        start_ts = parsed.timestamp()
+                    else:
+                        end_ts = parsed.timestamp()
+        elif params.get('offset') or params.get('duration'):
+            offset = float(params.get('offset', 0))
+            start_ts = session.start_time.timestamp() + offset
+            if params.get('duration'):
+                end_ts = start_ts + float(params['duration'])
+        
+        if start_ts is not None and end_ts is not None and end_ts < start_ts:
+            raise ValueError("end must be after start")
+        return start_ts, end_ts
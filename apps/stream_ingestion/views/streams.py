@@ -11,6 +11,7 @@ from ..serializers import (
     StreamRegistrationSerializer,
     StreamSessionSerializer
 )
+from ..services import SessionCounters, session_frames_published
 from ..tasks import process_rtsp_stream
 
 class VideoStreamViewSet(viewsets.ModelViewSet):
@@ -124,12 +125,13 @@ class VideoStreamViewSet(viewsets.ModelViewSet):
             session.save(update_fields=['end_time'])
             
             # Calculate stats
+            frames = session_frames_published(session)
             duration = (session.end_time - session.start_time).total_seconds()
-            fps = session.frames_processed / duration if duration > 0 else 0
+            fps = frames / duration if duration > 0 else 0
             
             session_stats = {
                 'session_id': str(session.id),
-                'frames_processed': session.frames_processed,
+                'frames_processed': frames,
                 'duration': duration,
                 'fps': round(fps, 2)
             }
@@ -161,14 +163,20 @@ class VideoStreamViewSet(viewsets.ModelViewSet):
                 duration = (session.end_time - session.start_time).total_seconds()
                 total_uptime += duration
         
-        # Calculate average FPS
-        total_frames = sessions.aggregate(Sum('frames_processed'))['frames_processed__sum'] or 0
-        avg_fps = total_frames / total_uptime if total_uptime > 0 else 0
-        
         # Current session
         current_session = sessions.filter(end_time__isnull=True).first()
         last_completed = completed_sessions.order_by('-end_time').first()
         
+        # Calculate average FPS, topping up unflushed frames from live counters
+        total_frames = sessions.aggregate(Sum('frames_processed'))['frames_processed__sum'] or 0
+        live_counters = SessionCounters.read_many(
+            [current_session.id] if current_session else []
+        )
+        if current_session and str(current_session.id) in live_counters:
+            live_frames = session_frames_published(current_session, live_counters[str(current_session.id)])
+            total_frames += live_frames - current_session.frames_processed
+        avg_fps = total_frames / total_uptime if total_uptime > 0 else 0
+        
         return Response({
             'stream_id': str(stream.stream_id),
             'drone_name': stream.drone.name,
@@ -178,6 +186,8 @@ class VideoStreamViewSet(viewsets.ModelViewSet):
             'total_uptime_seconds': round(total_uptime, 2),
             'average_fps': round(avg_fps, 2),
             'is_currently_active': stream.is_active,
-            'current_session': StreamSessionSerializer(current_session).data if current_session else None,
+            'current_session': StreamSessionSerializer(
+                current_session, context={'live_counters': live_counters}
+            ).data if current_session else None,
             'last_completed_session': StreamSessionSerializer(last_completed).data if last_completed else None
         }, status=status.HTTP_200_OK)
@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detections', '0004_detection_session_dedup'),
+        ('violations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='violation',
+            name='detection',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='violation', to='detections.detection'),
+        ),
+    ]
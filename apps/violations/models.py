@@ -1,8 +1,8 @@
 from django.db import models
-from apps.core.models import TimestampedModel
+from apps.core.models import TimeOrderedModel
 from apps.detections.models import Detection
 
-class Violation(TimestampedModel):
+class Violation(TimeOrderedModel):
     STATUS_CHOICES = (
         ('NEW', 'New'),
         ('PROCESSED', 'Processed'),
@@ -10,7 +10,9 @@ class Violation(TimestampedModel):
         ('DISMISSED', 'Dismissed'),
     )
 
-    detection = models.OneToOneField(Detection, on_delete=models.CASCADE, related_name='violation')
+    # detections is partitioned with a composite (id, timestamp) primary key,
+    # which a foreign key on id alone cannot reference
+    detection = models.OneToOneField(Detection, on_delete=models.CASCADE, related_name='violation', db_constraint=False)
     patrol = models.ForeignKey('patrols.Patrol', on_delete=models.SET_NULL, null=True, blank=True, related_name='violations')
     violation_type = models.CharField(max_length=50, default='SPEEDING')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='NEW')
@@ -0,0 +1,189 @@
+from celery import group
+from django.db import transaction
+from apps.patrols.models import Patrol
+from apps.patrols.services import PatrolService, DEFAULT_SPEED_LIMIT, DEFAULT_FINE
+from apps.vehicle_lookup.models import VehicleRegistration
+from .models import Violation
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def resolve_speed_rules(detections):
+    """
+    Speed limit and fine that apply to each detection, as two float arrays.
+
+    Priority: Patrol Config -> Drone Default -> Global Default. Parsed patrol
+    configs come from the reference cache, one lookup per batch.
+    """
+    patrol_rules = PatrolService.get_speed_rules(
+        {d.patrol_id for d in detections if d.patrol_id}
+    )
+    limits = np.empty(len(detections))
+    fines = np.empty(len(detections))
+
+    for i, detection in enumerate(detections):
+        rules = patrol_rules.get(str(detection.patrol_id)) if detection.patrol_id else None
+        if rules is not None:
+            limits[i], fines[i] = rules
+        else:
+            limits[i] = getattr(detection.drone, 'speed_limit', DEFAULT_SPEED_LIMIT)
+            fines[i] = DEFAULT_FINE
+
+    return limits, fines
+
+
+def observed_speeds(detections):
+    """Detection speeds as a float array, NaN where no speed was measured"""
+    return np.array(
+        [d.speed if d.speed else np.nan for d in detections],
+        dtype=float
+    )
+
+
+class ViolationEngine:
+    """
+    Evaluates traffic rules for a batch of detections at once.
+
+    Replaces per-row post_save work: rules are resolved once per patrol,
+    violators are found with one vectorized comparison, and violations,
+    compliance points and notifications are written in bulk.
+    """
+
+    @staticmethod
+    def evaluate(detections):
+        """
+        Create violations and award compliance points for new detections.
+        Returns the list of created Violation instances.
+        """
+        detections = list(detections)
+        if not detections:
+            return []
+
+        registrations = ViolationEngine.registrations_for(detections)
+        violations = ViolationEngine.evaluate_violations(detections, registrations)
+        ViolationEngine.evaluate_compliance(detections, registrations)
+        return violations
+
+    @staticmethod
+    def evaluate_violations(detections, registrations=None):
+        limits, fines = resolve_speed_rules(detections)
+        # NaN compares False, so detections without a speed never violate
+        speeding = observed_speeds(detections) > limits
+        return ViolationEngine.create_violations(
+            [detections[i] for i in np.flatnonzero(speeding)],
+            limits[speeding], fines[speeding], registrations
+        )
+
+    @staticmethod
+    def evaluate_compliance(detections, registrations=None):
+        from apps.compliance.services import ComplianceService
+
+        limits, _ = resolve_speed_rules(detections)
+        compliant = observed_speeds(detections) <= limits
+        return ComplianceService.award_points(
+            [detections[i] for i in np.flatnonzero(compliant)], registrations
+        )
+
+    @staticmethod
+    def registrations_for(detections):
+        """{license_plate: VehicleRegistration} for the plates seen in a batch"""
+        plates = {d.license_plate for d in detections if d.license_plate}
+        if not plates:
+            return {}
+        return VehicleRegistration.objects.in_bulk(plates, field_name='license_plate')
+
+    @staticmethod
+    def create_violations(detections, limits, fines, registrations=None):
+        if not detections:
+            return []
+
+        violations = []
+        for detection, limit, fine in zip(detections, limits.tolist(), fines.tolist()):
+            # Construct Immutable Evidence Pack
+            evidence_data = {
+                'violation_speed': detection.speed,
+                'zone_limit': limit,
+                'coordinates': {
+                    'lat': detection.location.y if detection.location else None,
+                    'lon': detection.location.x if detection.location else None,
+                },
+                'altitude': detection.altitude,
+                'drone_id': detection.drone.drone_id,
+                'patrol_id': str(detection.patrol_id) if detection.patrol_id else None,
+                'timestamp': detection.timestamp.isoformat()
+            }
+            violations.append(Violation(
+                detection=detection,
+                patrol_id=detection.patrol_id,
+                violation_type='SPEEDING',
+                fine_amount=fine,
+                evidence_meta=evidence_data,
+                description=f"Vehicle detected at {detection.speed} km/h (Limit: {limit} km/h)"
+            ))
+
+        Violation.objects.bulk_create(violations)
+        logger.info(f"Created {len(violations)} speeding violations")
+
+        from apps.analytics.dashboard import record_violations
+        transaction.on_commit(lambda: record_violations(violations))
+
+        # Ask the live ingestion streams to cut clips/snapshots from their
+        # buffers, and notify, once the violations are committed
+        from apps.stream_ingestion.evidence import request_evidence_many
+        transaction.on_commit(lambda: request_evidence_many([
+            (v.detection.drone.drone_id, v.id, v.detection.timestamp) for v in violations
+        ]), robust=True)
+        transaction.on_commit(lambda: ViolationEngine.notify(violations, registrations), robust=True)
+        return violations
+
+    @staticmethod
+    def notify(violations, registrations=None):
+        """
+        Queue officer notifications as one bulk task and citizen SMS as a
+        single group, instead of one broker round trip per violation.
+        """
+        from apps.notifications.tasks import send_bulk_notifications, send_sms_to_citizen
+
+        if registrations is None:
+            registrations = ViolationEngine.registrations_for([v.detection for v in violations])
+
+        # 1. Notify Officers (WebSocket)
+        # Ingest sets patrol ids as strings, so match on those
+        officers = {
+            str(patrol_id): officer_id
+            for patrol_id, officer_id in Patrol.objects.filter(
+                id__in={v.patrol_id for v in violations if v.patrol_id}
+            ).values_list('id', 'officer_id')
+        }
+        officer_notifications = [
+            {
+                'user_id': str(officers[str(v.patrol_id)]),
+                'title': "Speeding Violation Detected",
+                'message': f"Violation recorded by {v.detection.drone.drone_id}. Speed: {v.detection.speed} km/h",
+                'notification_type': "violation_alert",
+                'related_object_id': str(v.id),
+            }
+            for v in violations
+            if officers.get(str(v.patrol_id))
+        ]
+        if officer_notifications:
+            send_bulk_notifications.delay(officer_notifications)
+
+        # 2. Notify Citizens (SMS)
+        sms = []
+        for v in violations:
+            plate = v.detection.license_plate
+            if not plate:
+                continue
+            reg = registrations.get(plate)
+            if reg is None:
+                logger.warning(f"No registration found for plate {plate}")
+                continue
+            if reg.owner_phone_number:
+                sms_msg = (f"TRAFFIC ALERT: Violation recorded for {plate}. "
+                           f"Speed: {v.detection.speed}km/h in {v.evidence_meta['zone_limit']}km/h zone. "
+                           f"Ticket ID: {v.id}. Fine: ${float(v.fine_amount):.2f}")
+                sms.append(send_sms_to_citizen.s(reg.owner_phone_number, sms_msg))
+        if sms:
+            group(sms).apply_async()
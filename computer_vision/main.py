@@ -1,7 +1,6 @@
 import os
 import sys
 import logging
-import time
 import django
 
 # Setup Django environment BEFORE other imports
@@ -10,7 +9,8 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api.settings")
 django.setup()
 
 from django.conf import settings
-from apps.core.kafka_config import get_kafka_producer, get_kafka_consumer
+from apps.core.consumers import BatchConsumer
+from apps.core.kafka_config import get_kafka_producer
 from computer_vision.src.detector import VehicleDetector
 from computer_vision.src.processor import VideoProcessor
 
@@ -18,6 +18,59 @@ from computer_vision.src.processor import VideoProcessor
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class FrameDetectionConsumer(BatchConsumer):
+    """Runs detection on raw frames and publishes one event per detected vehicle"""
+
+    topic_key = 'RAW_FRAMES'
+    group_id = 'cv_processor_group'
+    # Inference is slow; small batches keep commits and rebalances prompt
+    batch_size = 16
+    produces = True
+
+    def __init__(self, processor, **options):
+        super().__init__(**options)
+        self.processor = processor
+        self.producer = get_kafka_producer()
+        self.output_topic = settings.KAFKA_TOPICS['DETECTIONS']
+
+    def handle_batch(self, records):
+        for record in records:
+            try:
+                self.process_frame(record.value)
+            except Exception as e:
+                logger.error(f"Error processing frame: {e}")
+
+    def process_frame(self, data):
+        stream_id = data.get('stream_id')
+        frame_number = data.get('frame_number')
+        frame_data = data.get('frame_data')
+        frame_rate = data.get('frame_rate', 30.0)
+        gps = data.get('gps', {})
+
+        if not frame_data:
+            return
+
+        # Process frame
+        detections = self.processor.process_frame_data(frame_data, frame_number, frame_rate)
+
+        # Publish detections
+        for det in detections:
+            event = {
+                'drone_id': data.get('drone_id'),
+                'stream_id': stream_id,
+                'timestamp': data.get('timestamp'),
+                'frame_number': frame_number,
+                'track_id': det['track_id'],
+                'vehicle_type': det['vehicle_type'],
+                'confidence': float(det['confidence']),
+                'box_coordinates': det['box_coordinates'],
+                'license_plate': det['license_plate'],
+                'speed': det['speed'],
+                'location': gps
+            }
+            self.producer.send(self.output_topic, event)
+
+
 def main():
     """
     Main entry point for the SkyMarshal IATOS project.
@@ -36,61 +89,10 @@ def main():
             logger.warning(f"File {video_path} not found.")
     else:
         logger.info("Starting CV in STREAM mode...")
-        
-        # Kafka Configuration from Django Settings
-        input_topic = settings.KAFKA_TOPICS['RAW_FRAMES']
-        output_topic = settings.KAFKA_TOPICS['DETECTIONS']
-        
-        try:
-            # Use Core Producer Singleton
-            producer = get_kafka_producer()
-            
-            # Use Core Consumer Factory
-            consumer = get_kafka_consumer(
-                topic=input_topic,
-                group_id='cv_processor_group'
-            )
-            logger.info(f"Listening for frames on {input_topic}...")
-            
-            for message in consumer:
-                try:
-                    data = message.value
-                    stream_id = data.get('stream_id')
-                    frame_number = data.get('frame_number')
-                    frame_data = data.get('frame_data')
-                    frame_rate = data.get('frame_rate', 30.0)
-                    gps = data.get('gps', {})
-                    
-                    if not frame_data:
-                        continue
-                        
-                    # Process frame
-                    detections = processor.process_frame_data(frame_data, frame_number, frame_rate)
-                    
-                    # Publish detections
-                    for det in detections:
-                        event = {
-                            'drone_id': data.get('drone_id'),
-                            'stream_id': stream_id,
-                            'timestamp': data.get('timestamp'),
-                            'frame_number': frame_number,
-                            'vehicle_type': det['vehicle_type'],
-                            'confidence': float(det['confidence']),
-                            'box_coordinates': det['box_coordinates'],
-                            'license_plate': det['license_plate'],
-                            'speed': det['speed'],
-                            'location': gps 
-                        }
-                        # Use the core producer's send method
-                        producer.send(output_topic, event)
-                        
-                except Exception as e:
-                    logger.error(f"Error processing frame: {e}")
-                    
-        except Exception as e:
-            logger.error(f"Critical Kafka Error: {e}")
-            # Add backoff/retry logic or exit
-            time.sleep(5)
+        # The tracker and speed estimator keep per-track state, so frames are
+        # processed in order on one thread; scale out with more partitions
+        FrameDetectionConsumer(processor).run()
+
 
 if __name__ == "__main__":
     main()
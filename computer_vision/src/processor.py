@@ -67,6 +67,7 @@ class VideoProcessor:
                 vehicle_type = names[cls_id]
 
                 detections.append({
+                    'track_id': track_id,
                     'vehicle_type': vehicle_type,
                     'confidence': conf,
                     'box_coordinates': [x1, y1, x2, y2],